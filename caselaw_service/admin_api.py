@@ -1,15 +1,29 @@
 """Admin endpoints for dataset health monitoring."""
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import PlainTextResponse
 from typing import Dict, Any, List
+import asyncio
 import time
 import psutil
 import os
 from datetime import datetime
 from caselaw_service.auth import get_current_admin_user
 from .datasets.dal import get_dataset_dal
+from .datasets.embedding_cache import get_embedding_store
+from .executors import get_executor_manager, run_in_pool
+from .loop_monitor import get_loop_monitor
+from .metrics import request_counts
+from .profiler import PROFILER_INTERVAL_MS, PROFILER_MAX_SECONDS, ProfilerBusy, collapse, run_profile
+from .shared_artifacts import memory_report
 
 router = APIRouter(prefix="/admin", tags=["admin"])
 
+def _probe_dataset(name: str):
+    """Quick test - open the stream and read its first item (blocking)."""
+    from .datasets import get_dataset
+    ds = get_dataset(name)
+    return next(iter(ds._get_dataset()), None)
+
 @router.get("/health")
 async def health_check(user=Depends(get_current_admin_user)) -> Dict[str, Any]:
     """Comprehensive health check for all datasets and services."""
@@ -19,9 +33,9 @@ async def health_check(user=Depends(get_current_admin_user)) -> Dict[str, Any]:
     dal = get_dataset_dal()
     cache_stats = dal.get_cache_stats()
     
-    # System metrics
+    # System metrics (cpu_percent samples for 1s; keep it off the event loop)
     memory_usage = psutil.virtual_memory().percent
-    cpu_usage = psutil.cpu_percent(interval=1)
+    cpu_usage = await run_in_pool("dataset", psutil.cpu_percent, interval=1)
     disk_usage = psutil.disk_usage('/').percent
     
     # Dataset availability
@@ -35,21 +49,21 @@ async def health_check(user=Depends(get_current_admin_user)) -> Dict[str, Any]:
         "court_cases"
     ]
     
+    probes = await asyncio.gather(
+        *(run_in_pool("dataset", _probe_dataset, name) for name in datasets),
+        return_exceptions=True,
+    )
     dataset_status = {}
-    for dataset_name in datasets:
-        try:
-            from .datasets import get_dataset
-            ds = get_dataset(dataset_name)
-            # Quick test - get first item
-            list(ds.take(1))
+    for dataset_name, probe in zip(datasets, probes):
+        if isinstance(probe, Exception):
             dataset_status[dataset_name] = {
-                "status": "healthy",
+                "status": "unhealthy",
+                "error": str(probe),
                 "last_check": datetime.utcnow().isoformat()
             }
-        except Exception as e:
+        else:
             dataset_status[dataset_name] = {
-                "status": "unhealthy",
-                "error": str(e),
+                "status": "healthy",
                 "last_check": datetime.utcnow().isoformat()
             }
     
@@ -126,17 +140,15 @@ async def get_metrics(user=Depends(get_current_admin_user)) -> Dict[str, Any]:
     dal = get_dataset_dal()
     cache_stats = dal.get_cache_stats()
     
-    # API usage metrics (from cache keys)
-    api_usage = {}
-    for key in dal.cache.keys():
-        if 'search' in key:
-            api_usage['search'] = api_usage.get('search', 0) + 1
-        elif 'semantic' in key:
-            api_usage['semantic_search'] = api_usage.get('semantic_search', 0) + 1
+    store = get_embedding_store()
     
     return {
         "cache": cache_stats,
-        "api_usage": api_usage,
+        "embedding_cache": store.get_stats() if store else None,
+        "executors": get_executor_manager().get_stats(),
+        "event_loop": get_loop_monitor().get_stats(),
+        # Requests per route on this worker (Prometheus series; /metrics has the full set)
+        "api_usage": request_counts(),
         "system": {
             "memory_usage_percent": psutil.virtual_memory().percent,
             "cpu_usage_percent": psutil.cpu_percent(),
@@ -144,3 +156,63 @@ async def get_metrics(user=Depends(get_current_admin_user)) -> Dict[str, Any]:
         },
         "timestamp": datetime.utcnow().isoformat()
     }
+
+@router.get("/memory")
+async def get_memory(user=Depends(get_current_admin_user)) -> Dict[str, Any]:
+    """Memory of this worker: unique vs. shared pages and mapped artifacts."""
+    return {
+        "worker": memory_report(),
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
+@router.get("/loop")
+async def get_loop_lag(user=Depends(get_current_admin_user)) -> Dict[str, Any]:
+    """Event-loop lag and recent stalls with stack samples of the blocking code."""
+    return {
+        "event_loop": get_loop_monitor().get_stats(events=True),
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
+PROFILER_ROLES = set(os.getenv("PROFILER_ROLES", "admin,service_role").split(","))
+
+def _require_profiler_role(user: Dict[str, Any]):
+    role = user.get("role")
+    app_role = (user.get("app_metadata") or {}).get("role")
+    if role not in PROFILER_ROLES and app_role not in PROFILER_ROLES:
+        raise HTTPException(status_code=403, detail="Profiling requires an admin role")
+
+@router.get("/profile")
+async def profile_worker(
+    seconds: float = Query(10, gt=0, le=PROFILER_MAX_SECONDS),
+    interval_ms: float = Query(PROFILER_INTERVAL_MS, ge=1, le=1000),
+    format: str = Query("json", pattern="^(json|collapsed)$"),
+    idle: bool = False,
+    user=Depends(get_current_admin_user),
+):
+    """Sample this worker's stacks for `seconds` (see profiler.py).
+
+    `format=collapsed` returns a flamegraph.pl / speedscope input file in
+    which event-loop stalls appear under `[loop-blocked]`; `json` returns
+    the same stacks split into CPU samples and loop stalls.
+    """
+    _require_profiler_role(user)
+    try:
+        result = await run_profile(seconds, interval_ms=interval_ms, idle=idle)
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if format == "collapsed":
+        stacks = result["stacks"] + result["loop_stall_stacks"]
+        return PlainTextResponse(
+            collapse(stacks),
+            headers={"Content-Disposition": f'attachment; filename="profile-{os.getpid()}.folded"'},
+        )
+    return {
+        "pid": os.getpid(),
+        "duration_s": result["duration_s"],
+        "interval_ms": result["interval_ms"],
+        "samples": result["samples"],
+        "collapsed": collapse(result["stacks"]),
+        "loop_stalls": result["loop_stalls"],
+        "loop_stall_collapsed": collapse(result["loop_stall_stacks"]),
+        "timestamp": datetime.utcnow().isoformat()
+    }
@@ -1,60 +1,190 @@
-"""Usage analytics and metrics collection."""
+"""Usage analytics and metrics collection.
+
+Events are kept in a fixed-size ring buffer (the most recent
+ANALYTICS_MAX_EVENTS, for `/realtime`) and folded into rollup buckets as
+they arrive, at three resolutions:
+
+    minute   last ANALYTICS_MINUTE_BUCKETS minutes (default 120)
+    hour     last ANALYTICS_HOUR_BUCKETS hours (default 48)
+    day      last ANALYTICS_RETENTION_DAYS days (default 90)
+
+Each bucket holds event counts per type, endpoint and dataset, a
+HyperLogLog of user ids and a Space-Saving top-k of search queries, so the
+endpoints merge at most a few hundred buckets instead of rescanning events.
+A query over the last N seconds uses the finest resolution that covers it;
+its first bucket may start before the cutoff.
+
+Search endpoints report their queries with `record_search(source, query)`
+(`source` names the endpoint, e.g. `caselaw` or `dataset/court_cases`).
+Queries are normalized (case, whitespace) and counted per (source, query),
+so `top_queries()` gives the heavy hitters of any sliding window with
+memory bounded by ANALYTICS_TOP_QUERIES entries per bucket; it is served
+at `/analytics/top-queries` and drives cache warmup.
+"""
+import os
+import threading
 import time
-import json
-from typing import Dict, Any, List
-from datetime import datetime, timedelta
-from fastapi import APIRouter, Depends, HTTPException
+from collections import Counter, deque
+from typing import Dict, Any, List, Optional
+from datetime import datetime, timezone
+from fastapi import APIRouter, Depends, HTTPException, Query
 from caselaw_service.auth import get_current_admin_user
+from caselaw_service.sketches import HyperLogLog, SpaceSaving, hash64
 
 router = APIRouter(prefix="/analytics", tags=["analytics"])
 
+ANALYTICS_MAX_EVENTS = int(os.getenv("ANALYTICS_MAX_EVENTS", "1000"))
+ANALYTICS_MINUTE_BUCKETS = int(os.getenv("ANALYTICS_MINUTE_BUCKETS", "120"))
+ANALYTICS_HOUR_BUCKETS = int(os.getenv("ANALYTICS_HOUR_BUCKETS", "48"))
+ANALYTICS_RETENTION_DAYS = int(os.getenv("ANALYTICS_RETENTION_DAYS", "90"))
+ANALYTICS_HLL_PRECISION = int(os.getenv("ANALYTICS_HLL_PRECISION", "11"))
+ANALYTICS_TOP_QUERIES = int(os.getenv("ANALYTICS_TOP_QUERIES", "100"))
+# Longest query text kept in the top-k summaries
+MAX_QUERY_CHARS = 200
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())[:MAX_QUERY_CHARS]
+
+
+class RollupBucket:
+    """Aggregates of the events in [start, start + resolution)."""
+
+    __slots__ = ("start", "events", "by_type", "endpoints", "datasets", "users", "queries")
+
+    def __init__(self, start: int):
+        self.start = start
+        self.events = 0
+        self.by_type: Counter = Counter()
+        self.endpoints: Counter = Counter()
+        self.datasets: Counter = Counter()
+        self.users = HyperLogLog(ANALYTICS_HLL_PRECISION)
+        self.queries = SpaceSaving(ANALYTICS_TOP_QUERIES)
+
+    def add(self, event_type: str, data: Dict[str, Any], user_hash: Optional[int]):
+        self.events += 1
+        self.by_type[event_type] += 1
+        if event_type == "api_call":
+            self.endpoints[data.get("endpoint", "unknown")] += 1
+        elif event_type == "dataset_access":
+            self.datasets[data.get("dataset", "unknown")] += 1
+        elif event_type == "search" and data.get("query"):
+            self.queries.add((data.get("source", "search"), normalize_query(data["query"])))
+        if user_hash is not None:
+            self.users.add_hash(user_hash)
+
+    def merge(self, other: "RollupBucket") -> "RollupBucket":
+        self.events += other.events
+        self.by_type.update(other.by_type)
+        self.endpoints.update(other.endpoints)
+        self.datasets.update(other.datasets)
+        self.users.merge(other.users)
+        self.queries.merge(other.queries)
+        return self
+
+
+# resolution name -> (seconds per bucket, buckets kept)
+RESOLUTIONS = {
+    "minute": (60, ANALYTICS_MINUTE_BUCKETS),
+    "hour": (3600, ANALYTICS_HOUR_BUCKETS),
+    "day": (86400, ANALYTICS_RETENTION_DAYS),
+}
+
+
 class AnalyticsStore:
-    """Simple in-memory analytics store."""
-    def __init__(self):
-        self.events = []
-        
+    """In-memory analytics: a ring buffer of recent events plus rollups."""
+
+    def __init__(self, max_events: int = ANALYTICS_MAX_EVENTS, clock=time.time):
+        self.clock = clock
+        self.events: deque = deque(maxlen=max_events)
+        self.rollups: Dict[str, deque] = {name: deque(maxlen=kept) for name, (_, kept) in RESOLUTIONS.items()}
+        self._lock = threading.Lock()
+
     def record_event(self, event_type: str, data: Dict[str, Any]):
         """Record an analytics event."""
+        now = self.clock()
         event = {
-            "timestamp": datetime.utcnow().isoformat(),
+            "timestamp": datetime.fromtimestamp(now, timezone.utc).replace(tzinfo=None).isoformat(),
             "event_type": event_type,
             "data": data
         }
-        self.events.append(event)
-        
-        # Keep only last 1000 events
-        if len(self.events) > 1000:
-            self.events = self.events[-1000:]
-    
+        user_id = data.get("user_id")
+        user_hash = hash64(user_id) if user_id is not None else None
+        with self._lock:
+            self.events.append(event)
+            for name, (seconds, _) in RESOLUTIONS.items():
+                buckets = self.rollups[name]
+                start = int(now // seconds) * seconds
+                if not buckets or buckets[-1].start < start:
+                    buckets.append(RollupBucket(start))
+                # Late events (clock skew between threads) land in the newest bucket
+                buckets[-1].add(event_type, data, user_hash)
+
+    def window(self, seconds: float) -> RollupBucket:
+        """Merged rollup of the last `seconds`."""
+        now = self.clock()
+        name = next((n for n, (res, kept) in RESOLUTIONS.items() if res * kept >= seconds), "day")
+        resolution = RESOLUTIONS[name][0]
+        # Include the bucket containing the cutoff
+        cutoff = int((now - seconds) // resolution) * resolution
+        total = RollupBucket(cutoff)
+        with self._lock:
+            for bucket in reversed(self.rollups[name]):
+                if bucket.start < cutoff:
+                    break
+                total.merge(bucket)
+        return total
+
     def get_usage_stats(self, days: int = 7) -> Dict[str, Any]:
         """Get usage statistics for last N days."""
-        cutoff = datetime.utcnow() - timedelta(days=days)
-        recent_events = [e for e in self.events 
-                        if datetime.fromisoformat(e["timestamp"]) > cutoff]
-        
-        # Count by endpoint
-        endpoint_usage = {}
-        for event in recent_events:
-            if event["event_type"] == "api_call":
-                endpoint = event["data"].get("endpoint", "unknown")
-                endpoint_usage[endpoint] = endpoint_usage.get(endpoint, 0) + 1
-        
-        # Count by dataset
-        dataset_usage = {}
-        for event in recent_events:
-            if event["event_type"] == "dataset_access":
-                dataset = event["data"].get("dataset", "unknown")
-                dataset_usage[dataset] = dataset_usage.get(dataset, 0) + 1
-        
+        total = self.window(days * 86400)
         return {
-            "total_events": len(recent_events),
-            "endpoint_usage": endpoint_usage,
-            "dataset_usage": dataset_usage,
+            "total_events": total.events,
+            "endpoint_usage": dict(total.endpoints),
+            "dataset_usage": dict(total.datasets),
+            "unique_users": total.users.count(),
+            "top_queries": [
+                {"query": q, "source": source, "count": c} for (source, q), c, _ in total.queries.top(10)
+            ],
             "time_range": f"{days} days"
         }
 
-# Global analytics store
-_analytics = AnalyticsStore()
+    def top_queries(self, seconds: float = 3600, n: int = 10, source: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Most frequent (source, query) pairs of the last `seconds`.
+
+        `count` may overestimate by at most `error` (Space-Saving bound);
+        `count - error` is a guaranteed lower bound.
+        """
+        top = []
+        for (src, query), count, error in self.window(seconds).queries.top():
+            if source is None or src == source:
+                top.append({"query": query, "source": src, "count": count, "error": error})
+                if len(top) >= n:
+                    break
+        return top
+
+    def recent_events(self, n: int = 10) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(self.events)[-n:]
+
+
+# Global singleton
+_analytics = None
+
+
+def get_analytics_store() -> AnalyticsStore:
+    """Get singleton AnalyticsStore instance."""
+    global _analytics
+    if _analytics is None:
+        _analytics = AnalyticsStore()
+    return _analytics
+
+
+def record_search(source: str, query: str, user_id: Optional[str] = None):
+    """Count a search query towards the heavy-hitter summaries."""
+    if query and query.strip():
+        get_analytics_store().record_event("search", {"source": source, "query": query, "user_id": user_id})
+
 
 @router.get("/usage")
 async def get_usage_stats(
@@ -62,15 +192,17 @@ async def get_usage_stats(
     user=Depends(get_current_admin_user)
 ) -> Dict[str, Any]:
     """Get usage analytics for the specified time period."""
-    return _analytics.get_usage_stats(days)
+    if days < 1:
+        raise HTTPException(status_code=400, detail="days must be at least 1")
+    return get_analytics_store().get_usage_stats(days)
 
 @router.get("/dashboard")
 async def get_analytics_dashboard(
     user=Depends(get_current_admin_user)
 ) -> Dict[str, Any]:
     """Get comprehensive analytics dashboard."""
-    stats = _analytics.get_usage_stats(days=30)
-    
+    stats = get_analytics_store().get_usage_stats(days=30)
+
     # Calculate trends
     endpoint_trends = []
     for endpoint, count in stats["endpoint_usage"].items():
@@ -79,26 +211,34 @@ async def get_analytics_dashboard(
             "usage_count": count,
             "trend": "increasing" if count > 10 else "stable"
         })
-    
+
     return {
         "overview": {
             "total_api_calls": sum(stats["endpoint_usage"].values()),
             "total_dataset_accesses": sum(stats["dataset_usage"].values()),
-            "unique_users": len(set([e["data"].get("user_id") 
-                                   for e in _analytics.events 
-                                   if e["event_type"] == "api_call"])),
+            "unique_users": stats["unique_users"],
             "time_period": "30 days"
         },
         "endpoint_usage": endpoint_trends,
         "dataset_usage": [
-            {"dataset": k, "usage_count": v} 
+            {"dataset": k, "usage_count": v}
             for k, v in stats["dataset_usage"].items()
         ],
-        "top_queries": [
-            {"query": e["data"].get("query", ""), "count": 1}
-            for e in _analytics.events[-10:]
-            if e["event_type"] == "search"
-        ]
+        "top_queries": stats["top_queries"]
+    }
+
+@router.get("/top-queries")
+async def get_top_queries(
+    minutes: int = Query(60, ge=1, le=ANALYTICS_RETENTION_DAYS * 1440),
+    limit: int = Query(10, ge=1, le=ANALYTICS_TOP_QUERIES),
+    source: Optional[str] = None,
+    user=Depends(get_current_admin_user)
+) -> Dict[str, Any]:
+    """Heavy-hitter queries over the last `minutes` (sliding window)."""
+    return {
+        "window_minutes": minutes,
+        "top_queries": get_analytics_store().top_queries(minutes * 60, limit, source=source),
+        "timestamp": datetime.utcnow().isoformat()
     }
 
 @router.get("/realtime")
@@ -106,16 +246,15 @@ async def get_realtime_metrics(
     user=Depends(get_current_admin_user)
 ) -> Dict[str, Any]:
     """Get real-time system metrics."""
+    store = get_analytics_store()
     current_time = datetime.utcnow().isoformat()
-    
+
     # Last 5 minutes
-    recent_cutoff = datetime.utcnow() - timedelta(minutes=5)
-    recent_events = [e for e in _analytics.events 
-                    if datetime.fromisoformat(e["timestamp"]) > recent_cutoff]
-    
+    recent_count = store.window(5 * 60).events
+
     return {
         "current_time": current_time,
-        "active_requests": len(recent_events),
-        "recent_activity": recent_events[-10:],  # Last 10 events
-        "system_health": "healthy" if len(recent_events) < 100 else "high_load"
+        "active_requests": recent_count,
+        "recent_activity": store.recent_events(10),  # Last 10 events
+        "system_health": "healthy" if recent_count < 100 else "high_load"
     }
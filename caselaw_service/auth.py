@@ -10,6 +10,8 @@ import httpx
 from fastapi import Depends, Header, HTTPException, status
 from jose import jwt
 
+from caselaw_service.tracing import span
+
 JWKS_CACHE: Dict[str, Any] = {}
 
 SUPABASE_PROJECT_ID = os.getenv("SUPABASE_PROJECT_ID")
@@ -24,7 +26,7 @@ async def _fetch_jwks() -> Dict[str, Any]:
         raise RuntimeError("SUPABASE_PROJECT_ID or SUPABASE_JWKS_URL must be set")
     if SUPABASE_JWKS_URL in JWKS_CACHE:
         return JWKS_CACHE[SUPABASE_JWKS_URL]
-    async with httpx.AsyncClient() as client:
+    async with httpx.AsyncClient() as client, span("auth_jwks"):
         resp = await client.get(SUPABASE_JWKS_URL, timeout=10)
         resp.raise_for_status()
         jwks = resp.json()
@@ -50,7 +52,8 @@ async def get_current_user(
     token = authorization.split(" ", 1)[1]
     try:
         jwks = await _fetch_jwks()
-        claims = jwt.decode(token, jwks, algorithms=["RS256"], options={"verify_aud": False})
+        with span("auth_verify"):
+            claims = jwt.decode(token, jwks, algorithms=["RS256"], options={"verify_aud": False})
         return claims
     except Exception as exc:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token") from exc
@@ -0,0 +1,48 @@
+"""Fixtures for the micro-benchmark suite.
+
+Benchmarks are parametrized by `corpus_size` over BENCH_SIZES (default
+10^3, 10^4, 10^5; add 1000000 for the full sweep). Results are saved to and
+compared against `benchmarks/baselines/` unless `--benchmark-storage` is
+given. Timings only mean something on the machine that recorded them, so
+baselines are not versioned: CI records one on the base commit and compares
+the PR against it on the same runner.
+"""
+import os
+from functools import lru_cache
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from caselaw_service.loadtest.corpus import iter_corpus
+
+BENCH_SIZES = [int(s) for s in os.getenv("BENCH_SIZES", "1000,10000,100000").split(",") if s.strip()]
+# Benchmarks whose inputs would exceed this are skipped.
+BENCH_MAX_MB = float(os.getenv("BENCH_MAX_MB", "1024"))
+BASELINE_DIR = os.path.join(os.path.dirname(__file__), "baselines")
+
+
+def pytest_configure(config):
+    if config.getoption("benchmark_storage", None) == "file://./.benchmarks":
+        config.option.benchmark_storage = f"file://{BASELINE_DIR}"
+
+
+def pytest_generate_tests(metafunc):
+    if "corpus_size" in metafunc.fixturenames:
+        metafunc.parametrize("corpus_size", BENCH_SIZES, ids=lambda n: f"n={n}")
+
+
+@lru_cache(maxsize=2)
+def _docs(n: int):
+    return list(iter_corpus(n, seed=0, words=60))
+
+
+@pytest.fixture
+def docs(corpus_size):
+    """`corpus_size` synthetic cases (generated once per size)."""
+    return _docs(corpus_size)
+
+
+def require_mb(mb: float):
+    if mb > BENCH_MAX_MB:
+        pytest.skip(f"needs ~{mb:.0f} MB (BENCH_MAX_MB={BENCH_MAX_MB:.0f})")
@@ -0,0 +1,96 @@
+"""Micro-benchmarks for the pure-Python hot paths of search, similarity and caching."""
+import itertools
+
+import numpy as np
+import pytest
+
+from caselaw_service.analytics import AnalyticsStore
+from caselaw_service.benchmarks.conftest import require_mb
+from caselaw_service.embeddings import EmbeddingIndex
+from caselaw_service.main import TTLCache, _compute_similarity
+from caselaw_service.middleware import MemoryGCRABackend, RateLimiter
+
+EMBEDDING_DIM = 384
+
+
+def _filled_cache(n: int) -> TTLCache:
+    cache = TTLCache(maxsize=n, ttl=600)
+    for i in range(n):
+        cache.set(f"query {i}", 10, [])
+    return cache
+
+
+def test_ttl_cache_get_hit(benchmark, corpus_size):
+    cache = _filled_cache(corpus_size)
+    keys = itertools.cycle(range(0, corpus_size, 7))
+    assert benchmark(lambda: cache.get(f"query {next(keys)}", 10)) == []
+
+
+def test_ttl_cache_set_evicting(benchmark, corpus_size):
+    cache = _filled_cache(corpus_size)
+    keys = itertools.count(corpus_size)
+    benchmark(lambda: cache.set(f"query {next(keys)}", 10, []))
+    assert len(cache.cache) == corpus_size
+
+
+def test_compute_similarity_scan(benchmark, docs):
+    """One `/caselaw/similar` scoring pass over the corpus."""
+    query = docs[0]["text"]
+
+    def scan():
+        return sum(1 for d in docs if _compute_similarity(query, d["case_name"] + " " + d["text"]) > 0)
+
+    assert benchmark.pedantic(scan, rounds=3, iterations=1) > 0
+
+
+def test_embedding_index_search(benchmark, corpus_size):
+    require_mb(corpus_size * EMBEDDING_DIM * 4 / 2**20)
+    rng = np.random.default_rng(0)
+    idx = EmbeddingIndex(path="", shared=False)
+    idx.embeddings = rng.random((corpus_size, EMBEDDING_DIM), dtype=np.float32)
+    idx.sq_norms = (idx.embeddings * idx.embeddings).sum(axis=1)
+    idx.ready = True
+    query = rng.random(EMBEDDING_DIM, dtype=np.float32)
+    assert len(benchmark(idx.search, query, top_k=10)) == 10
+
+
+class _PrecomputedEncoder:
+    """Returns fixed embeddings, so only the ranking in semantic_search_docs is timed."""
+
+    def __init__(self, n: int):
+        rng = np.random.default_rng(0)
+        self.matrix = rng.random((n, EMBEDDING_DIM), dtype=np.float32)
+        self.query = rng.random((1, EMBEDDING_DIM), dtype=np.float32)
+
+    def encode(self, texts):
+        return self.query if len(texts) == 1 else self.matrix[:len(texts)]
+
+
+def test_semantic_search_docs_ranking(benchmark, docs, monkeypatch):
+    from caselaw_service.datasets import semantic_search
+
+    require_mb(len(docs) * EMBEDDING_DIM * 4 / 2**20)
+    monkeypatch.setattr(semantic_search, "get_model", lambda: _PrecomputedEncoder(len(docs)))
+    monkeypatch.setattr(semantic_search, "get_embedding_store", lambda: None)
+    results = benchmark(semantic_search.semantic_search_docs, docs, "appeal dismissed", limit=10)
+    assert len(results) == 10
+
+
+def test_rate_limiter_is_allowed(benchmark, corpus_size):
+    """`corpus_size` distinct clients, round-robin."""
+    limiter = RateLimiter(requests_per_minute=10**9, backend=MemoryGCRABackend(max_keys=corpus_size))
+    keys = itertools.cycle([f"10.0.{i // 256}.{i % 256}" for i in range(corpus_size)])
+    assert benchmark(lambda: limiter.is_allowed(next(keys)))
+
+
+@pytest.mark.parametrize("days", [1, 7])
+def test_analytics_usage_stats(benchmark, corpus_size, days):
+    store = AnalyticsStore()
+    endpoints = ["/api/v1/caselaw/search", "/api/v1/caselaw/similar", "/api/v1/outcome/predict"]
+    for i in range(corpus_size):
+        if i % 3:
+            store.record_event("api_call", {"endpoint": endpoints[i % len(endpoints)]})
+        else:
+            store.record_event("dataset_access", {"dataset": "court_cases"})
+    stats = benchmark(store.get_usage_stats, days)
+    assert stats["total_events"] > 0
@@ -1,8 +1,13 @@
 from fastapi import APIRouter, HTTPException, Query
+from caselaw_service.analytics import record_search
 from caselaw_service.datasets import get_dataset, list_datasets
+from caselaw_service.executors import PoolSaturated, run_in_pool
 
 router = APIRouter(prefix="/api/v1/dataset", tags=["datasets"])
 
+# Wrapper imports, streaming scans and Hub reads run in the "dataset" pool,
+# model work in the "inference" pool; the handlers never block the event loop.
+
 @router.get("/list")
 def list_all_datasets():
     """List all available dataset wrappers."""
@@ -10,43 +15,59 @@ def list_all_datasets():
 
 from fastapi import Request
 
+# Query params that wrappers take as lists: `?columns=title,year` (or repeated)
+_LIST_PARAMS = {"fields", "columns"}
+
+
+def _split_list(values):
+    return [item.strip() for value in values for item in value.split(",") if item.strip()]
+
 @router.get("/search/{dataset}")
-def search_dataset(dataset: str, keyword: str = Query(...), limit: int = Query(10, ge=1, le=50), request: Request = None):
+async def search_dataset(dataset: str, keyword: str = Query(...), limit: int = Query(10, ge=1, le=50), request: Request = None):
     """Search a dataset for keyword (streaming)."""
     try:
-        ds = get_dataset(dataset)
+        ds = await run_in_pool("dataset", get_dataset, dataset)
+        record_search(f"dataset/{dataset}", keyword)
         extra = {}
         if request is not None:
             # Get all query params except known ones
             for k, v in request.query_params.items():
-                if k not in {"dataset", "keyword", "limit"}:
+                if k in _LIST_PARAMS:
+                    extra[k] = _split_list(request.query_params.getlist(k))
+                elif k not in {"dataset", "keyword", "limit"}:
                     extra[k] = v
-        results = ds.search(keyword, limit=limit, **extra)
+        results = await run_in_pool("dataset", ds.search, keyword, limit=limit, **extra)
         return {"results": results}
     except KeyError:
         raise HTTPException(status_code=404, detail=f"Dataset '{dataset}' not found")
     except (ValueError, NotImplementedError) as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except PoolSaturated:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/embed/inlegalbert")
-def embed_inlegalbert(text: str = Query(...)):
+async def embed_inlegalbert(text: str = Query(...)):
     """Get embedding for text using InLegalBERT."""
     try:
-        ds = get_dataset("inlegalbert")
-        emb = ds.embed(text)
+        ds = await run_in_pool("dataset", get_dataset, "inlegalbert")
+        emb = await run_in_pool("inference", ds.embed, text)
         return {"embedding": emb}
+    except PoolSaturated:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/summarize/legal")
-def summarize_legal(text: str = Query(...)):
+async def summarize_legal(text: str = Query(...)):
     """Summarize a legal text using LegalSummarizationDataset wrapper."""
     try:
-        ds = get_dataset("legal_summarization")
-        summary = ds.summarize(text)
+        ds = await run_in_pool("dataset", get_dataset, "legal_summarization")
+        summary = await run_in_pool("inference", ds.summarize, text)
         return {"summary": summary}
+    except PoolSaturated:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -61,34 +82,45 @@ def pile_of_law_subsets():
 
 # -------- Indian Legal Dataset advanced endpoints --------
 @router.get("/indian_legal/search_by_area")
-def search_indian_by_area(legal_area: str = Query(...), state: str | None = Query(None), limit: int = Query(100, ge=1, le=200)):
-    """Search Indian Legal Dataset by legal area and optionally state."""
+async def search_indian_by_area(
+    legal_area: str = Query(...),
+    state: str | None = Query(None),
+    limit: int = Query(100, ge=1, le=200),
+    offset: int = Query(0, ge=0),
+):
+    """Search Indian Legal Dataset by legal area and optionally state (paginated)."""
     try:
-        ds = get_dataset("indian_legal_dataset")
-        results = ds.search_by_legal_area_and_state(legal_area, state, limit)
-        return {"results": results}
+        ds = await run_in_pool("dataset", get_dataset, "indian_legal_dataset")
+        return await run_in_pool("dataset", ds.page_by_legal_area_and_state, legal_area, state, limit=limit, offset=offset)
+    except PoolSaturated:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/indian_legal/trends")
-def analyze_indian_trends(legal_area: str = Query(...)):
+async def analyze_indian_trends(legal_area: str = Query(...)):
     """Analyze legal trends in Indian legal dataset for a given area."""
     try:
-        ds = get_dataset("indian_legal_dataset")
-        analysis = ds.analyze_legal_trends(legal_area)
+        ds = await run_in_pool("dataset", get_dataset, "indian_legal_dataset")
+        analysis = await run_in_pool("dataset", ds.analyze_legal_trends, legal_area)
         return analysis
+    except PoolSaturated:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/indian_legal/semantic_search")
-def semantic_search_indian_legal(
+async def semantic_search_indian_legal(
     query: str = Query(...),
     limit: int = Query(10, ge=1, le=50)
 ):
     """Semantic search in Indian Legal Dataset using embeddings."""
     try:
-        ds = get_dataset("indian_legal_dataset")
-        results = ds.semantic_search(query, limit)
+        ds = await run_in_pool("dataset", get_dataset, "indian_legal_dataset")
+        record_search("semantic/indian_legal_dataset", query)
+        results = await run_in_pool("inference", ds.semantic_search, query, limit)
         return {"results": results}
+    except PoolSaturated:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -4,13 +4,33 @@ Each dataset module should define a class inheriting from `BaseStreamingDataset`
 exposing at minimum `search(keyword: str, limit: int)`.
 
 All dataset classes must register themselves via `register_dataset()` so that
-API routers and CLI utilities can discover them dynamically.
+API routers and CLI utilities can discover them dynamically, and be listed in
+`_DATASET_MANIFEST` so the module can be imported on first use. Importing
+this package therefore stays cheap: `datasets`, `transformers` and `torch`
+are only loaded once a wrapper is actually requested.
 """
 
-from typing import Dict, Type
+import importlib
+import os
+from typing import Dict, Optional, Type
+
+# Directory of local Parquet stand-ins for Hub datasets (`<repo id with / as __>.parquet`),
+# e.g. the synthetic corpus written by the load-test harness.
+DATASET_LOCAL_DIR = os.getenv("DATASET_LOCAL_DIR")
 
 _DATASET_REGISTRY: Dict[str, "BaseStreamingDataset"] = {}
 
+# Registered dataset name -> wrapper module (relative to this package).
+_DATASET_MANIFEST: Dict[str, str] = {
+    "pile_of_law": "pile_of_law",
+    "inlegalbert": "inlegalbert",
+    "legal_summarization": "legal_summarization",
+    "indian_legal_dataset": "indian_legal_dataset",
+    "court_cases": "court_cases",
+    "legal_contracts": "legal_contracts",
+    "patent_data": "patent_data",
+}
+
 
 def register_dataset(name: str):
     """Decorator to register dataset classes."""
@@ -21,15 +41,40 @@ def register_dataset(name: str):
     return decorator
 
 
-def get_dataset(name: str):
+def get_dataset_class(name: str):
+    """Return the wrapper class, importing its module on first use."""
     cls = _DATASET_REGISTRY.get(name)
+    if not cls and name in _DATASET_MANIFEST:
+        importlib.import_module(f".{_DATASET_MANIFEST[name]}", __name__)
+        cls = _DATASET_REGISTRY.get(name)
     if not cls:
         raise KeyError(f"Dataset '{name}' is not registered")
-    return cls()
+    return cls
+
+
+def get_dataset(name: str):
+    return get_dataset_class(name)()
 
 
 def list_datasets():
-    return list(_DATASET_REGISTRY.keys())
+    names = list(_DATASET_MANIFEST.keys())
+    return names + [n for n in _DATASET_REGISTRY if n not in _DATASET_MANIFEST]
+
+
+def local_dataset_path(hf_id: str) -> Optional[str]:
+    if not DATASET_LOCAL_DIR:
+        return None
+    path = os.path.join(DATASET_LOCAL_DIR, hf_id.replace("/", "__") + ".parquet")
+    return path if os.path.exists(path) else None
+
+
+def load_stream(hf_id: str, split: str = "train", **kwargs):
+    """Streaming `load_dataset(hf_id)`, or its local copy under DATASET_LOCAL_DIR."""
+    import datasets as hf_datasets
+    local = local_dataset_path(hf_id)
+    if local:
+        return hf_datasets.load_dataset("parquet", data_files=local, split="train", streaming=True)
+    return hf_datasets.load_dataset(hf_id, split=split, streaming=True, **kwargs)
 
 
 class BaseStreamingDataset:
@@ -37,10 +82,63 @@ class BaseStreamingDataset:
     Subclasses should implement:
         - `HF_DATASET` (str): huggingface repo id
         - `search(keyword: str, limit: int)` method
+    and may set `TEXT_FIELD` (field ranked by `semantic_search`).
     """
     HF_DATASET = None
+    TEXT_FIELD = "text"
+    # Docs ranked when no corpus index was built (None -> limit * 10)
+    SEMANTIC_FALLBACK_DOCS = None
+
+    def _get_dataset(self):
+        if not self.HF_DATASET:
+            raise NotImplementedError(f"{type(self).__name__} has no backing dataset")
+        return load_stream(self.HF_DATASET)
+
     def search(self, keyword: str, limit: int = 10):
         raise NotImplementedError
 
-# --- Force registration of all datasets on import ---
-from . import pile_of_law, inlegalbert, legal_summarization, indian_legal_dataset, court_cases, legal_contracts, patent_data
+    def _scan(self, ds, query, limit: int):
+        """Run a CompiledQuery over `ds`, in parallel across its shards when possible."""
+        import time
+        from ..metrics import record_scan
+        from ..tracing import span
+        from .shard_scan import parallel_scan
+        stats: Dict[str, int] = {}
+        start = time.perf_counter()
+        with span("dataset_scan"):
+            results = parallel_scan(ds, query, limit, stats=stats)
+        record_scan(self.__dataset_name__, stats.get("rows", 0), time.perf_counter() - start)  # type: ignore
+        return results
+
+    def corpus_key(self, **kwargs) -> str:
+        """Name of the precomputed corpus index for this dataset (see corpus_index.py)."""
+        return self.__dataset_name__  # type: ignore
+
+    def refresh_snapshot_artifacts(self, snapshot):
+        """Hook called after the local snapshot (see corpus_index.py) is rebuilt.
+
+        Wrappers with derived offline artifacts (aggregates, indexes) update
+        them here.
+        """
+
+    def semantic_search(self, query: str, limit: int = 10, **kwargs):
+        """Semantic search over the whole corpus when an index exists.
+
+        Falls back to ranking a streamed prefix of the dataset otherwise.
+        """
+        from itertools import islice
+        from ..tracing import span
+        from .corpus_index import get_corpus_index, semantic_search_corpus
+        from .semantic_search import semantic_search_docs
+
+        index = get_corpus_index(self.corpus_key(**kwargs))
+        if index is not None:
+            with span("semantic_index"):
+                results = semantic_search_corpus(index, query, limit=limit)
+            if results is not None:
+                return results
+        ds = self._get_dataset(**kwargs)
+        with span("dataset_read"):
+            docs = list(islice(iter(ds), self.SEMANTIC_FALLBACK_DOCS or limit * 10))
+        with span("semantic_rank"):
+            return semantic_search_docs(docs, query, text_field=self.TEXT_FIELD, limit=limit)
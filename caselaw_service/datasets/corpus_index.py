@@ -0,0 +1,346 @@
+"""Precomputed, normalized embedding matrices for whole-corpus semantic search.
+
+Without an index the wrappers can only rank the first `limit*10` streamed
+documents. `build_corpus_index` (run offline via
+`scripts/build_corpus_index.py`) takes a local Arrow snapshot of the full
+dataset and encodes its text field once; at query time ranking is a single
+matrix-vector product over every row (or a faiss lookup when an ANN index was
+built), and only the top rows are read back from the snapshot.
+
+Layout under `CORPUS_INDEX_DIR/<key>/`:
+    current          symlink to the live version directory
+    v-<built>-<pid>/ one complete build:
+        docs/            HF `save_to_disk` snapshot (memory-mapped Arrow)
+        embeddings.npy   (n, dim) float16, L2-normalized, row i == docs[i]
+        ann.faiss        optional faiss inner-product HNSW index
+        meta.json        text field, encoder backend, row count, build time
+        quality.f32      per-row feedback prior blended into scores (quality_prior.py)
+
+A build writes a new version directory and then repoints `current` in one
+rename, so readers see either the old build or the new one, never a mix;
+workers reload the index when `current` changes. The previous version is
+kept for readers that resolved it just before the swap. Indexes built
+before versioning (files directly under `<key>/`) are still read.
+"""
+import json
+import logging
+import os
+import shutil
+import threading
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+CORPUS_INDEX_DIR = os.getenv("CORPUS_INDEX_DIR", ".cache/corpus")
+
+# Rows scored per matmul block; bounds the float32 temporary to ~100 MB at dim 384.
+_SCORE_BLOCK = 65536
+
+
+def _normalize(mat: np.ndarray) -> np.ndarray:
+    mat = np.asarray(mat, dtype=np.float32)
+    return mat / np.clip(np.linalg.norm(mat, axis=-1, keepdims=True), 1e-12, None)
+
+
+class CorpusIndex:
+    """Memory-mapped embedding matrix aligned with a local dataset snapshot."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.stamp = _meta_stamp(directory)
+        with open(os.path.join(directory, "meta.json"), "r") as f:
+            self.meta = json.load(f)
+        # mmap: pages are shared between workers through the page cache
+        self.embeddings = np.load(os.path.join(directory, "embeddings.npy"), mmap_mode="r")
+        self.ann = None
+        ann_path = os.path.join(directory, "ann.faiss")
+        if os.path.exists(ann_path):
+            try:
+                import faiss
+                self.ann = faiss.read_index(ann_path)
+            except ImportError:
+                pass
+        self._snapshot = None
+        self._quality = None
+        rows = self.meta.get("rows")
+        if len(self) != rows or len(self.snapshot) != rows:
+            raise ValueError(
+                f"Corpus index {directory} is inconsistent: meta has {rows} rows, "
+                f"embeddings {len(self)}, docs {len(self.snapshot)}"
+            )
+
+    def __len__(self) -> int:
+        return self.embeddings.shape[0]
+
+    @property
+    def snapshot(self):
+        if self._snapshot is None:
+            import datasets as hf_datasets
+            self._snapshot = hf_datasets.load_from_disk(os.path.join(self.directory, "docs"))
+        return self._snapshot
+
+    @property
+    def quality(self):
+        """The feedback prior array for this index (built on first use)."""
+        if self._quality is None:
+            from .quality_prior import QualityPrior, snapshot_ids
+            key = self.meta.get("key") or os.path.basename(self.directory)
+            self._quality = QualityPrior(self.directory, len(self), key, lambda: snapshot_ids(self.snapshot))
+        return self._quality
+
+    def _prior(self):
+        from .quality_prior import QUALITY_PRIOR_WEIGHT
+        if QUALITY_PRIOR_WEIGHT == 0:
+            return None
+        try:
+            return self.quality
+        except Exception as e:
+            logger.warning("Quality prior unavailable for %s: %s", self.directory, e)
+            return None
+
+    def search(self, query_vec: np.ndarray, limit: int = 10) -> List[Tuple[int, float]]:
+        """Top `limit` (row, score) pairs over the whole corpus.
+
+        The score is the cosine plus the weighted feedback prior of the row.
+        """
+        n = len(self)
+        if n == 0 or limit <= 0:
+            return []
+        q = _normalize(query_vec).reshape(-1)
+        limit = min(limit, n)
+        prior = self._prior()
+        if self.ann is not None:
+            # Over-fetch so the prior can reorder the ANN candidates
+            fetch = min(n, limit * 2) if prior is not None else limit
+            scores, rows = self.ann.search(q[None, :], fetch)
+            rows, scores = rows[0][rows[0] >= 0], scores[0][rows[0] >= 0]
+            if prior is not None:
+                scores = prior.blend(scores, rows)
+            order = np.argsort(-scores)[:limit]
+            return [(int(rows[i]), float(scores[i])) for i in order]
+
+        scores = np.empty(n, dtype=np.float32)
+        for start in range(0, n, _SCORE_BLOCK):
+            block = self.embeddings[start:start + _SCORE_BLOCK]
+            scores[start:start + len(block)] = block.astype(np.float32) @ q
+        if prior is not None:
+            scores = prior.blend(scores)
+        top = np.argpartition(-scores, limit - 1)[:limit]
+        top = top[np.argsort(-scores[top])]
+        return [(int(r), float(scores[r])) for r in top]
+
+    def cosines(self, query_vec: np.ndarray, rows: List[int]) -> np.ndarray:
+        """Cosine of `query_vec` with each of `rows`, without the prior."""
+        q = _normalize(query_vec).reshape(-1)
+        return self.embeddings[np.asarray(rows, dtype=np.int64)].astype(np.float32) @ q
+
+    def get_docs(self, rows: List[int]) -> List[Dict[str, Any]]:
+        snapshot = self.snapshot
+        return [dict(snapshot[int(r)]) for r in rows]
+
+
+# ---------------- Registry -----------------
+_indexes: Dict[str, CorpusIndex] = {}
+# key -> (directory, meta stamp) of an index rejected for its backend or shape
+_rejected: Dict[str, Tuple[str, Any]] = {}
+_lock = threading.Lock()
+
+
+_CURRENT = "current"
+
+
+def _meta_stamp(directory: str):
+    """Identity of a version's meta.json."""
+    try:
+        st = os.stat(os.path.join(directory, "meta.json"))
+    except FileNotFoundError:
+        return None
+    return st.st_ino, st.st_mtime_ns
+
+
+def corpus_index_path(key: str) -> str:
+    return os.path.join(CORPUS_INDEX_DIR, key)
+
+
+def live_index_dir(key: str) -> str:
+    """The version directory `current` points at (or the unversioned layout)."""
+    root = corpus_index_path(key)
+    link = os.path.join(root, _CURRENT)
+    if os.path.islink(link):
+        return os.path.join(root, os.readlink(link))
+    return root
+
+
+def load_snapshot(key: str):
+    """The local Arrow snapshot for `key`, or None if none was written."""
+    path = os.path.join(live_index_dir(key), "docs")
+    if not os.path.isdir(path):
+        return None
+    import datasets as hf_datasets
+    return hf_datasets.load_from_disk(path)
+
+
+def get_corpus_index(key: str) -> Optional[CorpusIndex]:
+    """Loaded index for `key`, or None if none was built (or it's unusable).
+
+    A rebuilt index (new version directory) is picked up on the next lookup.
+    """
+    directory = live_index_dir(key)
+    stamp = _meta_stamp(directory)
+    if stamp is None:
+        return None
+    index = _indexes.get(key)
+    if index is not None and index.directory == directory and index.stamp == stamp:
+        return index
+    if _rejected.get(key) == (directory, stamp):
+        return None
+    with _lock:
+        index = _indexes.get(key)
+        if index is None or index.directory != directory or index.stamp != stamp:
+            from .encoders import resolve_backend
+            try:
+                index = CorpusIndex(directory)
+            except (OSError, ValueError) as e:
+                logger.warning("Corpus index %s is unusable (%s); ignoring it", key, e)
+                _rejected[key] = (directory, stamp)
+                _indexes.pop(key, None)
+                return None
+            if index.meta.get("backend") != resolve_backend():
+                # Query and corpus vectors must come from the same encoder
+                logger.warning(
+                    "Corpus index %s was built with backend %s, current is %s; ignoring it",
+                    key, index.meta.get("backend"), resolve_backend(),
+                )
+                _rejected[key] = (directory, stamp)
+                _indexes.pop(key, None)
+                return None
+            _indexes[key] = index
+    return index
+
+
+def loaded_quality_prior(key: str):
+    """The prior of `key`'s index if this worker already loaded both, else None."""
+    index = _indexes.get(key)
+    return index._quality if index is not None else None
+
+
+def semantic_search_corpus(index: CorpusIndex, query: str, limit: int = 10, threshold: float = 0.1):
+    """Rank the full corpus for `query`; same result shape as semantic_search_docs."""
+    from .semantic_search import get_model
+
+    model = get_model()
+    if model is None:
+        return None
+    query_vec = np.asarray(model.encode([query]))[0]
+    # Ranked with the prior, but filtered and reported by the cosine alone
+    rows = [row for row, _ in index.search(query_vec, limit)]
+    hits = [(row, float(score)) for row, score in zip(rows, index.cosines(query_vec, rows)) if score > threshold]
+    docs = index.get_docs([row for row, _ in hits])
+    from .quality_prior import ID_FIELD
+    prior = index._prior()
+    for doc, (row, score) in zip(docs, hits):
+        doc["similarity_score"] = score
+        doc["quality_prior"] = float(prior.values[row]) if prior is not None else 0.0
+        # The id to send with /feedback/submit for this result
+        doc.setdefault("item_id", str(doc.get(ID_FIELD, row)))
+    return docs
+
+
+# ---------------- Offline build -----------------
+def build_corpus_index(
+    key: str,
+    docs: Iterable[Dict[str, Any]],
+    text_field: str,
+    encoder: Any = None,
+    batch_size: int = 256,
+    ann: bool = False,
+) -> str:
+    """Snapshot `docs` to disk and encode `text_field` for every row.
+
+    Two passes: the stream is written to an Arrow snapshot first, then the
+    text column is read back in batches and encoded, so the model never
+    holds more than one batch. Everything is written to a staging
+    directory that becomes live in one step at the end; returns its path.
+    """
+    import datasets as hf_datasets
+    from .encoders import resolve_backend
+
+    if encoder is None:
+        from .semantic_search import get_model
+        encoder = get_model()
+
+    root = corpus_index_path(key)
+    staging = os.path.join(root, f".staging-{os.getpid()}")
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+
+    def _gen():
+        yield from docs
+
+    snapshot = hf_datasets.Dataset.from_generator(_gen, cache_dir=os.path.join(staging, ".build"))
+    snapshot.save_to_disk(os.path.join(staging, "docs"))
+    snapshot = hf_datasets.load_from_disk(os.path.join(staging, "docs"))
+    shutil.rmtree(os.path.join(staging, ".build"), ignore_errors=True)
+
+    chunks = []
+    texts_col = snapshot.select_columns([text_field]) if text_field in snapshot.column_names else None
+    for start in range(0, len(snapshot), batch_size):
+        if texts_col is None:
+            texts = [""] * min(batch_size, len(snapshot) - start)
+        else:
+            texts = [t or "" for t in texts_col[start:start + batch_size][text_field]]
+        chunks.append(_normalize(encoder.encode(texts)).astype(np.float16))
+    dim = chunks[0].shape[1] if chunks else 0
+    matrix = np.vstack(chunks) if chunks else np.zeros((0, dim), dtype=np.float16)
+    np.save(os.path.join(staging, "embeddings.npy"), matrix)
+
+    if ann and len(matrix):
+        import faiss
+        index = faiss.IndexHNSWFlat(dim, 32, faiss.METRIC_INNER_PRODUCT)
+        index.add(matrix.astype(np.float32))
+        faiss.write_index(index, os.path.join(staging, "ann.faiss"))
+
+    built_at = datetime.utcnow()
+    with open(os.path.join(staging, "meta.json"), "w") as f:
+        json.dump({
+            "key": key,
+            "text_field": text_field,
+            "backend": resolve_backend(),
+            "rows": int(len(matrix)),
+            "dim": int(dim),
+            "built_at": built_at.isoformat(),
+        }, f, indent=2)
+
+    version = f"v-{built_at.strftime('%Y%m%dT%H%M%S%f')}-{os.getpid()}"
+    os.rename(staging, os.path.join(root, version))
+    _publish(root, version)
+    _indexes.pop(key, None)
+    return os.path.join(root, version)
+
+
+def _publish(root: str, version: str):
+    """Point `current` at `version` atomically, then prune older versions.
+
+    The version it replaces is kept; files of pruned ones are unlinked, not
+    overwritten, so readers that mapped them keep their pages until they
+    reload.
+    """
+    link = os.path.join(root, _CURRENT)
+    previous = os.readlink(link) if os.path.islink(link) else None
+    tmp = os.path.join(root, f".{_CURRENT}-{os.getpid()}")
+    if os.path.lexists(tmp):
+        os.remove(tmp)
+    os.symlink(version, tmp)
+    os.replace(tmp, link)
+
+    for name in os.listdir(root):
+        if name.startswith("v-") and name not in (version, previous):
+            shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+    # Files of an unversioned (pre-`current`) index
+    for name in ("embeddings.npy", "ann.faiss", "meta.json", "quality.f32", "quality.f32.lock"):
+        if os.path.exists(os.path.join(root, name)):
+            os.remove(os.path.join(root, name))
+    shutil.rmtree(os.path.join(root, "docs"), ignore_errors=True)
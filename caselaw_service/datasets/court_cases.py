@@ -1,5 +1,5 @@
-import datasets as hf_datasets
-from . import BaseStreamingDataset, register_dataset
+from . import BaseStreamingDataset, load_stream, register_dataset
+from .query import CompiledQuery
 
 @register_dataset("court_cases")
 class CourtCasesDataset(BaseStreamingDataset):
@@ -10,26 +10,13 @@ class CourtCasesDataset(BaseStreamingDataset):
         try:
             # Try 'us' split first, fallback to 'train' if needed
             try:
-                return hf_datasets.load_dataset(self.HF_DATASET, split="us", streaming=True)
+                return load_stream(self.HF_DATASET, split="us")
             except Exception:
-                return hf_datasets.load_dataset(self.HF_DATASET, split="train", streaming=True)
+                return load_stream(self.HF_DATASET)
         except Exception:
             return []
 
     def search(self, keyword: str, limit: int = 10):
         """Search for cases containing the keyword."""
         ds = self._get_dataset()
-        results = []
-        for doc in ds:
-            if keyword.lower() in doc.get("text", "").lower():
-                results.append(doc)
-                if len(results) >= limit:
-                    break
-        return results
-
-    def semantic_search(self, query: str, limit: int = 10):
-        """Semantic search using embeddings."""
-        from .semantic_search import semantic_search_docs
-        ds = self._get_dataset()
-        docs = list(ds.take(limit * 10))
-        return semantic_search_docs(docs, query, limit=limit)
+        return self._scan(ds, CompiledQuery(keyword, ["text"]), limit)
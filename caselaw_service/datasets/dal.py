@@ -7,6 +7,8 @@ import hashlib
 import json
 from datetime import datetime, timedelta
 
+from ..metrics import record_cache
+
 @dataclass
 class CacheConfig:
     """Configuration for caching layer."""
@@ -55,6 +57,7 @@ class DatasetDAL:
         
         # Check cache
         cached_result = self.cache.get(cache_key)
+        record_cache("dataset_dal", hits=int(bool(cached_result)), misses=int(not cached_result))
         if cached_result:
             return cached_result
         
@@ -0,0 +1,277 @@
+"""Persistent, content-addressed cache of document embeddings.
+
+`semantic_search_docs` used to re-encode every candidate document on every
+query. `EmbeddingStore` keeps one float16 vector per distinct text in a
+memory-mapped file keyed by a hash of the text, so only documents the model
+has never seen are encoded. The store is bounded (least recently used
+slots are reused once full) and survives restarts. Every slot also records
+the key of the vector written to it, so a key index saved before a crash
+(it is only written every _FLUSH_EVERY inserts) can never return a vector
+that was since written for another text.
+
+The slot map lives in the process that owns the store, so a store
+directory must never be written by two processes. Each worker claims its
+own `worker-<n>` subdirectory by holding an exclusive `flock` on it for its
+lifetime; a restarted worker reclaims a free one and reuses its vectors.
+
+Configuration:
+    EMBEDDING_CACHE_DIR     directory for the per-worker vector files + indexes (default .cache/embeddings)
+    EMBEDDING_CACHE_MAX_MB  size bound for each worker's vector file; 0 disables the cache (default 256)
+"""
+import atexit
+import fcntl
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ..metrics import record_cache
+
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", ".cache/embeddings")
+EMBEDDING_CACHE_MAX_MB = float(os.getenv("EMBEDDING_CACHE_MAX_MB", "256"))
+
+# Persist the key index after this many inserts (and on explicit flush()).
+_FLUSH_EVERY = 512
+
+
+_TAG_BYTES = 16
+
+
+def content_key(text: str) -> str:
+    """Stable key for a document text."""
+    return hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=_TAG_BYTES).hexdigest()
+
+
+def _tag(key: str) -> bytes:
+    return bytes.fromhex(key)
+
+
+def claim_directory(base: str) -> Tuple[str, int]:
+    """Lock the first free `base/worker-<n>` directory for this process.
+
+    Returns the directory and the descriptor holding the lock; the lock is
+    released when the descriptor is closed (or the process exits).
+    """
+    n = 0
+    while True:
+        directory = os.path.join(base, f"worker-{n}")
+        os.makedirs(directory, exist_ok=True)
+        fd = os.open(os.path.join(directory, ".lock"), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return directory, fd
+        except BlockingIOError:
+            os.close(fd)
+            n += 1
+
+
+class EmbeddingStore:
+    """Bounded float16 embedding store backed by a memory-mapped file.
+
+    Not safe to share between processes; see `claim_directory`.
+
+    Layout under `directory`:
+        vectors.f16   (capacity, dim) float16 memmap
+        tags.u8       (capacity, 16) key digest of the vector in each slot
+        index.json    {"dim": .., "capacity": .., "slots": {key: slot}} in LRU order
+    """
+
+    def __init__(self, directory: str, max_bytes: int, dim: Optional[int] = None):
+        self.directory = directory
+        self.max_bytes = int(max_bytes)
+        self.dim = dim
+        self.capacity = 0
+        self._slots: "OrderedDict[str, int]" = OrderedDict()
+        self._free: List[int] = []
+        self._vectors: Optional[np.memmap] = None
+        self._tags: Optional[np.memmap] = None
+        self._dirty = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._load()
+
+    # ---------------- persistence -----------------
+    @property
+    def _vectors_path(self) -> str:
+        return os.path.join(self.directory, "vectors.f16")
+
+    @property
+    def _tags_path(self) -> str:
+        return os.path.join(self.directory, "tags.u8")
+
+    @property
+    def _index_path(self) -> str:
+        return os.path.join(self.directory, "index.json")
+
+    def _load(self):
+        paths = (self._index_path, self._vectors_path, self._tags_path)
+        if not all(os.path.exists(path) for path in paths):
+            return
+        try:
+            with open(self._index_path, "r") as f:
+                meta = json.load(f)
+            if self.dim is not None and meta["dim"] != self.dim:
+                return
+            if meta["capacity"] != max(1, self.max_bytes // (meta["dim"] * 2)):
+                # Size bound changed; rebuild rather than silently ignore it
+                return
+            self._open(meta["dim"], meta["capacity"], mode="r+")
+            self._slots = OrderedDict((k, int(v)) for k, v in meta["slots"].items())
+            used = set(self._slots.values())
+            self._free = [i for i in range(self.capacity - 1, -1, -1) if i not in used]
+        except Exception as e:
+            print(f"Embedding cache load error, starting empty: {e}")
+            self._slots.clear()
+            self._vectors = self._tags = None
+
+    def _open(self, dim: int, capacity: int, mode: str):
+        self.dim = int(dim)
+        self.capacity = int(capacity)
+        self._vectors = np.memmap(self._vectors_path, dtype=np.float16, mode=mode, shape=(self.capacity, self.dim))
+        self._tags = np.memmap(self._tags_path, dtype=np.uint8, mode=mode, shape=(self.capacity, _TAG_BYTES))
+
+    def _create(self, dim: int):
+        os.makedirs(self.directory, exist_ok=True)
+        capacity = max(1, self.max_bytes // (dim * 2))
+        self._open(dim, capacity, mode="w+")
+        self._slots.clear()
+        self._free = list(range(self.capacity - 1, -1, -1))
+
+    def flush(self):
+        """Write the key index (in LRU order) and sync the vector file."""
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if self._vectors is None:
+            return
+        self._vectors.flush()
+        self._tags.flush()
+        tmp = self._index_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"dim": self.dim, "capacity": self.capacity, "slots": self._slots}, f)
+        os.replace(tmp, self._index_path)
+        self._dirty = 0
+
+    # ---------------- lookups -----------------
+    def get_many(self, keys: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """Return cached float32 vectors (or None) for each key."""
+        out: List[Optional[np.ndarray]] = []
+        hits = misses = 0
+        with self._lock:
+            for key in keys:
+                slot = self._slots.get(key) if self._vectors is not None else None
+                if slot is not None and bytes(self._tags[slot]) != _tag(key):
+                    # Stale index entry: the slot was reused after the index
+                    # was saved. Leave the slot to the key that owns it.
+                    del self._slots[key]
+                    slot = None
+                if slot is None:
+                    misses += 1
+                    out.append(None)
+                    continue
+                self._slots.move_to_end(key)
+                hits += 1
+                out.append(np.asarray(self._vectors[slot], dtype=np.float32))
+            self.hits += hits
+            self.misses += misses
+        record_cache("embeddings", hits=hits, misses=misses)
+        return out
+
+    def put_many(self, keys: Sequence[str], vectors: np.ndarray):
+        """Store vectors, evicting least recently used entries when full."""
+        vectors = np.asarray(vectors)
+        if not len(keys):
+            return
+        with self._lock:
+            if self._vectors is None or vectors.shape[1] != self.dim:
+                self._create(vectors.shape[1])
+            for key, vec in zip(keys, vectors):
+                slot = self._slots.get(key)
+                if slot is None:
+                    if self._free:
+                        slot = self._free.pop()
+                    else:
+                        _, slot = self._slots.popitem(last=False)
+                        self.evictions += 1
+                # Invalidate the tag first so a crash mid-write leaves a miss
+                self._tags[slot] = 0
+                self._vectors[slot] = vec.astype(np.float16)
+                self._tags[slot] = np.frombuffer(_tag(key), dtype=np.uint8)
+                self._slots[key] = slot
+                self._slots.move_to_end(key)
+                self._dirty += 1
+            if self._dirty >= _FLUSH_EVERY:
+                self._flush_locked()
+
+    def encode(self, model: Any, texts: Sequence[str]) -> np.ndarray:
+        """Encode `texts`, only sending unseen texts to `model.encode`."""
+        keys = [content_key(t) for t in texts]
+        cached = self.get_many(keys)
+        missing = [i for i, vec in enumerate(cached) if vec is None]
+        if missing:
+            # Duplicate texts in one batch only need encoding once
+            unique: Dict[str, int] = {}
+            for i in missing:
+                unique.setdefault(keys[i], i)
+            fresh = np.asarray(model.encode([texts[i] for i in unique.values()]), dtype=np.float32)
+            by_key = dict(zip(unique.keys(), fresh))
+            self.put_many(list(by_key.keys()), fresh)
+            for i in missing:
+                cached[i] = by_key[keys[i]]
+        if not cached:
+            return np.zeros((0, self.dim or 0), dtype=np.float32)
+        return np.vstack(cached)
+
+    def clear(self):
+        with self._lock:
+            self._slots.clear()
+            self._free = list(range(self.capacity - 1, -1, -1))
+            self.hits = self.misses = self.evictions = 0
+            self._flush_locked()
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._slots),
+            "capacity": self.capacity,
+            "dim": self.dim,
+            "size_bytes": self.capacity * (self.dim or 0) * 2,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+# Global singleton
+_embedding_store = None
+_embedding_store_pid = None
+_embedding_store_lock = threading.Lock()
+
+
+def get_embedding_store() -> Optional[EmbeddingStore]:
+    """Get singleton EmbeddingStore, or None when disabled by config."""
+    global _embedding_store, _embedding_store_pid
+    # A store inherited over fork shares the parent's lock; claim our own
+    if _embedding_store is not None and _embedding_store_pid == os.getpid():
+        return _embedding_store
+    if EMBEDDING_CACHE_MAX_MB <= 0:
+        return None
+    with _embedding_store_lock:
+        if _embedding_store is None or _embedding_store_pid != os.getpid():
+            from .encoders import resolve_backend
+
+            # Vectors from different backends are not interchangeable
+            directory, _ = claim_directory(os.path.join(EMBEDDING_CACHE_DIR, resolve_backend()))
+            _embedding_store = EmbeddingStore(directory, int(EMBEDDING_CACHE_MAX_MB * 1024 * 1024))
+            atexit.register(_embedding_store.flush)
+            _embedding_store_pid = os.getpid()
+    return _embedding_store
@@ -0,0 +1,294 @@
+"""CPU embedding backends for the dataset wrappers.
+
+The sentence-transformers model used by `semantic_search` and the
+`law-ai/InLegalBERT` model behind `/embed/inlegalbert` both default to fp32
+PyTorch. On CPU-only nodes a faster backend can be selected with the
+`EMBEDDING_BACKEND` environment variable:
+
+    torch       fp32 PyTorch (default, reference numbers)
+    torch-int8  PyTorch dynamic INT8 quantization of all Linear layers
+    onnx        model exported once to ONNX and run with onnxruntime
+    onnx-int8   the ONNX export with onnxruntime dynamic INT8 quantization
+
+ONNX exports are written to `ONNX_CACHE_DIR` and reused across restarts.
+Use `cosine_agreement` / `benchmark_throughput` (or
+`scripts/benchmark_encoders.py`) to check a backend before enabling it.
+"""
+import inspect
+import os
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+ONNX_CACHE_DIR = os.getenv("ONNX_CACHE_DIR", ".cache/onnx")
+
+BACKENDS = ("torch", "torch-int8", "onnx", "onnx-int8")
+
+SENTENCE_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+# Fixed sample used for the fp32 agreement check and throughput benchmark.
+SAMPLE_LEGAL_TEXTS = [
+    "The appellant challenges the conviction on the ground that the confession was obtained without counsel.",
+    "The lessee failed to pay rent for three consecutive months and the lessor sought eviction.",
+    "Whether the arbitration clause survives termination of the principal agreement.",
+    "The High Court quashed the FIR holding that no cognizable offence was disclosed.",
+    "Plaintiff alleges breach of the non-disclosure agreement by a former employee.",
+    "The patent claims a method for compressing neural network weights on mobile devices.",
+    "Bail was granted subject to the accused surrendering his passport.",
+    "The tribunal held that the dismissal was disproportionate to the misconduct alleged.",
+    "Defendant moved to suppress evidence obtained during a warrantless search of the vehicle.",
+    "The contract contains a limitation of liability capped at the fees paid in the prior year.",
+    "Income tax assessment reopened beyond four years without new tangible material.",
+    "The Supreme Court considered whether the right to privacy is a fundamental right.",
+    "Landlord sought specific performance of the agreement to sell the suit property.",
+    "The insurer repudiated the claim citing non-disclosure of a pre-existing condition.",
+    "Custody of the minor child was awarded to the mother with visitation rights to the father.",
+    "The company petitioned for winding up on account of inability to pay its debts.",
+]
+
+
+def resolve_backend(backend: Optional[str] = None) -> str:
+    """Return the configured backend name, validating it."""
+    name = (backend or EMBEDDING_BACKEND or "torch").lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown embedding backend '{name}'. Choose one of: {', '.join(BACKENDS)}")
+    return name
+
+
+def quantize_int8(model):
+    """Apply PyTorch dynamic INT8 quantization to every Linear layer."""
+    import torch
+
+    model.eval()
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def _onnx_path(model_name: str, quantized: bool = False) -> str:
+    safe_name = model_name.replace("/", "__")
+    suffix = ".int8.onnx" if quantized else ".onnx"
+    return os.path.join(ONNX_CACHE_DIR, safe_name + suffix)
+
+
+def _named_inputs_module(model, input_names):
+    import torch
+
+    class _NamedInputs(torch.nn.Module):
+        """Map positional export args onto the model's keyword inputs."""
+
+        def __init__(self):
+            super().__init__()
+            self.model = model
+
+        def forward(self, *args):
+            return self.model(**dict(zip(input_names, args))).last_hidden_state
+
+    return _NamedInputs()
+
+
+def export_onnx(model_name: str, model=None, tokenizer=None) -> str:
+    """Export a HF encoder to ONNX (once) and return the file path."""
+    path = _onnx_path(model_name)
+    if os.path.exists(path):
+        return path
+
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    tokenizer = tokenizer or AutoTokenizer.from_pretrained(model_name)
+    model = model or AutoModel.from_pretrained(model_name)
+    model.eval()
+
+    sample = tokenizer(["onnx export sample"], return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+    os.makedirs(ONNX_CACHE_DIR, exist_ok=True)
+    tmp_path = path + ".tmp"
+    export_kwargs = dict(
+        input_names=input_names,
+        output_names=["last_hidden_state"],
+        dynamic_axes=dynamic_axes,
+        opset_version=17,
+    )
+    if "dynamo" in inspect.signature(torch.onnx.export).parameters:
+        # Keep the TorchScript exporter; dynamic_axes is its API
+        export_kwargs["dynamo"] = False
+    with torch.no_grad():
+        args = tuple(sample[name] for name in input_names)
+        torch.onnx.export(_named_inputs_module(model, input_names), args, tmp_path, **export_kwargs)
+    os.replace(tmp_path, path)
+    return path
+
+
+def quantize_onnx(fp32_path: str, model_name: str) -> str:
+    """Write an onnxruntime dynamic INT8 copy of an exported model."""
+    path = _onnx_path(model_name, quantized=True)
+    if os.path.exists(path):
+        return path
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    tmp_path = path + ".tmp"
+    quantize_dynamic(fp32_path, tmp_path, weight_type=QuantType.QInt8)
+    os.replace(tmp_path, path)
+    return path
+
+
+def _pool(hidden: np.ndarray, attention_mask: np.ndarray, pooling: str) -> np.ndarray:
+    if pooling == "cls":
+        return hidden[:, 0, :]
+    mask = attention_mask[..., None].astype(hidden.dtype)
+    return (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+
+
+class TransformerEncoder:
+    """Tokenizer + HF encoder with CLS or mean pooling on a selectable backend.
+
+    `encode(texts)` returns a float32 matrix of shape (len(texts), dim), in
+    the same way `SentenceTransformer.encode` does.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        pooling: str = "cls",
+        normalize: bool = False,
+        backend: Optional[str] = None,
+        max_length: int = 512,
+    ):
+        from transformers import AutoTokenizer
+
+        self.model_name = model_name
+        self.pooling = pooling
+        self.normalize = normalize
+        self.backend = resolve_backend(backend)
+        self.max_length = max_length
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.model = None
+        self.session = None
+
+        if self.backend.startswith("onnx"):
+            import onnxruntime as ort
+
+            path = export_onnx(model_name, tokenizer=self.tokenizer)
+            if self.backend == "onnx-int8":
+                path = quantize_onnx(path, model_name)
+            self.session = ort.InferenceSession(path, providers=["CPUExecutionProvider"])
+            self._input_names = {i.name for i in self.session.get_inputs()}
+        else:
+            from transformers import AutoModel
+
+            model = AutoModel.from_pretrained(model_name)
+            model.eval()
+            if self.backend == "torch-int8":
+                model = quantize_int8(model)
+            self.model = model
+
+    def _forward(self, batch: Sequence[str]) -> np.ndarray:
+        if self.session is not None:
+            inputs = self.tokenizer(
+                list(batch), padding=True, truncation=True, max_length=self.max_length, return_tensors="np"
+            )
+            feed = {k: v.astype(np.int64) for k, v in inputs.items() if k in self._input_names}
+            hidden = self.session.run(["last_hidden_state"], feed)[0]
+            return _pool(hidden, inputs["attention_mask"], self.pooling)
+
+        import torch
+
+        inputs = self.tokenizer(
+            list(batch), padding=True, truncation=True, max_length=self.max_length, return_tensors="pt"
+        )
+        with torch.no_grad():
+            hidden = self.model(**inputs).last_hidden_state.numpy()
+        return _pool(hidden, inputs["attention_mask"].numpy(), self.pooling)
+
+    def encode(self, texts: Sequence[str], batch_size: int = 32) -> np.ndarray:
+        if isinstance(texts, str):
+            texts = [texts]
+        chunks = [self._forward(texts[i:i + batch_size]) for i in range(0, len(texts), batch_size)]
+        if not chunks:
+            return np.zeros((0, 0), dtype=np.float32)
+        out = np.vstack(chunks).astype(np.float32)
+        if self.normalize:
+            out /= np.clip(np.linalg.norm(out, axis=1, keepdims=True), 1e-12, None)
+        return out
+
+
+def load_sentence_encoder(model_name: str = SENTENCE_MODEL, backend: Optional[str] = None):
+    """Return the encoder used for semantic ranking.
+
+    The fp32 and INT8 PyTorch backends keep using sentence-transformers so
+    the embeddings match what the wrappers have always produced; the ONNX
+    backends reproduce its mean pooling + L2 normalisation.
+    """
+    backend = resolve_backend(backend)
+    if backend.startswith("onnx"):
+        return TransformerEncoder(model_name, pooling="mean", normalize=True, backend=backend, max_length=256)
+
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(model_name, device="cpu")
+    if backend == "torch-int8":
+        model = quantize_int8(model)
+    return model
+
+
+# ---------------- Accuracy / speed checks -----------------
+def cosine_agreement(reference: np.ndarray, candidate: np.ndarray) -> Dict[str, float]:
+    """Row-wise cosine similarity between two embedding matrices."""
+    reference = np.asarray(reference, dtype=np.float32)
+    candidate = np.asarray(candidate, dtype=np.float32)
+    if reference.shape != candidate.shape:
+        raise ValueError(f"Embedding shapes differ: {reference.shape} vs {candidate.shape}")
+    num = (reference * candidate).sum(axis=1)
+    den = np.linalg.norm(reference, axis=1) * np.linalg.norm(candidate, axis=1)
+    cos = num / np.clip(den, 1e-12, None)
+    return {"mean": float(cos.mean()), "min": float(cos.min())}
+
+
+def benchmark_throughput(encoder: Any, texts: Sequence[str], repeats: int = 3, batch_size: int = 32) -> Dict[str, float]:
+    """Encode `texts` `repeats` times (after one warm-up pass) and report texts/sec."""
+    texts = list(texts)
+    encoder.encode(texts, batch_size=batch_size)
+    timings: List[float] = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        encoder.encode(texts, batch_size=batch_size)
+        timings.append(time.perf_counter() - start)
+    best = min(timings)
+    return {
+        "texts": len(texts),
+        "best_seconds": best,
+        "mean_seconds": sum(timings) / len(timings),
+        "texts_per_second": len(texts) / best if best > 0 else float("inf"),
+    }
+
+
+def compare_backends(
+    make_encoder,
+    backends: Sequence[str] = BACKENDS,
+    texts: Sequence[str] = SAMPLE_LEGAL_TEXTS,
+    repeats: int = 3,
+) -> Dict[str, Dict[str, Any]]:
+    """Check every backend against fp32 `torch` on a fixed sample.
+
+    `make_encoder(backend)` must return an object with `encode(texts)`.
+    Backends that fail to load (e.g. onnxruntime missing) are reported
+    with an `error` entry instead of aborting the run.
+    """
+    reference = make_encoder("torch")
+    ref_emb = np.asarray(reference.encode(list(texts)))
+    report: Dict[str, Dict[str, Any]] = {}
+    for backend in backends:
+        try:
+            encoder = reference if backend == "torch" else make_encoder(backend)
+            emb = np.asarray(encoder.encode(list(texts)))
+            report[backend] = {
+                "agreement": cosine_agreement(ref_emb, emb),
+                "throughput": benchmark_throughput(encoder, texts, repeats=repeats),
+            }
+        except Exception as e:
+            report[backend] = {"error": str(e)}
+    return report
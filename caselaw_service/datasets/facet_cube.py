@@ -0,0 +1,218 @@
+"""Precomputed legal_area × court × state × year counts for the Indian dataset.
+
+`IndianLegalDataset.analyze_legal_trends` used to stream the dataset and
+count matching documents on every request, stopping after 2000 matches.
+`FacetCube` holds the exact full-corpus counts as a sparse cube: one row per
+non-empty (legal_area, court, state, year) cell, sorted by legal area so a
+trends query is a slice plus three `np.bincount`s.
+
+The cube is built offline (`scripts/build_facets.py`), stored as a single
+`.npz` at `FACET_CUBE_PATH` and loaded at startup; workers reload it when
+the file is replaced by a rebuild in another process. It remembers how many
+snapshot rows it covers, so refreshing it after the local snapshot grew
+only aggregates the new rows.
+"""
+import json
+import logging
+import os
+import threading
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+FACET_CUBE_PATH = os.getenv("FACET_CUBE_PATH", ".cache/facets/indian_legal_dataset.npz")
+
+DIMENSIONS = ("legal_area", "court", "state", "year")
+
+
+def doc_fingerprint(doc: Dict[str, Any]) -> str:
+    from .embedding_cache import content_key
+    return content_key(json.dumps(doc, sort_keys=True, default=str))
+
+
+def doc_cells(doc: Dict[str, Any]) -> Iterable[Tuple[str, str, str, str]]:
+    """Cube cells a document contributes to (one per distinct legal area)."""
+    court = str(doc.get("court", "unknown"))
+    state = str(doc.get("state", "unknown"))
+    date = doc.get("date", "")
+    year = str(date)[:4] if date else ""
+    for area in dict.fromkeys(doc.get("legal_areas") or []):
+        yield str(area), court, state, year
+
+
+class FacetCube:
+    """Sparse count cube over DIMENSIONS.
+
+    Args:
+        vocab: per-dimension list of values; coords index into these
+        coords: (cells, 4) int32, sorted by legal_area
+        counts: (cells,) int64 documents per cell
+        rows: snapshot rows aggregated so far
+        last_row_key: fingerprint of row `rows - 1`, used to detect a rebuilt snapshot
+    """
+
+    def __init__(self, vocab: Dict[str, List[str]], coords: np.ndarray, counts: np.ndarray,
+                 rows: int = 0, last_row_key: Optional[str] = None):
+        order = np.argsort(coords[:, 0], kind="stable") if len(coords) else np.zeros(0, dtype=np.int64)
+        self.vocab = {dim: list(vocab[dim]) for dim in DIMENSIONS}
+        self.coords = np.asarray(coords, dtype=np.int32).reshape(-1, len(DIMENSIONS))[order]
+        self.counts = np.asarray(counts, dtype=np.int64)[order]
+        self.rows = int(rows)
+        self.last_row_key = last_row_key
+        self._index = {dim: {v: i for i, v in enumerate(values)} for dim, values in self.vocab.items()}
+        n_areas = len(self.vocab["legal_area"])
+        self._offsets = np.searchsorted(self.coords[:, 0], np.arange(n_areas + 1))
+        self._trends: Dict[str, Dict[str, Any]] = {}
+
+    # ---------------- construction -----------------
+    @classmethod
+    def from_counter(cls, cells: Counter, rows: int = 0, last_row_key: Optional[str] = None) -> "FacetCube":
+        vocab = {dim: sorted({cell[d] for cell in cells}) for d, dim in enumerate(DIMENSIONS)}
+        index = {dim: {v: i for i, v in enumerate(values)} for dim, values in vocab.items()}
+        coords = np.array(
+            [[index[dim][cell[d]] for d, dim in enumerate(DIMENSIONS)] for cell in cells],
+            dtype=np.int32,
+        ).reshape(-1, len(DIMENSIONS))
+        counts = np.fromiter(cells.values(), dtype=np.int64, count=len(cells))
+        return cls(vocab, coords, counts, rows=rows, last_row_key=last_row_key)
+
+    @classmethod
+    def from_docs(cls, docs: Iterable[Dict[str, Any]]) -> "FacetCube":
+        return cls.empty().update(docs)
+
+    @classmethod
+    def empty(cls) -> "FacetCube":
+        return cls.from_counter(Counter())
+
+    def to_counter(self) -> Counter:
+        cells: Counter = Counter()
+        for coord, count in zip(self.coords.tolist(), self.counts.tolist()):
+            cells[tuple(self.vocab[dim][i] for dim, i in zip(DIMENSIONS, coord))] = count
+        return cells
+
+    def update(self, docs: Iterable[Dict[str, Any]]) -> "FacetCube":
+        """New cube with `docs` (the rows following `self.rows`) added."""
+        cells = self.to_counter()
+        rows, last = self.rows, self.last_row_key
+        for doc in docs:
+            cells.update(doc_cells(doc))
+            rows += 1
+            last = doc
+        last_key = doc_fingerprint(last) if isinstance(last, dict) else last
+        return FacetCube.from_counter(cells, rows=rows, last_row_key=last_key)
+
+    # ---------------- queries -----------------
+    def trends(self, legal_area: str) -> Dict[str, Any]:
+        """Same shape as IndianLegalDataset.analyze_legal_trends, over the full corpus."""
+        cached = self._trends.get(legal_area)
+        if cached is not None:
+            return cached
+        stats = {
+            "legal_area": legal_area,
+            "court_distribution": {},
+            "state_distribution": {},
+            "temporal_trends": {},
+            "total_cases": 0,
+        }
+        a = self._index["legal_area"].get(legal_area)
+        if a is not None:
+            start, end = self._offsets[a], self._offsets[a + 1]
+            coords, counts = self.coords[start:end], self.counts[start:end]
+            stats["total_cases"] = int(counts.sum())
+            for key, d in (("court_distribution", 1), ("state_distribution", 2), ("temporal_trends", 3)):
+                values = self.vocab[DIMENSIONS[d]]
+                totals = np.bincount(coords[:, d], weights=counts, minlength=len(values))
+                # Undated documents count towards the total but not the timeline
+                stats[key] = {values[i]: int(totals[i]) for i in np.flatnonzero(totals) if values[i] or d != 3}
+        self._trends[legal_area] = stats
+        return stats
+
+    def legal_areas(self) -> List[str]:
+        return list(self.vocab["legal_area"])
+
+    # ---------------- persistence -----------------
+    def save(self, path: str = FACET_CUBE_PATH) -> str:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez_compressed(
+            tmp,
+            coords=self.coords,
+            counts=self.counts,
+            meta=np.array(json.dumps({"rows": self.rows, "last_row_key": self.last_row_key})),
+            **{f"vocab_{dim}": np.array(self.vocab[dim], dtype=str) for dim in DIMENSIONS},
+        )
+        os.replace(tmp, path)
+        return path
+
+    @classmethod
+    def load(cls, path: str = FACET_CUBE_PATH) -> "FacetCube":
+        with np.load(path) as data:
+            meta = json.loads(str(data["meta"]))
+            vocab = {dim: data[f"vocab_{dim}"].tolist() for dim in DIMENSIONS}
+            return cls(vocab, data["coords"], data["counts"], rows=meta["rows"], last_row_key=meta["last_row_key"])
+
+
+def refresh_facet_cube(snapshot: Any, cube: Optional[FacetCube] = None) -> FacetCube:
+    """Bring `cube` up to date with an (append-only) local snapshot.
+
+    Only rows past `cube.rows` are aggregated. If the snapshot shrank or
+    its row `cube.rows - 1` differs from the one the cube last saw, the
+    snapshot was rebuilt and the cube is recomputed from scratch.
+    """
+    n = len(snapshot)
+    if cube is not None and 0 < cube.rows <= n and doc_fingerprint(dict(snapshot[cube.rows - 1])) == cube.last_row_key:
+        start = cube.rows
+    else:
+        cube, start = FacetCube.empty(), 0
+    new_rows = snapshot.select(range(start, n)) if hasattr(snapshot, "select") else (snapshot[i] for i in range(start, n))
+    return cube.update(dict(doc) for doc in new_rows)
+
+
+# Global singleton
+_facet_cube = None
+# Stamp of the file `_facet_cube` was loaded from (None: no file)
+_UNLOADED = object()
+_facet_cube_stamp: Any = _UNLOADED
+_lock = threading.Lock()
+
+
+def _file_stamp(path: str):
+    """Identity of the cube file (replaced atomically on every save)."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_ino, st.st_mtime_ns
+
+
+def get_facet_cube() -> Optional[FacetCube]:
+    """Get the cube stored at FACET_CUBE_PATH, or None if it wasn't built.
+
+    A cube saved by another process is picked up on the next call.
+    """
+    global _facet_cube, _facet_cube_stamp
+    stamp = _file_stamp(FACET_CUBE_PATH)
+    if stamp == _facet_cube_stamp:
+        return _facet_cube
+    with _lock:
+        if stamp != _facet_cube_stamp:
+            cube = None
+            if stamp is not None:
+                try:
+                    cube = FacetCube.load(FACET_CUBE_PATH)
+                except Exception as e:
+                    logger.warning("Could not load facet cube %s: %s", FACET_CUBE_PATH, e)
+            _facet_cube, _facet_cube_stamp = cube, stamp
+    return _facet_cube
+
+
+def set_facet_cube(cube: Optional[FacetCube], save: bool = True):
+    """Install a freshly built/refreshed cube (and persist it)."""
+    global _facet_cube, _facet_cube_stamp
+    if cube is not None and save:
+        cube.save(FACET_CUBE_PATH)
+    with _lock:
+        _facet_cube, _facet_cube_stamp = cube, _file_stamp(FACET_CUBE_PATH)
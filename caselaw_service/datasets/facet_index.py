@@ -0,0 +1,194 @@
+"""Bitmap indexes over categorical fields of a local dataset snapshot.
+
+`IndianLegalDataset.search_by_legal_area_and_state` used to scan the stream
+and give up after `limit * 10` documents, so uncommon legal areas came back
+incomplete. `FacetIndex` stores one packed bitset (NumPy `uint8`, one bit per
+snapshot row) per distinct value of each indexed field; an area ∧ state
+query is a `bitwise_and` of two bitsets, and every matching row id is known
+up front, which gives exact totals and stable pagination.
+
+Layout under `CORPUS_INDEX_DIR/<key>/facets/` (next to the `docs/` snapshot
+the row ids refer to):
+    <field>.npy     (values, ceil(rows / 8)) uint8, memory-mapped
+    <field>.json    the values, in bitset row order
+    meta.json       rows and snapshot fingerprint at build time (written last)
+
+Every file is replaced atomically. Workers reload the index when meta.json
+or the live snapshot changes, and remember an index that doesn't match its
+snapshot until one of them changes.
+"""
+import json
+import logging
+import os
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .corpus_index import corpus_index_path, live_index_dir, load_snapshot
+from .facet_cube import doc_fingerprint
+
+logger = logging.getLogger(__name__)
+
+# Rows read per batch when building from a snapshot.
+_BUILD_BATCH = 10000
+
+
+def facet_index_path(key: str) -> str:
+    return os.path.join(corpus_index_path(key), "facets")
+
+
+def _as_values(value: Any) -> Iterable[str]:
+    if value is None:
+        return ()
+    if isinstance(value, (list, tuple)):
+        return (str(v) for v in value)
+    return (str(value),)
+
+
+class FacetIndex:
+    """Per-value bitsets for a few fields of a snapshot."""
+
+    def __init__(self, directory: str, rows: int, bitsets: Dict[str, np.ndarray], values: Dict[str, List[str]],
+                 last_row_key: Optional[str] = None):
+        self.directory = directory
+        self.rows = rows
+        self.last_row_key = last_row_key
+        self.bitsets = bitsets
+        self.values = values
+        self._positions = {field: {v: i for i, v in enumerate(vals)} for field, vals in values.items()}
+
+    @classmethod
+    def load(cls, directory: str) -> "FacetIndex":
+        with open(os.path.join(directory, "meta.json"), "r") as f:
+            meta = json.load(f)
+        bitsets, values = {}, {}
+        for field in meta["fields"]:
+            bitsets[field] = np.load(os.path.join(directory, f"{field}.npy"), mmap_mode="r")
+            with open(os.path.join(directory, f"{field}.json"), "r") as f:
+                values[field] = json.load(f)
+        for field in meta["fields"]:
+            if bitsets[field].shape != (len(values[field]), (meta["rows"] + 7) // 8):
+                raise ValueError(f"Facet index {directory} field {field} doesn't match meta.json")
+        return cls(directory, meta["rows"], bitsets, values, meta.get("last_row_key"))
+
+    def matches_snapshot(self, snapshot: Any) -> bool:
+        """Whether the bitmap rows line up with `snapshot` (length + last document)."""
+        if snapshot is None or len(snapshot) != self.rows:
+            return False
+        if not self.rows:
+            return True
+        return doc_fingerprint(dict(snapshot[self.rows - 1])) == self.last_row_key
+
+    def bitset(self, field: str, value: str) -> Optional[np.ndarray]:
+        i = self._positions[field].get(value)
+        return None if i is None else self.bitsets[field][i]
+
+    def match(self, **criteria: Optional[str]) -> np.ndarray:
+        """Snapshot row ids matching every non-None `field=value`, ascending."""
+        bits = None
+        for field, value in criteria.items():
+            if value is None:
+                continue
+            row = self.bitset(field, value)
+            if row is None:
+                return np.zeros(0, dtype=np.int64)
+            bits = np.array(row) if bits is None else np.bitwise_and(bits, row)
+        if bits is None:
+            return np.arange(self.rows)
+        return np.flatnonzero(np.unpackbits(bits, count=self.rows))
+
+
+def build_facet_index(key: str, snapshot: Any, fields: Sequence[str]) -> str:
+    """Write bitsets for `fields` of `snapshot` (row i == snapshot[i])."""
+    directory = facet_index_path(key)
+    os.makedirs(directory, exist_ok=True)
+    n = len(snapshot)
+    present = [f for f in fields if f in snapshot.column_names]
+    rows_by_value: Dict[str, Dict[str, List[int]]] = {f: {} for f in present}
+    if present:
+        columns = snapshot.select_columns(present)
+        for start in range(0, n, _BUILD_BATCH):
+            batch = columns[start:start + _BUILD_BATCH]
+            for field in present:
+                by_value = rows_by_value[field]
+                for offset, value in enumerate(batch[field]):
+                    for v in dict.fromkeys(_as_values(value)):
+                        by_value.setdefault(v, []).append(start + offset)
+
+    for field in present:
+        values = sorted(rows_by_value[field])
+        bits = np.zeros((len(values), (n + 7) // 8), dtype=np.uint8)
+        mask = np.zeros(n, dtype=bool)
+        for i, v in enumerate(values):
+            mask[:] = False
+            mask[rows_by_value[field][v]] = True
+            bits[i] = np.packbits(mask)
+        tmp = os.path.join(directory, f"{field}.{os.getpid()}.tmp.npy")
+        np.save(tmp, bits)
+        os.replace(tmp, os.path.join(directory, f"{field}.npy"))
+        _write_json(os.path.join(directory, f"{field}.json"), values)
+
+    _write_json(os.path.join(directory, "meta.json"), {
+        "rows": n,
+        "fields": present,
+        "last_row_key": doc_fingerprint(dict(snapshot[n - 1])) if n else None,
+    })
+    _facet_indexes.pop(key, None)
+    return directory
+
+
+def _write_json(path: str, data: Any):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp, path)
+
+
+# ---------------- Registry -----------------
+# key -> (stamp, index, snapshot)
+_facet_indexes: Dict[str, Tuple[Any, FacetIndex, Any]] = {}
+# key -> stamp of an index that didn't match its snapshot
+_rejected: Dict[str, Any] = {}
+_lock = threading.Lock()
+
+
+def _stamp(key: str):
+    """Identity of the facet meta.json and the snapshot it must match."""
+    try:
+        st = os.stat(os.path.join(facet_index_path(key), "meta.json"))
+    except FileNotFoundError:
+        return None
+    return st.st_ino, st.st_mtime_ns, live_index_dir(key)
+
+
+def get_facet_index(key: str) -> Optional[Tuple[FacetIndex, Any]]:
+    """(index, snapshot) for `key`, or None if no index matches the snapshot on disk.
+
+    A rebuilt index or snapshot is picked up on the next lookup.
+    """
+    stamp = _stamp(key)
+    if stamp is None:
+        return None
+    cached = _facet_indexes.get(key)
+    if cached is not None and cached[0] == stamp:
+        return cached[1:]
+    if _rejected.get(key) == stamp:
+        return None
+    with _lock:
+        cached = _facet_indexes.get(key)
+        if cached is None or cached[0] != stamp:
+            try:
+                index = FacetIndex.load(facet_index_path(key))
+                snapshot = load_snapshot(key)
+            except (OSError, ValueError) as e:
+                index, snapshot = None, None
+                logger.warning("Facet index %s is unusable: %s", key, e)
+            if index is None or not index.matches_snapshot(snapshot):
+                # Row ids would point at the wrong documents
+                logger.warning("Facet index %s does not match its snapshot; rebuild it", key)
+                _rejected[key] = stamp
+                _facet_indexes.pop(key, None)
+                return None
+            cached = _facet_indexes[key] = (stamp, index, snapshot)
+    return cached[1:]
@@ -1,7 +1,7 @@
-import datasets as hf_datasets
 from dataclasses import dataclass
 from typing import List, Dict, Optional
-from . import BaseStreamingDataset, register_dataset
+from . import BaseStreamingDataset, load_stream, register_dataset
+from .query import CompiledQuery
 
 @dataclass
 class IndianCourtDocument:
@@ -21,88 +21,76 @@ class IndianCourtDocument:
 class IndianLegalDataset(BaseStreamingDataset):
     """Streaming wrapper for viber1/indian-law-dataset with advanced helpers."""
     HF_DATASET = "viber1/indian-law-dataset"
+    SEMANTIC_FALLBACK_DOCS = 1000
 
     def _get_dataset(self):
         """Load dataset lazily and cache instance."""
         if not hasattr(self, "_ds"):
-            self._ds = hf_datasets.load_dataset(self.HF_DATASET, split="train", streaming=True)
+            self._ds = load_stream(self.HF_DATASET)
         return self._ds
 
     def search(self, keyword: str, limit: int = 10):
         """Keyword search over text field."""
         ds = self._get_dataset()
-        results = []
-        for doc in ds:
-            if keyword.lower() in doc.get("text", "").lower():
-                results.append(doc)
-                if len(results) >= limit:
-                    break
-        return results
-
-    def semantic_search(self, query: str, limit: int = 10):
-        """Semantic search using sentence-transformers embeddings."""
-        try:
-            from sentence_transformers import SentenceTransformer
-            import numpy as np
-            from sklearn.metrics.pairwise import cosine_similarity
-
-            model = SentenceTransformer('all-MiniLM-L6-v2')
-            query_embedding = model.encode([query])
-
-            ds = self._get_dataset()
-            results = []
-            texts = []
-            docs = []
-
-            # Collect texts and docs
-            for doc in ds:
-                texts.append(doc.get("text", ""))
-                docs.append(doc)
-                if len(texts) >= 1000:  # Limit for streaming performance
-                    break
-
-            if not texts:
-                return []
-
-            doc_embeddings = model.encode(texts)
-            similarities = cosine_similarity(query_embedding, doc_embeddings)[0]
-
-            # Get top results
-            top_indices = np.argsort(similarities)[-limit:][::-1]
-            for idx in top_indices:
-                if similarities[idx] > 0.1:  # Threshold
-                    results.append(docs[idx])
-
-            return results
-
-        except ImportError:
-            # Fallback to keyword search if sentence-transformers not available
-            return self.search(query, limit)
-        except Exception as e:
-            print(f"Semantic search error: {e}")
-            return self.search(query, limit)
+        return self._scan(ds, CompiledQuery(keyword, ["text"]), limit)
 
     # ---------------- Advanced helpers -----------------
-    def search_by_legal_area_and_state(self, legal_area: str, state: str | None = None, limit: int = 100):
-        """Filter by legal area and optionally state (streaming)."""
+    FACET_FIELDS = ("legal_areas", "state")
+
+    def search_by_legal_area_and_state(self, legal_area: str, state: str | None = None, limit: int = 100, offset: int = 0):
+        """Filter by legal area and optionally state."""
+        return self.page_by_legal_area_and_state(legal_area, state, limit=limit, offset=offset)["results"]
+
+    def page_by_legal_area_and_state(self, legal_area: str, state: str | None = None, limit: int = 100, offset: int = 0):
+        """One page of documents in `legal_area` (and `state`).
+
+        With a bitmap index over the local snapshot (see facet_index.py) the
+        page is exact and `total` counts every match in the corpus. Otherwise
+        the stream is scanned and gives up after `(offset + limit) * 10`
+        documents; `total` is then None.
+        """
+        from .facet_index import get_facet_index
+        found = get_facet_index(self.corpus_key())
+        if found is not None:
+            index, snapshot = found
+            rows = index.match(legal_areas=legal_area, state=state or None)
+            page = rows[offset:offset + limit]
+            return {
+                "results": [dict(snapshot[int(r)]) for r in page],
+                "total": int(len(rows)),
+                "offset": offset,
+                "complete": True,
+            }
+
         ds = self._get_dataset()
         results: list[dict] = []
+        matched = 0
         processed = 0
         for doc in ds:
             processed += 1
             if legal_area in doc.get("legal_areas", []):
                 if state and state != doc.get("state", ""):
                     continue
-                results.append(doc)
+                matched += 1
+                if matched > offset:
+                    results.append(doc)
                 if len(results) >= limit:
                     break
-            if processed >= limit * 10:
+            if processed >= (offset + limit) * 10:
                 # Stop early if we have processed many without matches
                 break
-        return results
+        return {"results": results, "total": None, "offset": offset, "complete": False}
 
     def analyze_legal_trends(self, legal_area: str):
-        """Return simple distribution stats over court/state/year for a legal area."""
+        """Return simple distribution stats over court/state/year for a legal area.
+
+        Answered from the precomputed facet cube (exact, full corpus) when one
+        was built; otherwise counts over the first 2000 streamed matches.
+        """
+        from .facet_cube import get_facet_cube
+        cube = get_facet_cube()
+        if cube is not None:
+            return cube.trends(legal_area)
         ds = self._get_dataset()
         stats = {
             "legal_area": legal_area,
@@ -128,21 +116,22 @@ class IndianLegalDataset(BaseStreamingDataset):
                 break
         return stats
 
+    def refresh_snapshot_artifacts(self, snapshot):
+        """Bring the facet cube and bitmap index up to date with a refreshed local snapshot."""
+        from .facet_cube import get_facet_cube, refresh_facet_cube, set_facet_cube
+        from .facet_index import build_facet_index
+        set_facet_cube(refresh_facet_cube(snapshot, get_facet_cube()))
+        build_facet_index(self.corpus_key(), snapshot, self.FACET_FIELDS)
+
 class AsyncIndianLegalWrapper:
-    """Async wrapper delegating to IndianLegalDataset using thread executor."""
+    """Async wrapper delegating to IndianLegalDataset via the shared dataset pool."""
     def __init__(self, **kwargs):
         self.sync_wrapper = IndianLegalDataset(**kwargs)
 
     async def search_by_legal_area_and_state(self, **kwargs):
-        import asyncio
-        from concurrent.futures import ThreadPoolExecutor
-        loop = asyncio.get_event_loop()
-        executor = ThreadPoolExecutor(max_workers=2)
-        return await loop.run_in_executor(executor, self.sync_wrapper.search_by_legal_area_and_state, **kwargs)
+        from ..executors import run_in_pool
+        return await run_in_pool("dataset", self.sync_wrapper.search_by_legal_area_and_state, **kwargs)
 
     async def analyze_legal_trends(self, **kwargs):
-        import asyncio
-        from concurrent.futures import ThreadPoolExecutor
-        loop = asyncio.get_event_loop()
-        executor = ThreadPoolExecutor(max_workers=2)
-        return await loop.run_in_executor(executor, self.sync_wrapper.analyze_legal_trends, **kwargs)
+        from ..executors import run_in_pool
+        return await run_in_pool("dataset", self.sync_wrapper.analyze_legal_trends, **kwargs)
@@ -1,12 +1,13 @@
-import datasets as hf_datasets
-from . import BaseStreamingDataset, register_dataset
+from . import BaseStreamingDataset, load_stream, register_dataset
+from .query import CompiledQuery
 
 @register_dataset("legal_contracts")
 class LegalContractsDataset(BaseStreamingDataset):
     """Streaming wrapper for albertvillanova/legal_contracts."""
     HF_DATASET = "albertvillanova/legal_contracts"
 
-    def search(self, keyword: str, limit: int = 10, field: str = "text", fields: list[str] = None, filters: dict = None):
+    def search(self, keyword: str, limit: int = 10, field: str = "text", fields: list[str] = None, filters: dict = None,
+               columns: list[str] = None):
         """
         Search contracts by keyword in one or more fields, with optional metadata filters (e.g., contract_type, party, date).
         Args:
@@ -15,32 +16,13 @@ class LegalContractsDataset(BaseStreamingDataset):
             field: (legacy) single field name
             fields: List of field names to search (e.g., ["text", "title", "contract_type"])
             filters: Dict of metadata filters, e.g. {"contract_type": "NDA", "party": "Acme Corp"}
+            columns: Fields returned per match (e.g., ["title", "contract_type"]); only the searched,
+                filtered and returned fields are read. Default: whole documents
         """
         try:
-            ds = hf_datasets.load_dataset(self.HF_DATASET, split="train", streaming=True)
-            results = []
+            ds = load_stream(self.HF_DATASET)
             if fields is None:
                 fields = [field] if field else ["text"]
-            for doc in ds:
-                # Field search: match keyword in any specified field
-                match = any(keyword.lower() in (doc.get(f, "") or "").lower() for f in fields)
-                # Metadata filter
-                if match and filters:
-                    for k, v in filters.items():
-                        if v and v.lower() not in str(doc.get(k, "")).lower():
-                            match = False
-                            break
-                if match:
-                    results.append(doc)
-                    if len(results) >= limit:
-                        break
-            return results
+            return self._scan(ds, CompiledQuery(keyword, fields, filters, returns=columns), limit)
         except Exception:
             return []
-
-    def semantic_search(self, query: str, limit: int = 10):
-        """Semantic search using embeddings."""
-        from .semantic_search import semantic_search_docs
-        ds = self._get_dataset()
-        docs = list(ds.take(limit * 10))
-        return semantic_search_docs(docs, query, limit=limit)
@@ -1,34 +1,19 @@
-import datasets as hf_datasets
-from . import BaseStreamingDataset, register_dataset
+from . import BaseStreamingDataset, load_stream, register_dataset
+from .query import CompiledQuery
 
 @register_dataset("legal_summarization")
 class LegalSummarizationDataset(BaseStreamingDataset):
     """Streaming wrapper for lighteval/legal_summarization and summarizer endpoint."""
     HF_DATASET = "lighteval/legal_summarization"
+    TEXT_FIELD = "summary"
 
     def _get_dataset(self):
-        return hf_datasets.load_dataset(self.HF_DATASET, split="train", streaming=True)
+        return load_stream(self.HF_DATASET)
 
     def search(self, keyword: str, limit: int = 10):
         """Search for summaries containing the keyword."""
         ds = self._get_dataset()
-        results = []
-        for doc in ds:
-            if keyword.lower() in doc.get("summary", "").lower():
-                results.append(doc)
-                if len(results) >= limit:
-                    break
-        return results
-
-    def semantic_search(self, query: str, limit: int = 10):
-        """Semantic search using embeddings."""
-        from .semantic_search import semantic_search_docs
-        ds = self._get_dataset()
-        docs = list(ds.take(limit * 10))
-        try:
-            return semantic_search_docs(docs, query, text_field="summary", limit=limit)
-        except Exception:
-            return []
+        return self._scan(ds, CompiledQuery(keyword, ["summary"]), limit)
 
     def summarize(self, text: str) -> str:
         """Summarize a given legal text.
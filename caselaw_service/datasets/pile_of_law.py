@@ -1,5 +1,6 @@
 import datasets as hf_datasets
 from . import BaseStreamingDataset, register_dataset
+from .query import CompiledQuery
 
 @register_dataset("pile_of_law")
 class PileOfLawDataset(BaseStreamingDataset):
@@ -14,17 +15,7 @@ class PileOfLawDataset(BaseStreamingDataset):
     def search(self, keyword: str, limit: int = 10, subset: str = None):
         """Stream and search for keyword in the given subset (data_dir)."""
         ds = self._get_dataset(subset)
-        results = []
-        for doc in ds:
-            if keyword.lower() in doc.get("text", "").lower():
-                results.append(doc)
-                if len(results) >= limit:
-                    break
-        return results
+        return self._scan(ds, CompiledQuery(keyword, ["text"]), limit)
 
-    def semantic_search(self, query: str, limit: int = 10, subset: str = None):
-        """Semantic search using embeddings."""
-        from .semantic_search import semantic_search_docs
-        ds = self._get_dataset(subset)
-        docs = list(ds.take(limit * 10))  # Get more docs for semantic ranking
-        return semantic_search_docs(docs, query, limit=limit)
+    def corpus_key(self, subset: str = None, **kwargs) -> str:
+        return f"pile_of_law/{subset}"
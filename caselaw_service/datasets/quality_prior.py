@@ -0,0 +1,139 @@
+"""Per-item quality priors from user feedback, aligned with corpus indexes.
+
+Each corpus index (see corpus_index.py) gets `quality.f32`, one float32 per
+row of `embeddings.npy`:
+
+    prior = (helpful + s) / (helpful + negative + 2s) - 0.5      in (-0.5, 0.5)
+
+where `negative` counts inaccurate/irrelevant feedback and
+s = QUALITY_PRIOR_STRENGTH pseudo-votes on each side, so a few votes only
+nudge an item. Rankers add QUALITY_PRIOR_WEIGHT * prior to the cosine
+score; that is one vector add over an array already in memory, with no
+per-query I/O.
+
+The file is memory-mapped shared, so an update written by the worker that
+received the feedback is seen by every worker. It is (re)built from the
+feedback store's per-item counts when missing or when the index was
+rebuilt, by the first worker to take its flock, and updated in place as
+feedback arrives. Feedback `item_id`s are
+matched against the index's ID_FIELD column (default `id`); snapshots
+without one use the row number, which semantic results carry as `item_id`.
+"""
+import fcntl
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+QUALITY_PRIOR_WEIGHT = float(os.getenv("QUALITY_PRIOR_WEIGHT", "0.05"))
+QUALITY_PRIOR_STRENGTH = float(os.getenv("QUALITY_PRIOR_STRENGTH", "2"))
+ID_FIELD = "id"
+PRIOR_FILE = "quality.f32"
+
+
+@contextmanager
+def _locked(path: str):
+    fd = os.open(f"{path}.lock", os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(fd)
+
+
+def item_prior(positive: int, negative: int, strength: float = QUALITY_PRIOR_STRENGTH) -> float:
+    return (positive + strength) / (positive + negative + 2 * strength) - 0.5
+
+
+class QualityPrior:
+    """Shared, memory-mapped prior array for one corpus index."""
+
+    def __init__(self, directory: str, rows: int, key: str, snapshot_ids=None):
+        self.directory = directory
+        self.key = key
+        self.path = os.path.join(directory, PRIOR_FILE)
+        self._snapshot_ids = snapshot_ids  # callable -> id column or None
+        self._row_of: Optional[Dict[str, int]] = None
+        self._lock = threading.Lock()
+        # Check and map under the flock, so workers that find the file
+        # missing build it once and all of them map the same inode
+        with _locked(self.path):
+            if not os.path.exists(self.path) or os.path.getsize(self.path) != rows * 4:
+                self._build(rows)
+            self.values = np.memmap(self.path, dtype=np.float32, mode="r+", shape=(rows,))
+
+    def _build(self, rows: int):
+        """Write the prior for every item with feedback (zeros elsewhere)."""
+        from ..feedback import get_feedback_store
+
+        values = np.zeros(rows, dtype=np.float32)
+        for item_id, positive, negative in get_feedback_store().item_counts(self.key):
+            row = self.row(item_id, rows)
+            if row is not None:
+                values[row] = item_prior(positive, negative)
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        values.tofile(tmp)
+        os.replace(tmp, self.path)
+
+    def row(self, item_id: str, rows: Optional[int] = None) -> Optional[int]:
+        """Index row of a feedback item id, or None if it isn't in the corpus."""
+        rows = len(self.values) if rows is None else rows
+        if self._row_of is None:
+            with self._lock:
+                if self._row_of is None:
+                    ids = self._snapshot_ids() if self._snapshot_ids else None
+                    self._row_of = {str(v): i for i, v in enumerate(ids)} if ids is not None else {}
+        if self._row_of:
+            return self._row_of.get(str(item_id))
+        try:
+            row = int(item_id)
+        except (TypeError, ValueError):
+            return None
+        return row if 0 <= row < rows else None
+
+    def update(self, item_id: str, positive: int, negative: int) -> bool:
+        row = self.row(item_id)
+        if row is None:
+            return False
+        self.values[row] = item_prior(positive, negative)
+        return True
+
+    def blend(self, scores: np.ndarray, rows: Any = slice(None), weight: Optional[float] = None) -> np.ndarray:
+        """`scores` (for `rows` of the index) plus the weighted prior."""
+        weight = QUALITY_PRIOR_WEIGHT if weight is None else weight
+        if weight == 0:
+            return scores
+        return scores + weight * self.values[rows]
+
+
+def snapshot_ids(snapshot) -> Optional[Iterable[Any]]:
+    """The ID_FIELD column of a snapshot, or None."""
+    if ID_FIELD in snapshot.column_names:
+        return snapshot[ID_FIELD]
+    return None
+
+
+def record_item_feedback(dataset_name: str, item_id: str, positive: int, negative: int) -> bool:
+    """Update the prior of an item if this worker already ranks with it.
+
+    `dataset_name` comes from the client, so it is only looked up among
+    the corpus indexes the wrappers loaded (never used as a path), and a
+    feedback request never loads an index. Workers that have the prior
+    mapped see the update through the shared file; otherwise the count
+    is picked up when the prior file is next built.
+    """
+    from .corpus_index import loaded_quality_prior
+
+    prior = loaded_quality_prior(dataset_name)
+    if prior is None:
+        return False
+    try:
+        return prior.update(item_id, positive, negative)
+    except Exception as e:
+        logger.warning("Could not update quality prior for %s/%s: %s", dataset_name, item_id, e)
+        return False
@@ -0,0 +1,197 @@
+"""Compiled keyword queries for the multi-field dataset wrappers.
+
+`PatentDataDataset.search` and `LegalContractsDataset.search` used to
+lowercase the keyword and every field of every document, then `str(...)`
+and lowercase each filter value per document. `CompiledQuery` does the
+normalisation once per request:
+
+* keyword terms become one case-insensitive matcher (an Aho–Corasick
+  automaton when `pyahocorasick` is installed and there are several terms,
+  a compiled regex otherwise);
+* filters become (column, lowercased needle) pairs with empty values dropped.
+
+When the dataset can hand out Arrow record batches the query is evaluated
+column-wise with `pyarrow.compute`; only matching rows are converted to
+Python dicts. With `returns` the stream is projected onto the searched,
+filtered and returned columns before it is read, so other columns are
+never decoded. Null values match neither keywords nor filters.
+"""
+import re
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Union
+
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
+# Rows per Arrow batch when scanning a streaming dataset.
+SCAN_BATCH_SIZE = 1000
+
+
+class CompiledQuery:
+    """Case-insensitive "any term in any field" + substring filters.
+
+    Args:
+        keywords: one search term or a list of alternative terms
+        fields: document fields searched for the terms
+        filters: {field: value}; a document matches when `value` occurs
+            (case-insensitively) in `str(doc[field])`. Empty values are ignored.
+        returns: columns of the matching documents to return; None returns
+            whole documents (and disables projection)
+    """
+
+    def __init__(self, keywords: Union[str, Sequence[str]], fields: Sequence[str], filters: Optional[Dict[str, Any]] = None,
+                 returns: Optional[Sequence[str]] = None):
+        terms = [keywords] if isinstance(keywords, str) else list(keywords)
+        self.terms = [t for t in dict.fromkeys(t.lower() for t in terms if t)]
+        self.fields = list(fields)
+        self.filters = [(k, str(v).lower()) for k, v in (filters or {}).items() if v]
+        self.returns = list(returns) if returns is not None else None
+
+        self._automaton = None
+        if AHOCORASICK_AVAILABLE and len(self.terms) > 1:
+            automaton = ahocorasick.Automaton()
+            for term in self.terms:
+                automaton.add_word(term, term)
+            automaton.make_automaton()
+            self._automaton = automaton
+        self._regex = re.compile("|".join(re.escape(t) for t in self.terms), re.IGNORECASE) if self.terms else None
+
+    @property
+    def columns(self) -> Optional[List[str]]:
+        """Columns the query reads, or None when whole documents are returned."""
+        if self.returns is None:
+            return None
+        return list(dict.fromkeys(self.fields + [k for k, _ in self.filters] + self.returns))
+
+    def _project(self, doc: Dict[str, Any]) -> Dict[str, Any]:
+        if self.returns is None:
+            return doc
+        return {k: doc[k] for k in self.returns if k in doc}
+
+    # ---------------- per-document evaluation -----------------
+    def _text_matches(self, text: str) -> bool:
+        if not self.terms:
+            return True
+        if not text:
+            return False
+        if self._automaton is not None:
+            for _ in self._automaton.iter(text.lower()):
+                return True
+            return False
+        return self._regex.search(text) is not None
+
+    def matches(self, doc: Dict[str, Any]) -> bool:
+        if not any(self._text_matches(doc.get(f, "") or "") for f in self.fields):
+            return False
+        for key, needle in self.filters:
+            value = doc.get(key)
+            # Same as the Arrow path: nulls (and missing columns) never match
+            if value is None or needle not in str(value).lower():
+                return False
+        return True
+
+    # ---------------- Arrow batch evaluation -----------------
+    def _arrow_text_mask(self, column):
+        import pyarrow as pa
+        import pyarrow.compute as pc
+
+        if not pa.types.is_string(column.type) and not pa.types.is_large_string(column.type):
+            column = pc.cast(column, pa.large_string())
+        if len(self.terms) == 1:
+            mask = pc.match_substring(column, self.terms[0], ignore_case=True)
+        else:
+            mask = pc.match_substring_regex(column, self._regex.pattern, ignore_case=True)
+        return pc.fill_null(mask, False)
+
+    def match_table(self, table) -> "Any":
+        """Boolean mask (pyarrow array) of matching rows in an Arrow table."""
+        import pyarrow as pa
+        import pyarrow.compute as pc
+
+        names = set(table.column_names)
+        if not self.terms:
+            mask = pa.array([True] * table.num_rows)
+        else:
+            mask = pa.array([False] * table.num_rows)
+            for field in self.fields:
+                if field in names:
+                    mask = pc.or_(mask, self._arrow_text_mask(table.column(field)))
+        for key, needle in self.filters:
+            if key not in names:
+                # str(missing) == "" never contains a non-empty needle
+                return pa.array([False] * table.num_rows)
+            col = table.column(key)
+            if not pa.types.is_string(col.type) and not pa.types.is_large_string(col.type):
+                col = pc.cast(col, pa.large_string())
+            mask = pc.and_(mask, pc.fill_null(pc.match_substring(col, needle, ignore_case=True), False))
+        return mask
+
+    def filter_table(self, table, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        try:
+            matched = table.filter(self.match_table(table))
+        except Exception:
+            # Nested / non-castable column: evaluate this batch row by row
+            rows = [self._project(doc) for doc in table.to_pylist() if self.matches(doc)]
+            return rows[:limit] if limit is not None else rows
+        if limit is not None:
+            matched = matched.slice(0, limit)
+        if self.returns is not None:
+            matched = matched.select([c for c in self.returns if c in matched.column_names])
+        return matched.to_pylist()
+
+    # ---------------- scanning -----------------
+    def scan(self, dataset: Iterable, limit: int, stop: Any = None,
+             stats: Optional[Dict[str, int]] = None) -> List[Dict[str, Any]]:
+        """First `limit` matching documents of `dataset`, in dataset order.
+
+        `stop` (an Event-like object) ends the scan early once set; it is
+        polled per Arrow batch or every `SCAN_BATCH_SIZE` documents. The
+        number of rows read is added to `stats["rows"]` when given.
+        """
+        results: List[Dict[str, Any]] = []
+        rows = 0
+        tables = arrow_batches(dataset, columns=self.columns)
+        if tables is None:
+            for doc in dataset:
+                rows += 1
+                if self.matches(doc):
+                    results.append(self._project(doc))
+                    if len(results) >= limit:
+                        break
+                if stop is not None and rows % SCAN_BATCH_SIZE == 1 and stop.is_set():
+                    break
+        else:
+            for table in tables:
+                rows += table.num_rows
+                results.extend(self.filter_table(table, limit - len(results)))
+                if len(results) >= limit or (stop is not None and stop.is_set()):
+                    break
+        if stats is not None:
+            stats["rows"] = stats.get("rows", 0) + rows
+        return results
+
+
+def arrow_batches(dataset: Any, batch_size: int = SCAN_BATCH_SIZE,
+                  columns: Optional[Sequence[str]] = None) -> Optional[Iterator[Any]]:
+    """Iterator of Arrow tables for HF datasets, or None for plain iterables.
+
+    With `columns` the dataset is projected onto those of them it has
+    before iterating, so other columns are not decoded.
+    """
+    if not (hasattr(dataset, "with_format") and hasattr(dataset, "iter")):
+        return None
+    if columns is not None and hasattr(dataset, "select_columns"):
+        # Streaming datasets may not know their columns until read
+        names = getattr(dataset, "column_names", None)
+        keep = [c for c in columns if c in names] if names is not None else list(columns)
+        try:
+            dataset = dataset.select_columns(keep)
+        except Exception:
+            pass
+    try:
+        return dataset.with_format("arrow").iter(batch_size=batch_size)
+    except Exception:
+        return None
+
@@ -1,13 +1,52 @@
-"""Shared semantic search utilities for all dataset wrappers."""
+"""Shared semantic search utilities for all dataset wrappers.
+
+The sentence encoder is loaded on first use (or by `start_warmup()` in a
+background thread at service startup), never at import time.
+"""
+import importlib.util
+import threading
 import numpy as np
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+from .embedding_cache import get_embedding_store
+from .encoders import load_sentence_encoder
+
+SEMANTIC_SEARCH_AVAILABLE = importlib.util.find_spec("sentence_transformers") is not None
+
+_model = None
+_model_lock = threading.Lock()
+
+
+def get_model():
+    """Return the shared sentence encoder, loading it on first call.
+
+    Returns None when sentence-transformers is not installed so callers can
+    fall back to keyword matching.
+    """
+    global _model, SEMANTIC_SEARCH_AVAILABLE
+    if _model is None and SEMANTIC_SEARCH_AVAILABLE:
+        with _model_lock:
+            if _model is None:
+                try:
+                    _model = load_sentence_encoder()
+                except ImportError:
+                    SEMANTIC_SEARCH_AVAILABLE = False
+    return _model
 
-try:
-    from sentence_transformers import SentenceTransformer
-    model = SentenceTransformer('all-MiniLM-L6-v2')
-    SEMANTIC_SEARCH_AVAILABLE = True
-except ImportError:
-    SEMANTIC_SEARCH_AVAILABLE = False
+
+def start_warmup() -> Optional[threading.Thread]:
+    """Load the encoder in a daemon thread so the first query doesn't pay for it."""
+    if _model is not None or not SEMANTIC_SEARCH_AVAILABLE:
+        return None
+
+    def _warm():
+        try:
+            get_model()
+        except Exception as e:
+            print(f"Semantic model warmup failed: {e}")
+
+    thread = threading.Thread(target=_warm, name="semantic-model-warmup", daemon=True)
+    thread.start()
+    return thread
 
 
 def semantic_search_docs(
@@ -18,7 +57,12 @@ def semantic_search_docs(
     threshold: float = 0.1
 ) -> List[Dict[str, Any]]:
     """Perform semantic search over documents."""
-    if not SEMANTIC_SEARCH_AVAILABLE:
+    try:
+        model = get_model()
+    except Exception as e:
+        print(f"Semantic model load error: {e}")
+        model = None
+    if model is None:
         # Fallback to keyword search
         return [doc for doc in docs if query.lower() in doc.get(text_field, "").lower()][:limit]
 
@@ -29,7 +73,8 @@ def semantic_search_docs(
         if not texts:
             return []
 
-        doc_embeddings = model.encode(texts)
+        store = get_embedding_store()
+        doc_embeddings = store.encode(model, texts) if store else model.encode(texts)
         
         # Compute cosine similarities
         from sklearn.metrics.pairwise import cosine_similarity
@@ -0,0 +1,150 @@
+"""Parallel keyword scans over the shards of a streaming dataset.
+
+A HF streaming dataset is backed by a list of files (`n_shards`). A rare
+keyword used to make `search` read every file on one core; `parallel_scan`
+instead hands each shard to a process pool, where the `CompiledQuery` runs
+against that shard only.
+
+Results are merged in shard order: once shards 0..k have finished and
+together hold `limit` matches, the remaining shards are cancelled (queued
+ones never start; running ones see the shared stop event and return at the
+next batch). The answer is therefore deterministic and, with contiguous
+sharding, identical to the serial scan.
+
+Every API worker process starts its own pool (plus a Manager process for
+the stop event), so a host runs up to `API workers x SHARD_SCAN_WORKERS`
+scan processes. Size it so that product stays near the CPU count, e.g.
+cpu_count // API workers.
+
+Configuration:
+    SHARD_SCAN_WORKERS        scan processes per API worker; 0 -> os.cpu_count(),
+                              1 disables (default 1)
+    SHARD_SCAN_START_METHOD   multiprocessing start method (default spawn)
+"""
+import atexit
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Any, Dict, List, Optional, Tuple
+
+from .query import CompiledQuery
+
+logger = logging.getLogger(__name__)
+
+SHARD_SCAN_WORKERS = int(os.getenv("SHARD_SCAN_WORKERS", "1")) or (os.cpu_count() or 1)
+SHARD_SCAN_START_METHOD = os.getenv("SHARD_SCAN_START_METHOD", "spawn")
+
+
+def split_shards(dataset: Any) -> Optional[List[Any]]:
+    """One sub-dataset per underlying file, or None if `dataset` can't be split."""
+    n_shards = getattr(dataset, "n_shards", None)
+    if not isinstance(n_shards, int) or n_shards < 2:
+        return None
+    if hasattr(dataset, "shard"):
+        return [dataset.shard(num_shards=n_shards, index=i) for i in range(n_shards)]
+    # datasets<3: world_size == n_shards assigns whole files to each "node"
+    from datasets.distributed import split_dataset_by_node
+    return [split_dataset_by_node(dataset, rank=i, world_size=n_shards) for i in range(n_shards)]
+
+
+def _scan_shard(shard: Any, query: CompiledQuery, limit: int, stop: Any) -> Tuple[List[Dict[str, Any]], int]:
+    """(matches, rows read) for one shard."""
+    if stop.is_set():
+        return [], 0
+    stats: Dict[str, int] = {}
+    results = query.scan(shard, limit, stop=stop, stats=stats)
+    return results, stats.get("rows", 0)
+
+
+class ShardScanner:
+    """Process pool that scans dataset shards concurrently."""
+
+    def __init__(self, max_workers: int = SHARD_SCAN_WORKERS, start_method: str = SHARD_SCAN_START_METHOD):
+        self.max_workers = max_workers
+        self.start_method = start_method
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._manager = None
+        self._lock = threading.Lock()
+
+    def _ensure_pool(self):
+        with self._lock:
+            if self._pool is None:
+                ctx = multiprocessing.get_context(self.start_method)
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=ctx)
+                # Manager events are picklable, so each request gets its own
+                self._manager = ctx.Manager()
+            return self._pool, self._manager
+
+    def scan(self, shards: List[Any], query: CompiledQuery, limit: int,
+             stats: Optional[Dict[str, int]] = None) -> List[Dict[str, Any]]:
+        pool, manager = self._ensure_pool()
+        stop = manager.Event()
+        futures = {pool.submit(_scan_shard, shard, query, limit, stop): i for i, shard in enumerate(shards)}
+        done_results: Dict[int, List[Dict[str, Any]]] = {}
+        results: List[Dict[str, Any]] = []
+        next_shard = 0
+        rows = 0
+        pending = set(futures)
+        try:
+            while pending and len(results) < limit:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    done_results[futures[fut]], shard_rows = fut.result()
+                    rows += shard_rows
+                # Merge the contiguous prefix of finished shards
+                while next_shard in done_results and len(results) < limit:
+                    results.extend(done_results.pop(next_shard))
+                    next_shard += 1
+        finally:
+            stop.set()
+            for fut in pending:
+                fut.cancel()
+            if stats is not None:
+                stats["rows"] = stats.get("rows", 0) + rows
+        return results[:limit]
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+            if self._manager is not None:
+                self._manager.shutdown()
+                self._manager = None
+
+
+# Global singleton
+_shard_scanner = None
+
+
+def get_shard_scanner() -> ShardScanner:
+    """Get singleton ShardScanner (the pool itself starts on first use)."""
+    global _shard_scanner
+    if _shard_scanner is None:
+        _shard_scanner = ShardScanner()
+        atexit.register(_shard_scanner.shutdown)
+    return _shard_scanner
+
+
+def parallel_scan(dataset: Any, query: CompiledQuery, limit: int,
+                  stats: Optional[Dict[str, int]] = None) -> List[Dict[str, Any]]:
+    """`query.scan(dataset, limit)`, spread over the dataset's shards when possible.
+
+    Rows read (by every shard, merged or not) are added to `stats["rows"]`.
+    """
+    shards = split_shards(dataset) if SHARD_SCAN_WORKERS > 1 else None
+    if not shards:
+        return query.scan(dataset, limit, stats=stats)
+    shard_stats: Dict[str, int] = {}
+    try:
+        results = get_shard_scanner().scan(shards, query, limit, stats=shard_stats)
+    except Exception as e:
+        # Pool/pickling problems, or one shard failing (a bad row, a Hub
+        # read error): the serial scan either succeeds or raises the cause
+        logger.warning("Parallel shard scan failed, scanning serially: %s", e)
+        return query.scan(dataset, limit, stats=stats)
+    if stats is not None:
+        stats["rows"] = stats.get("rows", 0) + shard_stats.get("rows", 0)
+    return results
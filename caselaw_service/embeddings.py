@@ -4,47 +4,91 @@ Sprint implementation: in-memory FAISS or fallback to naive string match.
 """
 import os
 import json
+import importlib.util
 from typing import List
 import numpy as np
 
-try:
-    import faiss
-    FAISS_AVAILABLE = True
-except ImportError:
-    FAISS_AVAILABLE = False
+# faiss is imported when an index is actually built, not at service import
+FAISS_AVAILABLE = importlib.util.find_spec("faiss") is not None
 
 EMBEDDINGS_PATH = os.getenv("CASELAW_EMBEDDINGS_PATH", "caselaw_embeddings.json")
 
 class EmbeddingIndex:
-    def __init__(self, path=EMBEDDINGS_PATH):
+    def __init__(self, path=EMBEDDINGS_PATH, shared=None):
+        from caselaw_service import shared_artifacts
+
         self.ready = False
         self.titles = []
         self.ids = []
         self.embeddings = None
-        if os.path.exists(path):
-            with open(path, "r") as f:
-                data = json.load(f)
-            self.titles = [d["case_name"] for d in data]
-            self.ids = [d["id"] for d in data]
-            arr = np.array([d["embedding"] for d in data], dtype=np.float32)
-            if FAISS_AVAILABLE:
-                self.index = faiss.IndexFlatL2(arr.shape[1])
-                self.index.add(arr)
-                self.embeddings = arr
-            else:
-                self.embeddings = arr
-            self.ready = True
+        self.index = None
+        self.shared = shared_artifacts.PRELOAD_ARTIFACTS if shared is None else shared
+        if not os.path.exists(path):
+            return
+        if self.shared and self._attach_shared(path):
+            return
+        with open(path, "r") as f:
+            data = json.load(f)
+        self.titles = [d["case_name"] for d in data]
+        self.ids = [d["id"] for d in data]
+        arr = np.array([d["embedding"] for d in data], dtype=np.float32)
+        if self.shared:
+            # Workers map one copy instead of each building a private index
+            self._publish_shared(path, arr)
+            self._attach_shared(path)
+            return
+        if FAISS_AVAILABLE:
+            import faiss
+            self.index = faiss.IndexFlatL2(arr.shape[1])
+            self.index.add(arr)
+        self.embeddings = arr
+        self.sq_norms = (arr * arr).sum(axis=1)
+        self.ready = True
+
+    # ---------------- shared (mmapped) mode -----------------
+    _ARTIFACT = "caselaw_embeddings"
+
+    def _attach_shared(self, path) -> bool:
+        from caselaw_service import shared_artifacts as sa
+
+        meta = sa.attach_json(self._ARTIFACT + ".meta")
+        if not meta or meta.get("source") != os.path.abspath(path) or meta.get("mtime") != os.path.getmtime(path):
+            return False
+        embeddings = sa.attach_array(self._ARTIFACT + ".matrix")
+        sq_norms = sa.attach_array(self._ARTIFACT + ".sq_norms")
+        titles = sa.attach_strings(self._ARTIFACT + ".titles")
+        ids = sa.attach_strings(self._ARTIFACT + ".ids")
+        if any(x is None for x in (embeddings, sq_norms, titles, ids)):
+            return False
+        self.embeddings, self.sq_norms, self.titles, self.ids = embeddings, sq_norms, titles, ids
+        self.ready = True
+        return True
+
+    def _publish_shared(self, path, arr):
+        from caselaw_service import shared_artifacts as sa
+
+        sa.publish_array(self._ARTIFACT + ".matrix", arr)
+        sa.publish_array(self._ARTIFACT + ".sq_norms", (arr * arr).sum(axis=1))
+        sa.publish_strings(self._ARTIFACT + ".titles", self.titles)
+        sa.publish_strings(self._ARTIFACT + ".ids", [str(i) for i in self.ids])
+        # Meta last: it marks the artifact set as complete
+        sa.publish_json(self._ARTIFACT + ".meta", {"source": os.path.abspath(path), "mtime": os.path.getmtime(path)})
 
     def search(self, query_emb, top_k=5):
         if not self.ready:
             return []
-        if FAISS_AVAILABLE:
+        if self.index is not None:
             D, I = self.index.search(np.array([query_emb], dtype=np.float32), top_k)
             return [(int(i), float(d)) for i, d in zip(I[0], D[0])]
         else:
-            # Fallback: brute-force L2
-            dists = np.linalg.norm(self.embeddings - np.array(query_emb), axis=1)
-            idxs = np.argsort(dists)[:top_k]
+            # Brute-force squared L2 (same metric as IndexFlatL2) without an n x d temporary
+            q = np.asarray(query_emb, dtype=np.float32)
+            dists = self.sq_norms - 2.0 * (self.embeddings @ q) + float(q @ q)
+            top_k = min(top_k, len(dists))
+            if top_k <= 0:
+                return []
+            idxs = np.argpartition(dists, top_k - 1)[:top_k]
+            idxs = idxs[np.argsort(dists[idxs])]
             return [(int(i), float(dists[i])) for i in idxs]
 
 # For demo: random embedding for a query (replace with real model)
@@ -0,0 +1,253 @@
+"""Service-wide, bounded thread pools for blocking work reached from async code.
+
+Async routes must not run streaming dataset scans or model inference on the
+event loop, and must not create a `ThreadPoolExecutor` per call either (the
+threads are never reclaimed). Instead they go through a named pool:
+
+    dataset     I/O-bound streaming scans and Hub reads      DATASET_POOL_WORKERS (default 8)
+    inference   CPU-bound encoding / summarization           INFERENCE_POOL_WORKERS (default min(4, cpus))
+    export      background export jobs (export_jobs.py)      EXPORT_POOL_WORKERS (default 2)
+
+    results = await run_in_pool("dataset", ds.search, keyword, limit=10)
+
+Each pool admits at most `max_workers + max_queue` tasks (`*_POOL_QUEUE`,
+default 4x workers); beyond that `PoolSaturated` is raised and the API
+answers 503. When the queue reaches EXECUTOR_ALERT_QUEUE_RATIO of its bound
+a saturation warning is logged (at most once per EXECUTOR_ALERT_INTERVAL_S
+per pool). Queue depth, wait and run times are exposed via `get_stats()`
+(served under `/admin/metrics`). Pools are shut down with the app.
+"""
+import asyncio
+import contextvars
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from itertools import islice
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+_CPUS = os.cpu_count() or 1
+DATASET_POOL_WORKERS = int(os.getenv("DATASET_POOL_WORKERS", "8"))
+DATASET_POOL_QUEUE = int(os.getenv("DATASET_POOL_QUEUE", str(DATASET_POOL_WORKERS * 4)))
+INFERENCE_POOL_WORKERS = int(os.getenv("INFERENCE_POOL_WORKERS", str(min(4, _CPUS))))
+INFERENCE_POOL_QUEUE = int(os.getenv("INFERENCE_POOL_QUEUE", str(INFERENCE_POOL_WORKERS * 4)))
+EXPORT_POOL_WORKERS = int(os.getenv("EXPORT_POOL_WORKERS", "2"))
+EXPORT_POOL_QUEUE = int(os.getenv("EXPORT_POOL_QUEUE", "64"))
+EXECUTOR_ALERT_QUEUE_RATIO = float(os.getenv("EXECUTOR_ALERT_QUEUE_RATIO", "0.8"))
+EXECUTOR_ALERT_INTERVAL_S = float(os.getenv("EXECUTOR_ALERT_INTERVAL_S", "60"))
+
+# name -> (max_workers, max_queue)
+POOL_DEFAULTS: Dict[str, tuple] = {
+    "dataset": (DATASET_POOL_WORKERS, DATASET_POOL_QUEUE),
+    "inference": (INFERENCE_POOL_WORKERS, INFERENCE_POOL_QUEUE),
+    "export": (EXPORT_POOL_WORKERS, EXPORT_POOL_QUEUE),
+}
+
+
+class PoolSaturated(RuntimeError):
+    """Raised when a pool's queue is full; callers should shed load (HTTP 503)."""
+
+    def __init__(self, pool: str):
+        super().__init__(f"Executor pool '{pool}' is saturated")
+        self.pool = pool
+
+
+class ManagedPool:
+    """A ThreadPoolExecutor with admission control and queue metrics."""
+
+    def __init__(self, name: str, max_workers: int, max_queue: int):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"pool-{name}")
+        self._lock = threading.Lock()
+        self._closed = False
+        self.active = 0
+        self.queued = 0
+        self.max_queued = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.saturation_alerts = 0
+        self._wait_s = 0.0
+        self._run_s = 0.0
+        self._last_alert = 0.0
+
+    def _maybe_alert_locked(self):
+        if self.max_queue <= 0 or self.queued < EXECUTOR_ALERT_QUEUE_RATIO * self.max_queue:
+            return
+        now = time.monotonic()
+        if now - self._last_alert < EXECUTOR_ALERT_INTERVAL_S:
+            return
+        self._last_alert = now
+        self.saturation_alerts += 1
+        logger.warning(
+            "Executor pool '%s' near saturation: %d running, %d queued (bound %d)",
+            self.name, self.active, self.queued, self.max_queue,
+        )
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        """Schedule `fn(*args, **kwargs)`; raises PoolSaturated when full."""
+        return self._submit(fn, args, kwargs, admit=True)
+
+    def _submit(self, fn: Callable, args: tuple, kwargs: Dict[str, Any], admit: bool) -> Future:
+        with self._lock:
+            if self._closed:
+                raise RuntimeError(f"Executor pool '{self.name}' is shut down")
+            if admit and self.active + self.queued >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                raise PoolSaturated(self.name)
+            self.queued += 1
+            self.submitted += 1
+            self.max_queued = max(self.max_queued, self.queued)
+            self._maybe_alert_locked()
+        enqueued = time.perf_counter()
+        # Carry the caller's context (request ids, spans) into the worker thread
+        ctx = contextvars.copy_context()
+
+        def _run():
+            started = time.perf_counter()
+            with self._lock:
+                self.queued -= 1
+                self.active += 1
+                self._wait_s += started - enqueued
+            try:
+                return ctx.run(fn, *args, **kwargs)
+            except BaseException:
+                with self._lock:
+                    self.failed += 1
+                raise
+            finally:
+                with self._lock:
+                    self.active -= 1
+                    self.completed += 1
+                    self._run_s += time.perf_counter() - started
+
+        try:
+            future = self._executor.submit(_run)
+        except RuntimeError:
+            with self._lock:
+                self.queued -= 1
+            raise
+        future.add_done_callback(self._release_if_cancelled)
+        return future
+
+    def _release_if_cancelled(self, future: Future):
+        # A future cancelled while queued (awaiting coroutine cancelled, or
+        # shutdown) never runs `_run`, so its queue slot is released here.
+        # Once `_run` has started the future can no longer be cancelled.
+        if future.cancelled():
+            with self._lock:
+                self.queued -= 1
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    async def run_continuation(self, fn: Callable, *args, **kwargs) -> Any:
+        """Like `run`, without the saturation check: for later steps of work
+        this pool already admitted, which must not fail halfway."""
+        return await asyncio.wrap_future(self._submit(fn, args, kwargs, admit=False))
+
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            self._closed = True
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            done = self.completed
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "active": self.active,
+                "queued": self.queued,
+                "max_queued": self.max_queued,
+                "submitted": self.submitted,
+                "completed": done,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "saturation_alerts": self.saturation_alerts,
+                "avg_wait_ms": self._wait_s * 1000 / done if done else 0.0,
+                "avg_run_ms": self._run_s * 1000 / done if done else 0.0,
+            }
+
+
+class ExecutorManager:
+    """Registry of named ManagedPools, created on first use."""
+
+    def __init__(self, defaults: Optional[Dict[str, tuple]] = None):
+        self.defaults = dict(POOL_DEFAULTS if defaults is None else defaults)
+        self._pools: Dict[str, ManagedPool] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, max_workers: int, max_queue: Optional[int] = None) -> ManagedPool:
+        with self._lock:
+            if name in self._pools:
+                raise ValueError(f"Executor pool '{name}' already exists")
+            pool = ManagedPool(name, max_workers, max_workers * 4 if max_queue is None else max_queue)
+            self._pools[name] = pool
+            return pool
+
+    def get(self, name: str) -> ManagedPool:
+        pool = self._pools.get(name)
+        if pool is not None:
+            return pool
+        with self._lock:
+            if name not in self._pools:
+                if name not in self.defaults:
+                    raise KeyError(f"Unknown executor pool '{name}'")
+                self._pools[name] = ManagedPool(name, *self.defaults[name])
+            return self._pools[name]
+
+    async def run(self, name: str, fn: Callable, *args, **kwargs) -> Any:
+        return await self.get(name).run(fn, *args, **kwargs)
+
+    def shutdown(self, wait: bool = True):
+        """Stop every pool; later `get()` calls start fresh ones."""
+        with self._lock:
+            pools, self._pools = list(self._pools.values()), {}
+        for pool in pools:
+            pool.shutdown(wait=wait)
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        return {name: pool.get_stats() for name, pool in list(self._pools.items())}
+
+
+# Global singleton
+_executor_manager = None
+
+
+def get_executor_manager() -> ExecutorManager:
+    """Get singleton ExecutorManager instance."""
+    global _executor_manager
+    if _executor_manager is None:
+        _executor_manager = ExecutorManager()
+    return _executor_manager
+
+
+async def run_in_pool(name: str, fn: Callable, *args, **kwargs) -> Any:
+    """Run blocking `fn` in the named service pool and await its result."""
+    return await get_executor_manager().run(name, fn, *args, **kwargs)
+
+
+async def iterate_in_pool(name: str, iterable: Any, chunk_size: int = 256):
+    """Async iterator over a blocking iterable (e.g. a HF stream).
+
+    Items are pulled `chunk_size` at a time in the named pool, so the event
+    loop only ever runs the consumer's per-item work and gets control back
+    between chunks. Admission is checked once, when iteration starts: a
+    stream that started (e.g. a response whose 200 was already sent) is
+    never cut off by PoolSaturated.
+    """
+    pool = get_executor_manager().get(name)
+    iterator = await pool.run(iter, iterable)
+    while True:
+        chunk = await pool.run_continuation(lambda: list(islice(iterator, chunk_size)))
+        if not chunk:
+            return
+        for item in chunk:
+            yield item
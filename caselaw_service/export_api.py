@@ -1,77 +1,362 @@
-"""Bulk export endpoints for datasets."""
-from fastapi import APIRouter, Depends, HTTPException, Query
-from fastapi.responses import StreamingResponse
-import csv
-import json
-import io
+"""Bulk export endpoints for datasets.
+
+Exports stream: documents are read from the dataset and encoded chunk by
+chunk in the "dataset" executor pool while earlier chunks are already on
+the wire (chunked transfer encoding), so memory stays constant regardless
+of `limit`. Up to EXPORT_MAX_ROWS rows can be exported by anyone; larger or
+unbounded (`limit=0`) exports need a role listed in EXPORT_UNLIMITED_ROLES.
+
+`/parquet` and `/arrow` stream columnar record batches for bulk consumers,
+with column selection (`columns=a,b`) and row filters (`keyword` over
+`fields`, plus `where=column:value` substring filters) evaluated on the
+Arrow batches before projection.
+
+`/export/jobs` runs large exports in the background as resumable chunked
+files (see export_jobs.py) that are downloaded with HTTP Range requests.
+"""
+import os
 from datetime import datetime
-from typing import Optional
+from itertools import chain
+from typing import Any, Dict, List, Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
 from caselaw_service.auth import get_current_user
 from .datasets import get_dataset
+from .executors import PoolSaturated, get_executor_manager, iterate_in_pool, run_in_pool
+from .export_jobs import CONCATENABLE_FORMATS, JOB_FORMATS, JobLimitExceeded, get_export_job_manager
+from .exporters import COLUMNAR_ENCODERS, ENCODERS, iter_docs, record_batches
+
+EXPORT_MAX_ROWS = int(os.getenv("EXPORT_MAX_ROWS", "10000"))
+EXPORT_UNLIMITED_ROLES = {r.strip() for r in os.getenv("EXPORT_UNLIMITED_ROLES", "admin,service_role").split(",") if r.strip()}
 
 router = APIRouter(prefix="/export", tags=["export"])
 
+
+def check_export_limit(limit: int, user: Dict[str, Any]) -> Optional[int]:
+    """Validate `limit` for `user`; returns the row cap (None = unbounded)."""
+    if limit == 0 or limit > EXPORT_MAX_ROWS:
+        if (user or {}).get("role") not in EXPORT_UNLIMITED_ROLES:
+            raise HTTPException(status_code=403, detail=f"Exports above {EXPORT_MAX_ROWS} rows require elevated access")
+    return limit or None
+
+
+def _filename(dataset_name: str, ext: str) -> str:
+    return f"{dataset_name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{ext}"
+
+
+async def open_export_stream(dataset_name: str, limit: Optional[int], subset: Optional[str] = None):
+    """Open the document stream and read its first row (404 if there is none)."""
+    try:
+        ds = await run_in_pool("dataset", get_dataset, dataset_name)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Dataset '{dataset_name}' not found")
+    kwargs = {"subset": subset} if subset else {}
+    try:
+        docs = await run_in_pool("dataset", iter_docs, ds, limit, **kwargs)
+        first = await run_in_pool("dataset", next, docs, None)
+    except PoolSaturated:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if first is None:
+        raise HTTPException(status_code=404, detail="Dataset empty or not found")
+    return chain([first], docs)
+
+
+async def _stream_export(dataset_name: str, fmt: str, limit: int, subset: Optional[str], user: Dict[str, Any]):
+    encode, media_type = ENCODERS[fmt]
+    docs = await open_export_stream(dataset_name, check_export_limit(limit, user), subset)
+    return StreamingResponse(
+        # One encoded chunk is pulled from the pool at a time
+        iterate_in_pool("dataset", encode(docs), chunk_size=1),
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename={_filename(dataset_name, fmt)}"},
+    )
+
+
 @router.get("/datasets/{dataset_name}/csv")
 async def export_dataset_csv(
     dataset_name: str,
-    limit: int = Query(1000, ge=1, le=10000),
+    limit: int = Query(1000, ge=0, description="Rows to export; 0 = all (elevated access)"),
+    subset: Optional[str] = Query(None, description="pile_of_law subset"),
     user=Depends(get_current_user)
 ):
-    """Export dataset as CSV."""
-    try:
-        ds = get_dataset(dataset_name)
-        docs = list(ds.take(limit))
-        
-        if not docs:
-            raise HTTPException(status_code=404, detail="Dataset empty or not found")
-        
-        # Create CSV in memory
-        output = io.StringIO()
-        if docs:
-            writer = csv.DictWriter(output, fieldnames=docs[0].keys())
-            writer.writeheader()
-            for doc in docs:
-                writer.writerow(doc)
-        
-        output.seek(0)
-        
-        return StreamingResponse(
-            io.BytesIO(output.getvalue().encode()),
-            media_type="text/csv",
-            headers={
-                "Content-Disposition": f"attachment; filename={dataset_name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-            }
-        )
-    
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    """Export dataset as CSV (streamed)."""
+    return await _stream_export(dataset_name, "csv", limit, subset, user)
+
 
 @router.get("/datasets/{dataset_name}/json")
 async def export_dataset_json(
     dataset_name: str,
-    limit: int = Query(1000, ge=1, le=10000),
+    limit: int = Query(1000, ge=0, description="Rows to export; 0 = all (elevated access)"),
+    subset: Optional[str] = Query(None, description="pile_of_law subset"),
     user=Depends(get_current_user)
 ):
-    """Export dataset as JSON."""
+    """Export dataset as a JSON array (streamed)."""
+    return await _stream_export(dataset_name, "json", limit, subset, user)
+
+
+@router.get("/datasets/{dataset_name}/ndjson")
+async def export_dataset_ndjson(
+    dataset_name: str,
+    limit: int = Query(1000, ge=0, description="Rows to export; 0 = all (elevated access)"),
+    subset: Optional[str] = Query(None, description="pile_of_law subset"),
+    user=Depends(get_current_user)
+):
+    """Export dataset as newline-delimited JSON (streamed)."""
+    return await _stream_export(dataset_name, "ndjson", limit, subset, user)
+
+
+def _split(value: Optional[str]) -> Optional[List[str]]:
+    return [v.strip() for v in value.split(",") if v.strip()] if value else None
+
+
+def parse_row_filter(ds: Any, keyword: Optional[str], fields: Optional[str], where: List[str]):
+    """CompiledQuery for the export's row filters, or None when unfiltered."""
+    from .datasets.query import CompiledQuery
+
+    filters = {}
+    for clause in where:
+        column, sep, value = clause.partition(":")
+        if not sep or not column:
+            raise HTTPException(status_code=400, detail=f"Invalid where clause '{clause}', expected column:value")
+        filters[column] = value
+    if not keyword and not filters:
+        return None
+    return CompiledQuery(keyword or [], _split(fields) or [ds.TEXT_FIELD], filters)
+
+
+async def _stream_columnar(
+    dataset_name: str, fmt: str, limit: int, subset: Optional[str], columns: Optional[str],
+    keyword: Optional[str], fields: Optional[str], where: List[str], user: Dict[str, Any],
+):
+    encode, media_type = COLUMNAR_ENCODERS[fmt]
+    cap = check_export_limit(limit, user)
+    try:
+        ds = await run_in_pool("dataset", get_dataset, dataset_name)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Dataset '{dataset_name}' not found")
+    query = parse_row_filter(ds, keyword, fields, where)
+    kwargs = {"subset": subset} if subset else {}
     try:
-        ds = get_dataset(dataset_name)
-        docs = list(ds.take(limit))
-        
-        if not docs:
-            raise HTTPException(status_code=404, detail="Dataset empty or not found")
-        
-        # Create JSON in memory
-        output = io.StringIO()
-        json.dump(docs, output, indent=2, default=str)
-        output.seek(0)
-        
-        return StreamingResponse(
-            io.BytesIO(output.getvalue().encode()),
-            media_type="application/json",
-            headers={
-                "Content-Disposition": f"attachment; filename={dataset_name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-            }
-        )
-    
+        stream = await run_in_pool("dataset", ds._get_dataset, **kwargs)
+        tables = record_batches(stream, query=query, columns=_split(columns), limit=cap)
+        first = await run_in_pool("dataset", next, tables, None)
+    except PoolSaturated:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    if first is None:
+        raise HTTPException(status_code=404, detail="No matching rows")
+    return StreamingResponse(
+        iterate_in_pool("dataset", encode(chain([first], tables)), chunk_size=1),
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename={_filename(dataset_name, fmt)}"},
+    )
+
+
+@router.get("/datasets/{dataset_name}/parquet")
+async def export_dataset_parquet(
+    dataset_name: str,
+    limit: int = Query(1000, ge=0, description="Rows to export; 0 = all (elevated access)"),
+    subset: Optional[str] = Query(None, description="pile_of_law subset"),
+    columns: Optional[str] = Query(None, description="Comma-separated columns to export"),
+    keyword: Optional[str] = Query(None, description="Only rows containing keyword in `fields`"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields searched for keyword"),
+    where: List[str] = Query([], description="column:value substring filters"),
+    user=Depends(get_current_user)
+):
+    """Export dataset as Parquet (zstd, one row group per record batch)."""
+    return await _stream_columnar(dataset_name, "parquet", limit, subset, columns, keyword, fields, where, user)
+
+
+@router.get("/datasets/{dataset_name}/arrow")
+async def export_dataset_arrow(
+    dataset_name: str,
+    limit: int = Query(1000, ge=0, description="Rows to export; 0 = all (elevated access)"),
+    subset: Optional[str] = Query(None, description="pile_of_law subset"),
+    columns: Optional[str] = Query(None, description="Comma-separated columns to export"),
+    keyword: Optional[str] = Query(None, description="Only rows containing keyword in `fields`"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields searched for keyword"),
+    where: List[str] = Query([], description="column:value substring filters"),
+    user=Depends(get_current_user)
+):
+    """Export dataset as an Arrow IPC stream."""
+    return await _stream_columnar(dataset_name, "arrow", limit, subset, columns, keyword, fields, where, user)
+
+
+# ---------------- Background export jobs -----------------
+class ExportJobRequest(BaseModel):
+    dataset: str
+    format: str = "ndjson"  # "ndjson", "csv", "parquet"
+    limit: int = 0  # 0 = all rows (elevated access)
+    subset: Optional[str] = None
+
+
+# Bytes read per file read when serving job downloads.
+_READ_BYTES = 256 * 1024
+
+
+def _user_id(user: Dict[str, Any]) -> str:
+    return (user or {}).get("sub", "anon")
+
+
+def _owned_job(job_id: str, user: Dict[str, Any]) -> Dict[str, Any]:
+    job = get_export_job_manager().get(job_id)
+    if job is None or job["user_id"] != _user_id(user):
+        raise HTTPException(status_code=404, detail="Export job not found")
+    return job
+
+
+def _submit_job(job: Dict[str, Any]):
+    manager = get_export_job_manager()
+    try:
+        get_executor_manager().get("export").submit(manager.run, job["id"])
+    except PoolSaturated:
+        # Persisted, so the job shows up as resumable rather than stuck queued
+        manager.mark_interrupted(job)
+        raise
+
+
+def _parse_range(header: Optional[str], total: int):
+    """(start, end) inclusive for a single `bytes=` range; None to serve everything."""
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    first, _, last = header[len("bytes="):].strip().partition("-")
+    try:
+        if first:
+            start, end = int(first), int(last) if last else total - 1
+        else:
+            start, end = total - int(last), total - 1
+    except ValueError:
+        return None
+    start, end = max(start, 0), min(end, total - 1)
+    if start > end:
+        raise HTTPException(status_code=416, detail="Range not satisfiable", headers={"Content-Range": f"bytes */{total}"})
+    return start, end
+
+
+def _read_parts(paths, start: int, end: int):
+    """Bytes [start, end] of the concatenation of `paths` (blocking generator)."""
+    offset = 0
+    for path in paths:
+        size = os.path.getsize(path)
+        if offset + size > start and offset <= end:
+            with open(path, "rb") as f:
+                f.seek(max(start - offset, 0))
+                left = min(end, offset + size - 1) - max(start, offset) + 1
+                while left > 0:
+                    data = f.read(min(_READ_BYTES, left))
+                    if not data:
+                        break
+                    left -= len(data)
+                    yield data
+        offset += size
+
+
+def _range_response(paths, range_header: Optional[str], media_type: str, filename: str):
+    total = sum(os.path.getsize(p) for p in paths)
+    headers = {"Accept-Ranges": "bytes", "Content-Disposition": f"attachment; filename={filename}"}
+    byte_range = _parse_range(range_header, total) if total else None
+    status = 200
+    start, end = 0, total - 1
+    if byte_range is not None:
+        start, end = byte_range
+        status = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{total}"
+    headers["Content-Length"] = str(end - start + 1 if total else 0)
+    return StreamingResponse(
+        iterate_in_pool("dataset", _read_parts(paths, start, end), chunk_size=4),
+        status_code=status, media_type=media_type, headers=headers,
+    )
+
+
+@router.post("/jobs", status_code=202)
+async def create_export_job(body: ExportJobRequest, user=Depends(get_current_user)):
+    """Start a background export; poll the job and download its chunks."""
+    if body.format not in JOB_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {sorted(JOB_FORMATS)}")
+    check_export_limit(body.limit, user)
+    try:
+        await run_in_pool("dataset", get_dataset, body.dataset)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Dataset '{body.dataset}' not found")
+    try:
+        job = get_export_job_manager().create(_user_id(user), body.dataset, body.format, body.limit or None, body.subset)
+    except JobLimitExceeded as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    _submit_job(job)
+    return job
+
+
+@router.get("/jobs")
+async def list_export_jobs(user=Depends(get_current_user)):
+    return {"jobs": get_export_job_manager().list(_user_id(user))}
+
+
+@router.get("/jobs/{job_id}")
+async def get_export_job(job_id: str, user=Depends(get_current_user)):
+    return _owned_job(job_id, user)
+
+
+@router.post("/jobs/{job_id}/resume", status_code=202)
+async def resume_export_job(job_id: str, user=Depends(get_current_user)):
+    """Continue a failed or interrupted job after its last completed chunk."""
+    job = _owned_job(job_id, user)
+    if job["status"] in ("failed", "interrupted"):
+        try:
+            job = get_export_job_manager().prepare_resume(job_id)
+        except JobLimitExceeded as e:
+            raise HTTPException(status_code=429, detail=str(e))
+        _submit_job(job)
+    return job
+
+
+@router.delete("/jobs/{job_id}")
+async def delete_export_job(job_id: str, user=Depends(get_current_user)):
+    """Cancel a job (if running) and delete its files."""
+    _owned_job(job_id, user)
+    await run_in_pool("dataset", get_export_job_manager().cancel, job_id)
+    return {"deleted": job_id}
+
+
+@router.get("/jobs/{job_id}/chunks")
+async def list_export_chunks(
+    job_id: str,
+    cursor: int = Query(0, ge=0, description="Index of the first chunk not yet downloaded"),
+    limit: int = Query(100, ge=1, le=1000),
+    user=Depends(get_current_user),
+):
+    """Completed chunks from `cursor`; poll again from `next_cursor`."""
+    _owned_job(job_id, user)
+    return get_export_job_manager().chunk_page(job_id, cursor, limit)
+
+
+@router.get("/jobs/{job_id}/chunks/{index}")
+async def download_export_chunk(
+    job_id: str, index: int, range: Optional[str] = Header(None), user=Depends(get_current_user)
+):
+    """One chunk file (supports Range)."""
+    job = _owned_job(job_id, user)
+    try:
+        paths = get_export_job_manager().file_parts(job_id, index)
+    except IndexError:
+        raise HTTPException(status_code=404, detail="Chunk not written yet")
+    return _range_response(paths, range, JOB_FORMATS[job["format"]], os.path.basename(paths[0]))
+
+
+@router.get("/jobs/{job_id}/download")
+async def download_export(job_id: str, range: Optional[str] = Header(None), user=Depends(get_current_user)):
+    """The whole export as one file (supports Range, so broken downloads can resume)."""
+    job = _owned_job(job_id, user)
+    if job["status"] != "completed":
+        raise HTTPException(status_code=409, detail=f"Export job is {job['status']}")
+    if job["format"] not in CONCATENABLE_FORMATS:
+        raise HTTPException(status_code=400, detail="Download parquet exports chunk by chunk")
+    paths = get_export_job_manager().file_parts(job_id)
+    return _range_response(paths, range, JOB_FORMATS[job["format"]], f"{job['dataset']}_{job_id}.{job['format']}")
@@ -0,0 +1,329 @@
+"""Resumable background export jobs.
+
+A synchronous export is lost if the connection drops near the end. An
+export job instead runs in the "export" executor pool and writes the
+export as numbered chunk files of EXPORT_JOB_CHUNK_ROWS rows under
+`EXPORT_JOB_DIR/<job id>/`, next to a `job.json` manifest that is rewritten
+after every completed chunk. Clients poll the job, list chunks from a
+cursor (the next chunk index they need) and download chunks or the whole
+file with HTTP Range requests.
+
+A failed job, or one found `interrupted` because the worker process that
+ran it has exited, can be resumed and continues after its last completed
+chunk.
+Each user may have at most EXPORT_JOBS_PER_USER queued/running jobs.
+"""
+import fcntl
+import json
+import logging
+import os
+import re
+import shutil
+import socket
+import threading
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from itertools import islice
+from typing import Any, Dict, List, Optional
+
+from .exporters import csv_chunks, iter_docs, ndjson_chunks, parquet_chunks, record_batches
+
+logger = logging.getLogger(__name__)
+
+EXPORT_JOB_DIR = os.getenv("EXPORT_JOB_DIR", ".cache/exports")
+EXPORT_JOB_CHUNK_ROWS = int(os.getenv("EXPORT_JOB_CHUNK_ROWS", "5000"))
+EXPORT_JOBS_PER_USER = int(os.getenv("EXPORT_JOBS_PER_USER", "2"))
+
+# Formats whose chunk files concatenate into one valid file.
+CONCATENABLE_FORMATS = {"csv", "ndjson"}
+JOB_FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson", "parquet": "application/vnd.apache.parquet"}
+ACTIVE_STATES = {"queued", "running"}
+
+_JOB_ID = re.compile(r"[0-9a-f]{32}")
+_HOST = socket.gethostname()
+
+
+class JobLimitExceeded(RuntimeError):
+    pass
+
+
+def _now() -> str:
+    return datetime.utcnow().isoformat()
+
+
+def _owner_alive(job: Dict[str, Any]) -> bool:
+    """Whether the process that owns `job` still runs (assumed so on other hosts)."""
+    if job.get("owner_host") != _HOST:
+        return job.get("owner_host") is not None
+    try:
+        os.kill(job["owner_pid"], 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _encode_chunk(job: Dict[str, Any], docs: List[Dict[str, Any]]) -> bytes:
+    if job["format"] == "ndjson":
+        return b"".join(ndjson_chunks(docs))
+    if job["format"] == "csv":
+        # Columns are fixed by the first chunk and only it carries the header,
+        # so chunk files concatenate into one CSV
+        first_chunk = not job.get("fieldnames")
+        if first_chunk:
+            job["fieldnames"] = list(docs[0].keys())
+        return b"".join(csv_chunks(docs, fieldnames=job["fieldnames"], header=first_chunk))
+    return b"".join(parquet_chunks(record_batches(docs, batch_rows=len(docs))))
+
+
+class ExportJobManager:
+    """Creates, runs and tracks export jobs; state lives in per-job manifests.
+
+    Every worker process has its own manager over the same directory, so
+    `job.json` is the source of truth and is re-read on every lookup. State
+    changes happen under a directory-wide `flock`. A job records the process
+    that runs it (`owner_pid` on `owner_host`); a queued or running job is
+    marked `interrupted` only once that process is gone.
+    """
+
+    def __init__(self, directory: str = EXPORT_JOB_DIR, chunk_rows: int = EXPORT_JOB_CHUNK_ROWS,
+                 per_user: int = EXPORT_JOBS_PER_USER):
+        self.directory = directory
+        self.chunk_rows = chunk_rows
+        self.per_user = per_user
+        self._cancel: Dict[str, threading.Event] = {}
+        self._lock = threading.Lock()
+
+    # ---------------- persistence -----------------
+    def _job_dir(self, job_id: str) -> str:
+        return os.path.join(self.directory, job_id)
+
+    def chunk_path(self, job: Dict[str, Any], index: int) -> str:
+        return os.path.join(self._job_dir(job["id"]), f"chunk-{index:05d}.{job['format']}")
+
+    @contextmanager
+    def _locked(self):
+        """Serialize state changes across threads and worker processes."""
+        os.makedirs(self.directory, exist_ok=True)
+        with self._lock:
+            fd = os.open(os.path.join(self.directory, ".lock"), os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                yield
+            finally:
+                os.close(fd)
+
+    def _save(self, job: Dict[str, Any]):
+        job["updated_at"] = _now()
+        path = os.path.join(self._job_dir(job["id"]), "job.json")
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(job, f, indent=2)
+        os.replace(tmp, path)
+
+    def _read(self, job_id: str) -> Optional[Dict[str, Any]]:
+        if not _JOB_ID.fullmatch(job_id):
+            return None
+        try:
+            with open(os.path.join(self._job_dir(job_id), "job.json"), "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning("Skipping unreadable export job %s: %s", job_id, e)
+            return None
+
+    def _orphaned(self, job: Dict[str, Any]) -> bool:
+        return job["status"] in ACTIVE_STATES and not _owner_alive(job)
+
+    def _interrupt_orphan(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        # Caller holds _locked(); the worker died with its process
+        if self._orphaned(job):
+            job["status"] = "interrupted"
+            self._save(job)
+        return job
+
+    def _claim(self, job: Dict[str, Any]):
+        job["owner_pid"], job["owner_host"] = os.getpid(), _HOST
+
+    def _read_all(self) -> List[Dict[str, Any]]:
+        if not os.path.isdir(self.directory):
+            return []
+        return [j for j in map(self._read, os.listdir(self.directory)) if j is not None]
+
+    def _active_jobs(self, user_id: str) -> int:
+        return sum(1 for j in self._read_all()
+                   if j["user_id"] == user_id and j["status"] in ACTIVE_STATES and not self._orphaned(j))
+
+    # ---------------- lifecycle -----------------
+    def create(self, user_id: str, dataset: str, fmt: str, limit: Optional[int] = None,
+               subset: Optional[str] = None) -> Dict[str, Any]:
+        if fmt not in JOB_FORMATS:
+            raise ValueError(f"Unsupported export format '{fmt}'")
+        with self._locked():
+            if self._active_jobs(user_id) >= self.per_user:
+                raise JobLimitExceeded(f"At most {self.per_user} export jobs may run per user")
+            job = {
+                "id": uuid.uuid4().hex,
+                "user_id": user_id,
+                "dataset": dataset,
+                "format": fmt,
+                "limit": limit,
+                "subset": subset,
+                "status": "queued",
+                "chunk_rows": self.chunk_rows,
+                "chunks": [],
+                "rows_written": 0,
+                "error": None,
+                "created_at": _now(),
+            }
+            self._claim(job)
+            os.makedirs(self._job_dir(job["id"]), exist_ok=True)
+            self._save(job)
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self._read(job_id)
+        if job is not None and self._orphaned(job):
+            with self._locked():
+                job = self._read(job_id)
+                if job is not None:
+                    self._interrupt_orphan(job)
+        return job
+
+    def list(self, user_id: str) -> List[Dict[str, Any]]:
+        jobs = [self.get(j["id"]) if self._orphaned(j) else j for j in self._read_all() if j["user_id"] == user_id]
+        return sorted((j for j in jobs if j is not None), key=lambda j: j["created_at"])
+
+    def prepare_resume(self, job_id: str) -> Dict[str, Any]:
+        """Requeue a failed/interrupted job; it continues after its last chunk."""
+        with self._locked():
+            job = self._read(job_id)
+            if job is None:
+                raise KeyError(job_id)
+            self._interrupt_orphan(job)
+            if job["status"] in ACTIVE_STATES or job["status"] == "completed":
+                return job
+            if self._active_jobs(job["user_id"]) >= self.per_user:
+                raise JobLimitExceeded(f"At most {self.per_user} export jobs may run per user")
+            job["status"], job["error"] = "queued", None
+            self._claim(job)
+            self._save(job)
+        return job
+
+    def mark_interrupted(self, job: Dict[str, Any]):
+        """A queued job that could not be submitted; it can be resumed later."""
+        with self._locked():
+            job["status"] = "interrupted"
+            self._save(job)
+
+    def cancel(self, job_id: str):
+        """Stop a job and delete its files (a runner in another worker stops at its next chunk)."""
+        event = self._cancel.get(job_id)
+        if event is not None:
+            event.set()
+        if _JOB_ID.fullmatch(job_id):
+            with self._locked():
+                shutil.rmtree(self._job_dir(job_id), ignore_errors=True)
+
+    # ---------------- worker -----------------
+    def run(self, job_id: str):
+        """Write the job's remaining chunks (blocking; run in the export pool)."""
+        from .datasets import get_dataset
+
+        with self._locked():
+            job = self._read(job_id)
+            # Only the process that queued the job runs it
+            if job is None or job["status"] != "queued" or job.get("owner_pid") != os.getpid():
+                return
+            job["status"] = "running"
+            self._save(job)
+        cancel = self._cancel.setdefault(job_id, threading.Event())
+        job_dir = self._job_dir(job_id)
+
+        def cancelled() -> bool:
+            return cancel.is_set() or not os.path.exists(os.path.join(job_dir, "job.json"))
+
+        def commit(chunk: Optional[str] = None) -> bool:
+            # cancel() deletes the directory under the lock, so state is only
+            # written under it too; a write racing the delete would recreate
+            # job.json (or leave a stray file) and resurrect the job
+            with self._locked():
+                if cancelled():
+                    shutil.rmtree(job_dir, ignore_errors=True)
+                    return False
+                if chunk is not None:
+                    os.replace(chunk + ".tmp", chunk)
+                self._save(job)
+                return True
+
+        try:
+            ds = get_dataset(job["dataset"])
+            kwargs = {"subset": job["subset"]} if job["subset"] else {}
+            # Resume: skip the rows already committed to chunk files
+            docs = islice(iter_docs(ds, None, **kwargs), job["rows_written"], job["limit"])
+            while not cancelled():
+                rows = list(islice(docs, job["chunk_rows"]))
+                if not rows:
+                    break
+                index = len(job["chunks"])
+                data = _encode_chunk(job, rows)
+                path = self.chunk_path(job, index)
+                with open(path + ".tmp", "wb") as f:
+                    f.write(data)
+                job["chunks"].append({"index": index, "rows": len(rows), "bytes": len(data)})
+                job["rows_written"] += len(rows)
+                if not commit(path):
+                    return
+            if cancelled():
+                return
+            job["status"] = "completed"
+        except Exception as e:
+            if cancelled():
+                return
+            logger.warning("Export job %s failed: %s", job_id, e)
+            job["status"], job["error"] = "failed", str(e)
+        finally:
+            self._cancel.pop(job_id, None)
+        commit()
+
+    # ---------------- downloads -----------------
+    def _require(self, job_id: str) -> Dict[str, Any]:
+        job = self.get(job_id)
+        if job is None:
+            raise KeyError(job_id)
+        return job
+
+    def chunk_page(self, job_id: str, cursor: int = 0, limit: int = 100) -> Dict[str, Any]:
+        """Chunks from index `cursor`; `next_cursor` is where the next poll starts."""
+        job = self._require(job_id)
+        chunks = job["chunks"][cursor:cursor + limit]
+        next_cursor = cursor + len(chunks)
+        return {
+            "chunks": chunks,
+            "next_cursor": next_cursor,
+            "complete": job["status"] == "completed" and next_cursor >= len(job["chunks"]),
+        }
+
+    def file_parts(self, job_id: str, index: Optional[int] = None) -> List[str]:
+        """Paths served for one chunk, or for the whole export when index is None."""
+        job = self._require(job_id)
+        if index is not None:
+            if not 0 <= index < len(job["chunks"]):
+                raise IndexError(index)
+            return [self.chunk_path(job, index)]
+        return [self.chunk_path(job, c["index"]) for c in job["chunks"]]
+
+
+# Global singleton
+_export_job_manager = None
+
+
+def get_export_job_manager() -> ExportJobManager:
+    """Get singleton ExportJobManager instance."""
+    global _export_job_manager
+    if _export_job_manager is None:
+        _export_job_manager = ExportJobManager()
+    return _export_job_manager
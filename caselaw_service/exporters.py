@@ -0,0 +1,199 @@
+"""Streaming encoders for dataset exports.
+
+Every encoder takes an iterator of documents (or, for the columnar formats,
+Arrow tables) and yields encoded `bytes` chunks as rows are read, so an
+export holds one chunk in memory no matter how many rows it covers. The
+generators are blocking (they pull from HF streams); `export_api` drives
+them from the "dataset" executor pool.
+"""
+import csv
+import io
+import json
+import os
+from itertools import chain, islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence
+
+EXPORT_CHUNK_BYTES = int(os.getenv("EXPORT_CHUNK_BYTES", str(64 * 1024)))
+
+
+def iter_docs(ds: Any, limit: Optional[int] = None, **kwargs) -> Iterator[Dict[str, Any]]:
+    """First `limit` documents of a dataset wrapper's stream (all if None)."""
+    stream = iter(ds._get_dataset(**kwargs))
+    return islice(stream, limit) if limit else stream
+
+
+def _buffered(pieces: Iterable[str], chunk_bytes: int = EXPORT_CHUNK_BYTES) -> Iterator[bytes]:
+    buf, size = [], 0
+    for piece in pieces:
+        data = piece.encode("utf-8")
+        buf.append(data)
+        size += len(data)
+        if size >= chunk_bytes:
+            yield b"".join(buf)
+            buf, size = [], 0
+    if buf:
+        yield b"".join(buf)
+
+
+def csv_chunks(docs: Iterable[Dict[str, Any]], fieldnames: Optional[Sequence[str]] = None,
+               header: bool = True) -> Iterator[bytes]:
+    """CSV with `fieldnames` (default: the first document's keys); extra keys are dropped."""
+    def rows():
+        docs_iter = iter(docs)
+        first = next(docs_iter, None)
+        if first is None:
+            return
+        line = io.StringIO()
+        writer = csv.DictWriter(line, fieldnames=list(fieldnames or first.keys()), extrasaction="ignore")
+        if header:
+            writer.writeheader()
+        for doc in chain([first], docs_iter):
+            writer.writerow(doc)
+            yield line.getvalue()
+            line.seek(0)
+            line.truncate()
+    return _buffered(rows())
+
+
+def ndjson_chunks(docs: Iterable[Dict[str, Any]]) -> Iterator[bytes]:
+    """One JSON object per line."""
+    return _buffered(json.dumps(doc, default=str) + "\n" for doc in docs)
+
+
+def json_array_chunks(docs: Iterable[Dict[str, Any]]) -> Iterator[bytes]:
+    """A single JSON array, written element by element."""
+    def pieces():
+        yield "["
+        for i, doc in enumerate(docs):
+            yield ("\n" if i == 0 else ",\n") + json.dumps(doc, default=str)
+        yield "\n]\n"
+    return _buffered(pieces())
+
+
+ENCODERS = {
+    "csv": (csv_chunks, "text/csv"),
+    "json": (json_array_chunks, "application/json"),
+    "ndjson": (ndjson_chunks, "application/x-ndjson"),
+}
+
+
+# ---------------- Columnar formats -----------------
+# Rows per Arrow record batch (= Parquet row group) in columnar exports.
+COLUMNAR_BATCH_ROWS = int(os.getenv("COLUMNAR_BATCH_ROWS", "10000"))
+
+
+def record_batches(
+    stream: Any,
+    query: Any = None,
+    columns: Optional[Sequence[str]] = None,
+    limit: Optional[int] = None,
+    batch_rows: int = COLUMNAR_BATCH_ROWS,
+) -> Iterator[Any]:
+    """Arrow tables of the (filtered, projected) rows of a dataset stream.
+
+    HF datasets hand out Arrow batches directly and `query` (a CompiledQuery)
+    is evaluated column-wise on them; plain iterables are batched through
+    `pa.Table.from_pylist` with the first batch's schema. Rows are filtered
+    before projection, so filters may use columns that aren't exported;
+    HF streams are read with only the exported and filtered columns.
+    """
+    import pyarrow as pa
+    from .datasets.query import arrow_batches
+
+    read = None
+    if columns:
+        needed = query.fields + [k for k, _ in query.filters] if query is not None else []
+        read = list(dict.fromkeys([*columns, *needed]))
+    tables = arrow_batches(stream, batch_size=batch_rows, columns=read)
+    if tables is None:
+        def _from_pylist():
+            schema = None
+            docs = iter(stream)
+            while True:
+                rows = list(islice(docs, batch_rows))
+                if not rows:
+                    return
+                table = pa.Table.from_pylist(rows, schema=schema)
+                schema = schema or table.schema
+                yield table
+        tables = _from_pylist()
+
+    remaining = limit
+    for table in tables:
+        if query is not None:
+            table = table.filter(query.match_table(table))
+        if columns:
+            missing = [c for c in columns if c not in table.column_names]
+            if missing:
+                raise ValueError(f"Unknown column(s): {', '.join(missing)}")
+            table = table.select(list(columns))
+        if remaining is not None:
+            table = table.slice(0, remaining)
+            remaining -= table.num_rows
+        if table.num_rows:
+            yield table
+        if remaining is not None and remaining <= 0:
+            return
+
+
+class _ChunkSink:
+    """Write-only file object whose contents are drained after each write."""
+
+    def __init__(self):
+        self._parts: List[bytes] = []
+        self._pos = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._parts.append(data)
+        self._pos += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._pos
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data, self._parts = b"".join(self._parts), []
+        return data
+
+
+def _columnar_chunks(tables: Iterable[Any], open_writer) -> Iterator[bytes]:
+    sink = _ChunkSink()
+    writer = None
+    for table in tables:
+        if writer is None:
+            writer = open_writer(sink, table.schema)
+        writer.write_table(table)
+        data = sink.drain()
+        if data:
+            yield data
+    if writer is not None:
+        writer.close()
+        data = sink.drain()
+        if data:
+            yield data
+
+
+def parquet_chunks(tables: Iterable[Any]) -> Iterator[bytes]:
+    """Parquet file, one row group per table, streamed as row groups are written."""
+    import pyarrow.parquet as pq
+    return _columnar_chunks(tables, lambda sink, schema: pq.ParquetWriter(sink, schema, compression="zstd"))
+
+
+def arrow_ipc_chunks(tables: Iterable[Any]) -> Iterator[bytes]:
+    """Arrow IPC stream format (readable with `pyarrow.ipc.open_stream`)."""
+    import pyarrow as pa
+    return _columnar_chunks(tables, lambda sink, schema: pa.ipc.new_stream(sink, schema))
+
+
+COLUMNAR_ENCODERS = {
+    "parquet": (parquet_chunks, "application/vnd.apache.parquet"),
+    "arrow": (arrow_ipc_chunks, "application/vnd.apache.arrow.stream"),
+}
@@ -1,64 +1,248 @@
-"""User feedback and data quality flagging system."""
-from fastapi import APIRouter, Depends, HTTPException
-from pydantic import BaseModel
-from typing import Dict, Any, List
+"""User feedback and data quality flagging system.
+
+Feedback is stored in SQLite (FEEDBACK_DB_PATH, default
+`.cache/feedback.sqlite3`) so it survives restarts and is shared by all
+workers on a host. Rows are indexed by user and by dataset, and every
+insert updates a `feedback_counters` row per (dataset, feedback type) and
+a per-user count in the same transaction, so `/feedback/stats` reads a
+table whose size depends on the number of datasets and types, not on how
+much feedback was submitted. Per-item helpful vs. inaccurate/irrelevant
+counts feed the search ranking prior in `datasets/quality_prior.py`; they
+count voters, not submissions: each user holds one vote per item (their
+latest helpful/inaccurate/irrelevant feedback), so resubmitting can't push
+an item's prior.
+"""
+import os
+import sqlite3
+import threading
+from fastapi import APIRouter, Depends, HTTPException, Query
+from pydantic import BaseModel, Field
+from typing import Dict, Any, List, Literal, Optional
 from datetime import datetime
 from caselaw_service.auth import get_current_user
+from caselaw_service.datasets.quality_prior import record_item_feedback
+from caselaw_service.executors import run_in_pool
 
 router = APIRouter(prefix="/feedback", tags=["feedback"])
 
+FEEDBACK_DB_PATH = os.getenv("FEEDBACK_DB_PATH", ".cache/feedback.sqlite3")
+
 class FeedbackRequest(BaseModel):
     dataset_name: str
     item_id: str
-    feedback_type: str  # "helpful", "inaccurate", "irrelevant", "other"
+    feedback_type: Literal["helpful", "inaccurate", "irrelevant", "other"]
     comment: str = ""
-    user_rating: int = None  # 1-5 stars
+    user_rating: Optional[int] = Field(None, ge=1, le=5)  # 1-5 stars
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS feedback (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    dataset_name TEXT NOT NULL,
+    item_id TEXT NOT NULL,
+    feedback_type TEXT NOT NULL,
+    comment TEXT NOT NULL DEFAULT '',
+    user_rating INTEGER,
+    submitted_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS feedback_by_user ON feedback (user_id, id);
+CREATE INDEX IF NOT EXISTS feedback_by_dataset ON feedback (dataset_name, item_id);
+CREATE TABLE IF NOT EXISTS feedback_counters (
+    dataset_name TEXT NOT NULL,
+    feedback_type TEXT NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    rating_sum INTEGER NOT NULL DEFAULT 0,
+    rating_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (dataset_name, feedback_type)
+);
+CREATE TABLE IF NOT EXISTS feedback_item_counts (
+    dataset_name TEXT NOT NULL,
+    item_id TEXT NOT NULL,
+    positive INTEGER NOT NULL DEFAULT 0,
+    negative INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (dataset_name, item_id)
+);
+CREATE TABLE IF NOT EXISTS feedback_item_votes (
+    dataset_name TEXT NOT NULL,
+    item_id TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    vote INTEGER NOT NULL,
+    PRIMARY KEY (dataset_name, item_id, user_id)
+);
+CREATE TABLE IF NOT EXISTS feedback_user_counts (
+    user_id TEXT PRIMARY KEY,
+    count INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+# Feedback types counted for and against an item's quality prior
+POSITIVE_TYPES = {"helpful"}
+NEGATIVE_TYPES = {"inaccurate", "irrelevant"}
+
+_COLUMNS = ("id", "user_id", "dataset_name", "item_id", "feedback_type", "comment", "user_rating", "submitted_at")
 
 class FeedbackStore:
-    """Simple feedback storage."""
-    def __init__(self):
-        self.feedback = []
-        
-    def add_feedback(self, feedback: Dict[str, Any]):
-        """Add user feedback."""
+    """SQLite-backed feedback storage with incrementally maintained counters."""
+    def __init__(self, path: str = FEEDBACK_DB_PATH):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            if path != ":memory:":
+                # Readers in other workers don't block the writer
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            has_votes = self._conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'feedback_item_votes'"
+            ).fetchone()
+            self._conn.executescript(_SCHEMA)
+            if not has_votes:
+                self._migrate_item_counts()
+
+    def _migrate_item_counts(self):
+        """Recount items by distinct voters (databases from before per-user votes)."""
+        types = sorted(POSITIVE_TYPES | NEGATIVE_TYPES)
+        marks = ", ".join("?" * len(types))
+        positive = ", ".join("?" * len(POSITIVE_TYPES))
+        self._conn.execute(
+            "INSERT INTO feedback_item_votes (dataset_name, item_id, user_id, vote)"
+            f" SELECT dataset_name, item_id, user_id, CASE WHEN feedback_type IN ({positive}) THEN 1 ELSE -1 END"
+            f" FROM feedback WHERE id IN (SELECT MAX(id) FROM feedback WHERE feedback_type IN ({marks})"
+            " GROUP BY dataset_name, item_id, user_id)",
+            (*sorted(POSITIVE_TYPES), *types),
+        )
+        self._conn.execute("DELETE FROM feedback_item_counts")
+        self._conn.execute(
+            "INSERT INTO feedback_item_counts (dataset_name, item_id, positive, negative)"
+            " SELECT dataset_name, item_id, SUM(vote = 1), SUM(vote = -1) FROM feedback_item_votes"
+            " GROUP BY dataset_name, item_id"
+        )
+
+    def add_feedback(self, feedback: Dict[str, Any]) -> int:
+        """Add user feedback; returns its id."""
         feedback["submitted_at"] = datetime.utcnow().isoformat()
-        self.feedback.append(feedback)
-        
+        rating = feedback.get("user_rating")
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT INTO feedback (user_id, dataset_name, item_id, feedback_type, comment, user_rating, submitted_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (feedback["user_id"], feedback["dataset_name"], feedback["item_id"], feedback["feedback_type"],
+                 feedback.get("comment") or "", rating, feedback["submitted_at"]),
+            )
+            self._conn.execute(
+                "INSERT INTO feedback_counters (dataset_name, feedback_type, count, rating_sum, rating_count)"
+                " VALUES (?, ?, 1, ?, ?)"
+                " ON CONFLICT (dataset_name, feedback_type) DO UPDATE SET"
+                " count = count + 1, rating_sum = rating_sum + excluded.rating_sum,"
+                " rating_count = rating_count + excluded.rating_count",
+                (feedback["dataset_name"], feedback["feedback_type"], rating or 0, 1 if rating else 0),
+            )
+            kind = feedback["feedback_type"]
+            vote = 1 if kind in POSITIVE_TYPES else -1 if kind in NEGATIVE_TYPES else 0
+            if vote:
+                feedback["item_counts"] = self._cast_vote(
+                    feedback["dataset_name"], feedback["item_id"], feedback["user_id"], vote)
+            self._conn.execute(
+                "INSERT INTO feedback_user_counts (user_id, count) VALUES (?, 1)"
+                " ON CONFLICT (user_id) DO UPDATE SET count = count + 1",
+                (feedback["user_id"],),
+            )
+        feedback["id"] = cursor.lastrowid
+        return cursor.lastrowid
+
+    def _cast_vote(self, dataset_name: str, item_id: str, user_id: str, vote: int) -> tuple:
+        """Record the user's vote for an item; returns the item's (positive, negative).
+
+        Runs inside add_feedback's transaction, after its first write, so the
+        database write lock serializes it with other workers.
+        """
+        key = (dataset_name, item_id)
+        previous = self._conn.execute(
+            "SELECT vote FROM feedback_item_votes WHERE dataset_name = ? AND item_id = ? AND user_id = ?",
+            (*key, user_id),
+        ).fetchone()
+        previous = previous[0] if previous else 0
+        self._conn.execute(
+            "INSERT INTO feedback_item_votes (dataset_name, item_id, user_id, vote) VALUES (?, ?, ?, ?)"
+            " ON CONFLICT (dataset_name, item_id, user_id) DO UPDATE SET vote = excluded.vote",
+            (*key, user_id, vote),
+        )
+        return self._conn.execute(
+            "INSERT INTO feedback_item_counts (dataset_name, item_id, positive, negative) VALUES (?, ?, ?, ?)"
+            " ON CONFLICT (dataset_name, item_id) DO UPDATE SET"
+            " positive = positive + excluded.positive, negative = negative + excluded.negative"
+            " RETURNING positive, negative",
+            (*key, (vote == 1) - (previous == 1), (vote == -1) - (previous == -1)),
+        ).fetchone()
+
     def get_feedback_stats(self, dataset_name: str = None) -> Dict[str, Any]:
-        """Get feedback statistics."""
-        filtered_feedback = self.feedback
+        """Get feedback statistics (read from the counters, not the rows)."""
+        sql = "SELECT dataset_name, feedback_type, count, rating_sum, rating_count FROM feedback_counters"
+        params: tuple = ()
         if dataset_name:
-            filtered_feedback = [f for f in filtered_feedback 
-                               if f.get("dataset_name") == dataset_name]
-        
+            sql += " WHERE dataset_name = ?"
+            params = (dataset_name,)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+
         stats = {
-            "total_feedback": len(filtered_feedback),
+            "total_feedback": 0,
             "by_type": {},
             "by_dataset": {},
             "average_rating": 0
         }
-        
         total_rating = 0
         rating_count = 0
-        
-        for feedback in filtered_feedback:
-            feedback_type = feedback.get("feedback_type", "other")
-            stats["by_type"][feedback_type] = stats["by_type"].get(feedback_type, 0) + 1
-            
-            dataset = feedback.get("dataset_name", "unknown")
-            stats["by_dataset"][dataset] = stats["by_dataset"].get(dataset, 0) + 1
-            
-            if feedback.get("user_rating"):
-                total_rating += feedback["user_rating"]
-                rating_count += 1
-        
+        for dataset, feedback_type, count, r_sum, r_count in rows:
+            stats["total_feedback"] += count
+            stats["by_type"][feedback_type] = stats["by_type"].get(feedback_type, 0) + count
+            stats["by_dataset"][dataset] = stats["by_dataset"].get(dataset, 0) + count
+            total_rating += r_sum
+            rating_count += r_count
+
         if rating_count > 0:
             stats["average_rating"] = total_rating / rating_count
-            
+
         return stats
 
-# Global feedback store
-_feedback_store = FeedbackStore()
+    def item_counts(self, dataset_name: str) -> List[tuple]:
+        """(item_id, positive, negative) for every item of a dataset with feedback."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT item_id, positive, negative FROM feedback_item_counts WHERE dataset_name = ?", (dataset_name,)
+            ).fetchall()
+
+    def get_user_feedback(self, user_id: str, limit: int = 100, before_id: Optional[int] = None) -> Dict[str, Any]:
+        """A user's feedback, newest first; page with `before_id` (the last id seen)."""
+        sql = f"SELECT {', '.join(_COLUMNS)} FROM feedback WHERE user_id = ?"
+        params: list = [user_id]
+        if before_id is not None:
+            sql += " AND id < ?"
+            params.append(before_id)
+        sql += " ORDER BY id DESC LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+            total = self._conn.execute("SELECT count FROM feedback_user_counts WHERE user_id = ?", (user_id,)).fetchone()
+        return {"feedback": [dict(zip(_COLUMNS, row)) for row in rows], "total": total[0] if total else 0}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+# Global singleton
+_feedback_store = None
+
+def get_feedback_store() -> FeedbackStore:
+    """Get singleton FeedbackStore instance."""
+    global _feedback_store
+    if _feedback_store is None:
+        _feedback_store = FeedbackStore()
+    return _feedback_store
+
+def _user_id(user: Dict[str, Any]) -> str:
+    return str(user.get("sub") or user.get("id") or "anon")
 
 @router.post("/submit")
 async def submit_feedback(
@@ -67,20 +251,25 @@ async def submit_feedback(
 ):
     """Submit user feedback for a dataset item."""
     feedback_data = {
-        "user_id": str(user.id),
+        "user_id": _user_id(user),
         "dataset_name": feedback.dataset_name,
         "item_id": feedback.item_id,
         "feedback_type": feedback.feedback_type,
         "comment": feedback.comment,
         "user_rating": feedback.user_rating
     }
-    
-    _feedback_store.add_feedback(feedback_data)
-    
+
+    # SQLite commits fsync; keep them off the event loop
+    feedback_id = await run_in_pool("dataset", get_feedback_store().add_feedback, feedback_data)
+    if "item_counts" in feedback_data:
+        # Keep the item's ranking prior current (see datasets/quality_prior.py)
+        await run_in_pool("dataset", record_item_feedback, feedback.dataset_name, feedback.item_id,
+                          *feedback_data["item_counts"])
+
     return {
         "status": "success",
         "message": "Feedback submitted successfully",
-        "feedback_id": len(_feedback_store.feedback) - 1
+        "feedback_id": feedback_id
     }
 
 @router.get("/stats")
@@ -89,15 +278,14 @@ async def get_feedback_stats(
     user=Depends(get_current_user)
 ):
     """Get feedback statistics."""
-    return _feedback_store.get_feedback_stats(dataset_name)
+    return await run_in_pool("dataset", get_feedback_store().get_feedback_stats, dataset_name)
 
 @router.get("/my-feedback")
-async def get_my_feedback(user=Depends(get_current_user)):
-    """Get feedback submitted by current user."""
-    user_feedback = [f for f in _feedback_store.feedback 
-                    if f.get("user_id") == str(user.id)]
-    
-    return {
-        "feedback": user_feedback,
-        "total": len(user_feedback)
-    }
+async def get_my_feedback(
+    limit: int = Query(100, ge=1, le=1000),
+    before_id: Optional[int] = None,
+    user=Depends(get_current_user)
+):
+    """Get feedback submitted by current user (newest first)."""
+    return await run_in_pool("dataset", get_feedback_store().get_user_feedback, _user_id(user),
+                             limit=limit, before_id=before_id)
@@ -2,20 +2,92 @@
 Gemini Client for real LLM integrations.
 Replaces mock data with actual Gemini 2.5 Flash API calls.
 """
+import asyncio
 import os
+import time
 import httpx
 from typing import Dict, Any, List
 import json
 import logging
 
+from caselaw_service.metrics import GEMINI_LATENCY, GEMINI_RETRIES
+from caselaw_service.tracing import span
+
 logger = logging.getLogger(__name__)
 
+# Retries are off by default: each one adds to the latency before the
+# endpoints' fallback answers
+GEMINI_MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", "0"))
+GEMINI_RETRY_BACKOFF_S = float(os.getenv("GEMINI_RETRY_BACKOFF_S", "0.5"))
+# Give up instead of retrying when the wait (e.g. a 429's Retry-After) is longer
+GEMINI_RETRY_MAX_WAIT_S = float(os.getenv("GEMINI_RETRY_MAX_WAIT_S", "5"))
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+def _retry_delay(response, attempt: int) -> float:
+    """Backoff for `attempt`, or the server's Retry-After (seconds) if longer."""
+    delay = GEMINI_RETRY_BACKOFF_S * 2 ** attempt
+    retry_after = response.headers.get("Retry-After") if response is not None else None
+    if retry_after:
+        try:
+            delay = max(delay, float(retry_after))
+        except ValueError:
+            # HTTP-date form: treat as "longer than we are willing to wait"
+            delay = float("inf")
+    return delay
+
 class GeminiClient:
     """Client for interacting with Gemini 2.5 Flash API"""
     
     def __init__(self):
         self.api_key = os.getenv('GEMINI_API_KEY', 'demo-key-for-testing')
-        self.base_url = "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash:generateContent"
+        self.max_retries = GEMINI_MAX_RETRIES
+        self.base_url = os.getenv(
+            'GEMINI_API_URL',
+            "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash:generateContent"
+        )
+
+    async def _generate(self, operation: str, payload: Dict[str, Any]) -> str:
+        """POST a generateContent request and return the first candidate's text.
+
+        With GEMINI_MAX_RETRIES > 0, transport errors, 429s and 5xx responses
+        are retried with exponential backoff, waiting at least a response's
+        Retry-After; a wait over GEMINI_RETRY_MAX_WAIT_S is not retried.
+        """
+        headers = {
+            "Content-Type": "application/json",
+            "x-goog-api-key": self.api_key
+        }
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            async with httpx.AsyncClient() as client, span("gemini"):
+                for attempt in range(self.max_retries + 1):
+                    response = None
+                    error = None
+                    try:
+                        response = await client.post(self.base_url, json=payload, headers=headers)
+                    except httpx.TransportError as exc:
+                        if attempt >= self.max_retries:
+                            raise
+                        error = exc
+                    else:
+                        if response.status_code not in RETRY_STATUSES or attempt >= self.max_retries:
+                            response.raise_for_status()
+                            break
+                    delay = _retry_delay(response, attempt)
+                    if delay > GEMINI_RETRY_MAX_WAIT_S:
+                        if error is not None:
+                            raise error
+                        response.raise_for_status()
+                    GEMINI_RETRIES.labels(operation=operation).inc()
+                    await asyncio.sleep(delay)
+            result = response.json()
+            text = result["candidates"][0]["content"]["parts"][0]["text"]
+            outcome = "ok"
+            return text
+        finally:
+            GEMINI_LATENCY.labels(operation=operation, outcome=outcome).observe(time.perf_counter() - start)
         
     async def predict_outcome(self, case_type: str, jurisdiction: str, key_facts: List[str], judge_name: str = None) -> Dict[str, Any]:
         """Predict case outcomes using Gemini"""
@@ -56,35 +128,22 @@ class GeminiClient:
             }
         }
         
-        headers = {
-            "Content-Type": "application/json",
-            "x-goog-api-key": self.api_key
-        }
-        
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    self.base_url,
-                    json=payload,
-                    headers=headers
-                )
-                response.raise_for_status()
-                
-                result = response.json()
-                generated_text = result["candidates"][0]["content"]["parts"][0]["text"]
-                
-                # Parse the JSON response
-                try:
+            generated_text = await self._generate("predict_outcome", payload)
+            
+            # Parse the JSON response
+            try:
+                with span("gemini_parse"):
                     parsed = json.loads(generated_text.strip())
-                    return parsed
-                except json.JSONDecodeError:
-                    # Fallback to structured response
-                    return {
-                        "predicted_outcome": "settle",
-                        "probabilities": {"win": 0.4, "lose": 0.3, "settle": 0.3},
-                        "reasoning": "Based on case analysis",
-                        "confidence": 0.7
-                    }
+                return parsed
+            except json.JSONDecodeError:
+                # Fallback to structured response
+                return {
+                    "predicted_outcome": "settle",
+                    "probabilities": {"win": 0.4, "lose": 0.3, "settle": 0.3},
+                    "reasoning": "Based on case analysis",
+                    "confidence": 0.7
+                }
         except Exception as e:
             # Fallback for API errors
             return {
@@ -133,39 +192,26 @@ class GeminiClient:
             }
         }
         
-        headers = {
-            "Content-Type": "application/json",
-            "x-goog-api-key": self.api_key
-        }
-        
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    self.base_url,
-                    json=payload,
-                    headers=headers
-                )
-                response.raise_for_status()
-                
-                result = response.json()
-                generated_text = result["candidates"][0]["content"]["parts"][0]["text"]
-                
-                try:
+            generated_text = await self._generate("optimize_strategy", payload)
+            
+            try:
+                with span("gemini_parse"):
                     parsed = json.loads(generated_text.strip())
-                    return parsed
-                except json.JSONDecodeError:
-                    return {
-                        "recommendations": [
-                            {
-                                "strategy": "Negotiate settlement",
-                                "success_probability": 0.7,
-                                "rationale": "Cost-effective resolution",
-                                "timeline": "2-4 weeks",
-                                "cost_estimate": "medium"
-                            }
-                        ],
-                        "overall_recommendation": "Negotiate settlement"
-                    }
+                return parsed
+            except json.JSONDecodeError:
+                return {
+                    "recommendations": [
+                        {
+                            "strategy": "Negotiate settlement",
+                            "success_probability": 0.7,
+                            "rationale": "Cost-effective resolution",
+                            "timeline": "2-4 weeks",
+                            "cost_estimate": "medium"
+                        }
+                    ],
+                    "overall_recommendation": "Negotiate settlement"
+                }
         except Exception as e:
             # Fallback for API errors
             return {
@@ -221,38 +267,25 @@ class GeminiClient:
             }
         }
         
-        headers = {
-            "Content-Type": "application/json",
-            "x-goog-api-key": self.api_key
-        }
-        
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    self.base_url,
-                    json=payload,
-                    headers=headers
-                )
-                response.raise_for_status()
-                
-                result = response.json()
-                generated_text = result["candidates"][0]["content"]["parts"][0]["text"]
-                
-                try:
+            generated_text = await self._generate("simulate_strategy", payload)
+            
+            try:
+                with span("gemini_parse"):
                     parsed = json.loads(generated_text.strip())
-                    return parsed
-                except json.JSONDecodeError:
-                    return {
-                        "success_rate": 0.65,
-                        "opponent_response": "Opponent likely to settle",
-                        "key_insights": ["Strong evidence supports strategy", "Timeline favorable"],
-                        "confidence_score": 0.75,
-                        "simulation_details": {
-                            "scenarios_tested": 50,
-                            "win_rate": 0.65,
-                            "settlement_rate": 0.25
-                        }
+                return parsed
+            except json.JSONDecodeError:
+                return {
+                    "success_rate": 0.65,
+                    "opponent_response": "Opponent likely to settle",
+                    "key_insights": ["Strong evidence supports strategy", "Timeline favorable"],
+                    "confidence_score": 0.75,
+                    "simulation_details": {
+                        "scenarios_tested": 50,
+                        "win_rate": 0.65,
+                        "settlement_rate": 0.25
                     }
+                }
         except Exception as e:
             # Fallback for API errors
             return {
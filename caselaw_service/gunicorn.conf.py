@@ -0,0 +1,33 @@
+"""Gunicorn settings for multi-worker deployments.
+
+    gunicorn -c caselaw_service/gunicorn.conf.py caselaw_service.main:app
+
+With PRELOAD_ARTIFACTS=true the app is imported and shared artifacts are
+built in the master before forking (see caselaw_service/shared_artifacts.py),
+so workers map one copy of the embedding matrix / id and title tables
+instead of each loading their own.
+
+With PROMETHEUS_MULTIPROC_DIR set, `/metrics` aggregates every worker's
+series; the directory must be emptied before each start.
+"""
+import os
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", "4"))
+worker_class = "uvicorn.workers.UvicornWorker"
+loglevel = os.getenv("LOG_LEVEL", "info")
+accesslog = "-"
+
+preload_app = os.getenv("PRELOAD_ARTIFACTS", "false").lower() == "true"
+
+
+def on_starting(server):
+    if preload_app:
+        from caselaw_service.shared_artifacts import preload
+        preload()
+
+
+def child_exit(server, worker):
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,14 @@
+"""Offline load-testing harness.
+
+Boots the FastAPI app against local stand-ins for every external
+dependency so throughput and tail latency can be measured reproducibly:
+
+    corpus.py   synthetic legal documents written as Parquet and served through
+                `DATASET_LOCAL_DIR` in place of the Hugging Face Hub
+    fakes.py    one local HTTP server answering as Gemini, Supabase PostgREST
+                and CourtListener, with configurable latency
+    runner.py   open-loop load generation at a fixed RPS per endpoint and
+                the JSON report (p50/p95/p99, throughput, errors, RSS)
+
+Entry point: `python -m caselaw_service.scripts.loadtest`.
+"""
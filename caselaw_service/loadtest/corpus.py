@@ -0,0 +1,87 @@
+"""Synthetic legal corpus for load tests and benchmarks.
+
+Documents are generated deterministically from a seed, so runs on different
+commits read the same corpus. `write_corpus` stores them as Parquet (which
+keeps every field a string, unlike JSON type inference) under the names
+`datasets.load_stream` looks for in `DATASET_LOCAL_DIR`.
+"""
+import os
+import random
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+VOCABULARY = (
+    "appeal appellant respondent petitioner plaintiff defendant court held judgment decree "
+    "contract breach damages negligence liability tort statute constitution amendment article "
+    "section clause evidence witness testimony hearing trial verdict conviction acquittal "
+    "sentence bail custody property lease tenant landlord easement trust estate probate "
+    "patent trademark copyright infringement license arbitration mediation settlement award "
+    "jurisdiction venue limitation precedent doctrine equity injunction remedy writ mandamus "
+    "certiorari habeas corpus fraud misrepresentation consideration offer acceptance employer "
+    "employee wages termination discrimination tax assessment revenue customs excise company "
+    "director shareholder merger insolvency creditor debtor guarantee mortgage insurance claim "
+    "murder theft assault robbery conspiracy police interrogation search seizure warrant"
+).split()
+
+COURTS = ("Supreme Court", "Court of Appeals", "District Court", "High Court", "Tax Tribunal")
+JURISDICTIONS = ("federal", "california", "new_york", "texas", "delhi", "maharashtra", "karnataka")
+LEGAL_AREAS = ("contract", "criminal", "property", "tax", "constitutional", "labour", "intellectual_property")
+STATES = ("Delhi", "Maharashtra", "Karnataka", "Tamil Nadu", "Kerala", "Gujarat")
+
+# Hub ids the app streams from; each gets a local Parquet copy.
+CORPUS_DATASETS = (
+    "caselaw/justia-opinions",
+    "HFforLegal/case-law",
+    "viber1/indian-law-dataset",
+)
+
+
+def legal_text(rng: random.Random, words: int = 120) -> str:
+    # One rng.choice per word: changing how the rng is drawn changes the
+    # corpus, and load reports are only comparable on the same corpus
+    return " ".join(rng.choice(VOCABULARY) for _ in range(words))
+
+
+def synthetic_case(i: int, rng: random.Random, words: int = 120) -> Dict[str, Any]:
+    a, b = rng.sample(VOCABULARY, 2)
+    year = rng.randint(1950, 2024)
+    return {
+        "id": str(i),
+        "case_name": f"{a.title()} v. {b.title()} ({i})",
+        "court": rng.choice(COURTS),
+        "jurisdiction": rng.choice(JURISDICTIONS),
+        "date": f"{year}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        "citation": f"{rng.randint(1, 999)} U.S. {rng.randint(1, 999)}",
+        "summary": legal_text(rng, 20),
+        "text": legal_text(rng, words),
+        "url": f"https://example.org/cases/{i}",
+        "legal_areas": rng.sample(LEGAL_AREAS, rng.randint(1, 2)),
+        "state": rng.choice(STATES),
+    }
+
+
+def iter_corpus(n: int, seed: int = 0, words: int = 120) -> Iterator[Dict[str, Any]]:
+    rng = random.Random(seed)
+    for i in range(n):
+        yield synthetic_case(i, rng, words)
+
+
+def sample_queries(n: int, seed: int = 0) -> List[str]:
+    rng = random.Random(seed)
+    return [rng.choice(VOCABULARY) for _ in range(n)]
+
+
+def write_corpus(directory: str, n: int = 10000, seed: int = 0,
+                 datasets: Optional[Sequence[str]] = None) -> Dict[str, str]:
+    """Write `n` documents per dataset; returns {hub id: path}."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    os.makedirs(directory, exist_ok=True)
+    table = pa.Table.from_pylist(list(iter_corpus(n, seed)))
+    paths = {}
+    for hf_id in datasets or CORPUS_DATASETS:
+        path = os.path.join(directory, hf_id.replace("/", "__") + ".parquet")
+        pq.write_table(table, path + ".tmp", row_group_size=1000)
+        os.replace(path + ".tmp", path)
+        paths[hf_id] = path
+    return paths
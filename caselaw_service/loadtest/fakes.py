@@ -0,0 +1,130 @@
+"""Local stand-ins for Gemini, Supabase PostgREST and CourtListener.
+
+A single threaded stdlib HTTP server answers all three APIs after
+`latency_ms` (± `jitter_ms`) so the app's outbound calls cost roughly what
+they do in production without leaving the machine. Point the app at it
+with the variables from `FakeServices.env()`.
+"""
+import json
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict
+from urllib.parse import urlparse
+
+from .corpus import synthetic_case
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: "_FakeServer"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        try:
+            return json.loads(raw) if raw else None
+        except ValueError:
+            return None
+
+    def _reply(self, status: int, payload):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _handle(self, method: str):
+        services = self.server.services
+        path = urlparse(self.path).path
+        body = self._body() if method in ("POST", "PATCH") else None
+        services.wait()
+        if path.endswith(":generateContent"):
+            services.count("gemini")
+            text = "Synthetic analysis: the claim is likely to settle on the documented facts."
+            return self._reply(200, {"candidates": [{"content": {"parts": [{"text": text}]}}]})
+        if path.startswith("/rest/v1/"):
+            services.count("postgrest")
+            if method == "GET":
+                return self._reply(200, [])
+            rows = body if isinstance(body, list) else [body or {}]
+            return self._reply(201 if method == "POST" else 200, rows)
+        if "/opinions" in path:
+            services.count("courtlistener")
+            rng = random.Random(self.path)
+            results = [synthetic_case(i, rng, words=40) for i in range(5)]
+            return self._reply(200, {"count": len(results), "next": None, "results": results})
+        services.count("unknown")
+        self._reply(404, {"detail": f"No fake for {path}"})
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def do_PATCH(self):
+        self._handle("PATCH")
+
+
+class _FakeServer(ThreadingHTTPServer):
+    daemon_threads = True
+    services: "FakeServices"
+
+
+class FakeServices:
+    """Fake external APIs on one local port (0 = pick a free one)."""
+
+    def __init__(self, latency_ms: float = 50.0, jitter_ms: float = 0.0, host: str = "127.0.0.1", port: int = 0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.calls: Counter = Counter()
+        self._lock = threading.Lock()
+        self._server = _FakeServer((host, port), _Handler)
+        self._server.services = self
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def wait(self):
+        delay = self.latency_ms + (random.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0.0)
+        if delay > 0:
+            time.sleep(delay / 1000)
+
+    def count(self, service: str):
+        with self._lock:
+            self.calls[service] += 1
+
+    def env(self) -> Dict[str, str]:
+        """Environment that routes the app's outbound calls here."""
+        return {
+            "GEMINI_API_KEY": "loadtest",
+            "GEMINI_API_URL": f"{self.url}/v1beta/models/gemini-2.5-flash:generateContent",
+            "SUPABASE_URL": self.url,
+            "SUPABASE_KEY": "loadtest",
+            "SUPABASE_ANON_KEY": "loadtest",
+            "COURTLISTENER_API_ROOT": f"{self.url}/api/rest/v4/",
+        }
+
+    def start(self) -> "FakeServices":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="loadtest-fakes", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,195 @@
+"""Open-loop load generation and the JSON report.
+
+Each scenario issues requests on a fixed schedule (`rps` per second)
+whether or not earlier ones have finished, so a slow server builds a queue
+instead of quietly lowering the offered load. Latency is measured from the
+*scheduled* start, which keeps client-side queueing in the numbers
+(no coordinated omission). Requests beyond `max_in_flight` per scenario
+are dropped and counted as errors.
+"""
+import asyncio
+import math
+import random
+import resource
+import sys
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from .corpus import VOCABULARY, legal_text
+
+# (params, json body) for one request
+RequestFactory = Callable[[random.Random], Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]]
+
+
+@dataclass
+class Scenario:
+    name: str
+    method: str
+    path: str
+    rps: float
+    make_request: RequestFactory = field(default=lambda rng: (None, None))
+
+
+DEFAULT_SCENARIOS: List[Scenario] = [
+    Scenario("health", "GET", "/health", 20),
+    Scenario("caselaw_search", "GET", "/api/v1/caselaw/search", 10,
+             lambda rng: ({"query": rng.choice(VOCABULARY), "limit": 10}, None)),
+    Scenario("caselaw_similar", "POST", "/api/v1/caselaw/similar", 5,
+             lambda rng: (None, {"text": legal_text(rng, 30)})),
+    Scenario("dataset_search", "GET", "/api/v1/dataset/search/court_cases", 5,
+             lambda rng: ({"keyword": rng.choice(VOCABULARY), "limit": 10}, None)),
+    Scenario("outcome_predict", "POST", "/api/v1/outcome/predict", 5,
+             lambda rng: (None, {"case_type": "contract_dispute", "jurisdiction": "California",
+                                 "key_facts": [legal_text(rng, 12)]})),
+    Scenario("courtlistener", "GET", "/api/v1/courtlistener/opinions", 5,
+             lambda rng: ({"query": rng.choice(VOCABULARY)}, None)),
+]
+
+
+def percentile(sorted_values: Sequence[float], q: float) -> float:
+    """Nearest-rank percentile of an ascending sequence (0 if empty)."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(q / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+def summarize(latencies_ms: List[float], statuses: Counter, dropped: int, elapsed_s: float, target_rps: float) -> Dict[str, Any]:
+    lat = sorted(latencies_ms)
+    ok = sum(n for status, n in statuses.items() if isinstance(status, int) and status < 400)
+    total = sum(statuses.values()) + dropped
+    return {
+        "target_rps": target_rps,
+        "requests": total,
+        "throughput_rps": round(ok / elapsed_s, 2) if elapsed_s else 0.0,
+        "errors": total - ok,
+        "error_rate": round((total - ok) / total, 4) if total else 0.0,
+        "dropped": dropped,
+        "statuses": {str(k): v for k, v in sorted(statuses.items(), key=lambda kv: str(kv[0]))},
+        "latency_ms": {
+            "p50": round(percentile(lat, 50), 2),
+            "p95": round(percentile(lat, 95), 2),
+            "p99": round(percentile(lat, 99), 2),
+            "max": round(lat[-1], 2) if lat else 0.0,
+            "mean": round(sum(lat) / len(lat), 2) if lat else 0.0,
+        },
+    }
+
+
+def current_rss_mb() -> float:
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / 2**20
+    except ImportError:
+        # Peak rather than current RSS; kilobytes on Linux, bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (2**20 if sys.platform == "darwin" else 2**10)
+
+
+class RSSSampler:
+    """Samples this process's RSS in the background (the app runs in-process)."""
+
+    def __init__(self, interval_s: float = 0.25):
+        self.interval_s = interval_s
+        self.samples: List[float] = []
+        self._task = None
+
+    async def _run(self):
+        while True:
+            self.samples.append(current_rss_mb())
+            await asyncio.sleep(self.interval_s)
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> Dict[str, float]:
+        if self._task is not None:
+            self._task.cancel()
+        self.samples.append(current_rss_mb())
+        return {
+            "start": round(self.samples[0], 1),
+            "peak": round(max(self.samples), 1),
+            "end": round(self.samples[-1], 1),
+        }
+
+
+async def run_scenario(client, scenario: Scenario, duration_s: float, max_in_flight: int = 256,
+                       seed: int = 0) -> Dict[str, Any]:
+    rng = random.Random(f"{seed}:{scenario.name}")
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    dropped = 0
+    in_flight = set()
+
+    async def one(scheduled: float, params, body):
+        try:
+            resp = await client.request(scenario.method, scenario.path, params=params, json=body)
+            statuses[resp.status_code] += 1
+        except Exception as e:
+            statuses[type(e).__name__] += 1
+        latencies.append((time.perf_counter() - scheduled) * 1000)
+
+    start = time.perf_counter()
+    for k in range(int(scenario.rps * duration_s)):
+        scheduled = start + k / scenario.rps
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if len(in_flight) >= max_in_flight:
+            dropped += 1
+            continue
+        params, body = scenario.make_request(rng)
+        task = asyncio.ensure_future(one(scheduled, params, body))
+        in_flight.add(task)
+        task.add_done_callback(in_flight.discard)
+    if in_flight:
+        await asyncio.gather(*in_flight)
+    return summarize(latencies, statuses, dropped, time.perf_counter() - start, scenario.rps)
+
+
+async def run_load(client, scenarios: Sequence[Scenario], duration_s: float, max_in_flight: int = 256,
+                   warmup_requests: int = 1, seed: int = 0) -> Dict[str, Any]:
+    """Drive all scenarios concurrently; returns the per-endpoint report."""
+    for scenario in scenarios:
+        # Fill lazy caches (dataset streams, models) before measuring
+        rng = random.Random(seed)
+        for _ in range(warmup_requests):
+            params, body = scenario.make_request(rng)
+            try:
+                await client.request(scenario.method, scenario.path, params=params, json=body)
+            except Exception:
+                pass
+    sampler = RSSSampler()
+    sampler.start()
+    started = time.perf_counter()
+    results = await asyncio.gather(*(run_scenario(client, s, duration_s, max_in_flight, seed) for s in scenarios))
+    elapsed = time.perf_counter() - started
+    return {
+        "duration_s": round(elapsed, 2),
+        "endpoints": {s.name: r for s, r in zip(scenarios, results)},
+        "rss_mb": await sampler.stop(),
+    }
+
+
+def compare_reports(current: Dict[str, Any], baseline: Dict[str, Any], max_regression: float = 0.2) -> Dict[str, Any]:
+    """p95/throughput/error-rate deltas per endpoint; `regressions` lists the
+    endpoints whose p95 grew by more than `max_regression` (relative) or
+    whose error rate rose."""
+    deltas, regressions = {}, []
+    for name, cur in current["endpoints"].items():
+        base = baseline.get("endpoints", {}).get(name)
+        if base is None:
+            continue
+        p95, base_p95 = cur["latency_ms"]["p95"], base["latency_ms"]["p95"]
+        change = (p95 - base_p95) / base_p95 if base_p95 else 0.0
+        deltas[name] = {
+            "p95_ms": [base_p95, p95],
+            "p95_change": round(change, 3),
+            "throughput_rps": [base["throughput_rps"], cur["throughput_rps"]],
+            "error_rate": [base["error_rate"], cur["error_rate"]],
+        }
+        if change > max_regression or cur["error_rate"] > base["error_rate"]:
+            regressions.append(name)
+    return {"baseline_commit": baseline.get("commit"), "endpoints": deltas, "regressions": regressions}
@@ -0,0 +1,153 @@
+"""Event-loop lag monitor with stack samples of what blocked the loop.
+
+A heartbeat coroutine sleeps for `interval` and measures how late it wakes
+up; the excess is the loop's scheduling lag. A watchdog thread watches the
+heartbeat: while the loop is overdue by more than the threshold it samples
+the loop thread's Python stack (`sys._current_frames`). When the heartbeat
+finally runs, a stall event with the measured lag and the collected stacks
+is recorded, so a slow request shows *which code* held the loop.
+
+Configuration:
+    LOOP_LAG_MONITOR        enable on app startup (default true)
+    LOOP_LAG_INTERVAL_MS    heartbeat period (default 100)
+    LOOP_LAG_THRESHOLD_MS   lag recorded as a stall (default 100)
+
+Served under `/admin/loop` and summarized in `/admin/metrics`.
+"""
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+LOOP_LAG_MONITOR = os.getenv("LOOP_LAG_MONITOR", "true").lower() == "true"
+LOOP_LAG_INTERVAL_MS = float(os.getenv("LOOP_LAG_INTERVAL_MS", "100"))
+LOOP_LAG_THRESHOLD_MS = float(os.getenv("LOOP_LAG_THRESHOLD_MS", "100"))
+
+# Stack samples kept per stall, and stall events kept overall.
+_MAX_SAMPLES = 5
+_MAX_EVENTS = 50
+# Recent lag measurements used for percentiles.
+_LAG_WINDOW = 600
+
+
+def format_stack(frame, limit: int = 30) -> List[str]:
+    """`file:line in func` entries, outermost first."""
+    return [f"{f.filename}:{f.lineno} in {f.name}" for f in traceback.extract_stack(frame, limit=limit)]
+
+
+class LoopLagMonitor:
+    """Measures scheduling lag of one asyncio loop and samples stalls."""
+
+    def __init__(self, interval_ms: float = LOOP_LAG_INTERVAL_MS, threshold_ms: float = LOOP_LAG_THRESHOLD_MS):
+        self.interval = interval_ms / 1000
+        self.threshold = threshold_ms / 1000
+        self.ticks = 0
+        self.stalls = 0
+        self.max_lag_ms = 0.0
+        self.events: deque = deque(maxlen=_MAX_EVENTS)
+        self._lags: deque = deque(maxlen=_LAG_WINDOW)
+        self._samples: List[List[str]] = []
+        self._lock = threading.Lock()
+        self._loop_thread: Optional[int] = None
+        self._last_beat = 0.0
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """Start monitoring the running loop (call from a coroutine)."""
+        if self.running:
+            return
+        self._loop_thread = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.get_running_loop().create_task(self._heartbeat())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-lag-watchdog", daemon=True)
+        self._watchdog.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _heartbeat(self):
+        while True:
+            before = time.monotonic()
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self._record(now - before - self.interval)
+            self._last_beat = now
+
+    def _record(self, lag: float):
+        lag_ms = max(lag, 0.0) * 1000
+        with self._lock:
+            self.ticks += 1
+            self._lags.append(lag_ms)
+            self.max_lag_ms = max(self.max_lag_ms, lag_ms)
+            samples, self._samples = self._samples, []
+            if lag < self.threshold:
+                return
+            self.stalls += 1
+            self.events.append({
+                "at": datetime.utcnow().isoformat(),
+                "lag_ms": round(lag_ms, 1),
+                "stacks": samples,
+            })
+        logger.warning("Event loop blocked for %.0f ms", lag_ms)
+
+    def _watch(self):
+        # Sample a few times per threshold so short stalls still get a stack
+        period = max(self.threshold / 2, 0.005)
+        while not self._stop.wait(period):
+            overdue = time.monotonic() - self._last_beat - self.interval
+            if overdue < self.threshold:
+                continue
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is None:
+                continue
+            stack = format_stack(frame)
+            with self._lock:
+                if len(self._samples) < _MAX_SAMPLES:
+                    self._samples.append(stack)
+
+    def get_stats(self, events: bool = False) -> Dict[str, Any]:
+        with self._lock:
+            lags = sorted(self._lags)
+            stats = {
+                "running": self.running,
+                "interval_ms": self.interval * 1000,
+                "threshold_ms": self.threshold * 1000,
+                "ticks": self.ticks,
+                "stalls": self.stalls,
+                "max_lag_ms": round(self.max_lag_ms, 1),
+                "p50_lag_ms": round(lags[len(lags) // 2], 1) if lags else 0.0,
+                "p99_lag_ms": round(lags[min(len(lags) - 1, int(len(lags) * 0.99))], 1) if lags else 0.0,
+            }
+            if events:
+                stats["recent_stalls"] = list(self.events)
+        return stats
+
+
+# Global singleton
+_loop_monitor = None
+
+
+def get_loop_monitor() -> LoopLagMonitor:
+    """Get singleton LoopLagMonitor instance."""
+    global _loop_monitor
+    if _loop_monitor is None:
+        _loop_monitor = LoopLagMonitor()
+    return _loop_monitor
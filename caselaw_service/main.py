@@ -5,9 +5,10 @@ Once the streaming/search logic is implemented, these placeholder responses will
 be replaced with real data (semantic search, judge analysis, etc.).
 """
 
+import asyncio
 import os
 from fastapi import FastAPI, Depends, HTTPException, Request, status
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from typing import List, Dict, Any
 from datetime import datetime
 from caselaw_service.models import CaseQuery, SimilarityQuery, CaseResult, SearchLog
@@ -20,13 +21,20 @@ from caselaw_service.admin_api import router as admin_router
 from caselaw_service.low_priority_endpoints import router as low_priority_router
 from caselaw_service.export_api import router as export_router
 from caselaw_service.feedback import router as feedback_router
-from caselaw_service.analytics import router as analytics_router
+from caselaw_service.analytics import record_search, router as analytics_router
 from pydantic import ValidationError
 import httpx
-import datasets
 import logging
 from fastapi.middleware.cors import CORSMiddleware
 from caselaw_service.embeddings import autocomplete, embed_query, get_index
+from caselaw_service.executors import PoolSaturated, get_executor_manager, iterate_in_pool, run_in_pool
+from caselaw_service.loop_monitor import LOOP_LAG_MONITOR, get_loop_monitor
+from caselaw_service.middleware import RATE_LIMIT_ENABLED, rate_limit_middleware
+from caselaw_service.metrics import (
+    PROMETHEUS_AVAILABLE, SUPABASE_LATENCY, metrics_middleware, record_cache, render_latest,
+)
+from caselaw_service.tracing import span, tracing_middleware
+from caselaw_service.warmup import WARMUP_ON_STARTUP, get_cache_warmer, register_warmer
 
 # SlowAPI rate limiter
 from slowapi import Limiter, _rate_limit_exceeded_handler
@@ -51,6 +59,14 @@ app.add_middleware(
     allow_headers=["*"]
 )
 
+# --- Prometheus request metrics (served at /metrics) ---
+app.middleware("http")(metrics_middleware)
+# --- Sampled stage timing (Server-Timing header + timing log, see tracing.py) ---
+app.middleware("http")(tracing_middleware)
+# --- Per-client GCRA rate limit (RATE_LIMIT_ENABLED=true, see middleware.py) ---
+if RATE_LIMIT_ENABLED:
+    app.middleware("http")(rate_limit_middleware)
+
 # Mount CourtListener proxy endpoints
 app.include_router(courtlistener_router)
 # Mount Oracle API endpoints
@@ -61,6 +77,14 @@ app.include_router(simulation_router)
 app.include_router(dataset_router)
 # Mount low-priority endpoints (trends/model, arbitrage/alerts, etc.)
 app.include_router(low_priority_router)
+# Mount bulk export endpoints
+app.include_router(export_router)
+# Mount admin endpoints (health, metrics, profiling; admin-gated)
+app.include_router(admin_router)
+# Mount usage analytics endpoints (rollups, heavy-hitter queries)
+app.include_router(analytics_router)
+# Mount user feedback endpoints (also feed the search quality prior)
+app.include_router(feedback_router)
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -69,10 +93,64 @@ logger = logging.getLogger("caselaw_service")
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 
+def _load_justia_stream():
+    """Stream the opinions dataset; HF `datasets` is imported on first use."""
+    from caselaw_service.datasets import load_stream
+    return load_stream("caselaw/justia-opinions")
+
+@app.exception_handler(PoolSaturated)
+async def pool_saturated_handler(request: Request, exc: PoolSaturated):
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "1"})
+
+@app.on_event("startup")
+async def start_loop_monitor():
+    """Record event-loop stalls with stack samples (LOOP_LAG_MONITOR=true)."""
+    if LOOP_LAG_MONITOR:
+        get_loop_monitor().start()
+
+@app.on_event("startup")
+async def start_cache_warmup():
+    """Replay the hottest historical queries in the background (WARMUP_ON_STARTUP=true)."""
+    if WARMUP_ON_STARTUP:
+        get_cache_warmer().start()
+
+@app.on_event("shutdown")
+async def shutdown_executors():
+    """Stop the shared blocking-work pools with the app."""
+    if WARMUP_ON_STARTUP:
+        get_cache_warmer().stop()
+    get_loop_monitor().stop()
+    get_executor_manager().shutdown(wait=False)
+
+@app.on_event("startup")
+async def warmup_models():
+    """Optionally load the semantic model in the background (MODEL_WARMUP=true)."""
+    if os.getenv("MODEL_WARMUP", "false").lower() == "true":
+        from caselaw_service.datasets.semantic_search import start_warmup
+        start_warmup()
+
+@app.on_event("startup")
+async def load_offline_artifacts():
+    """Load precomputed aggregates so the first request doesn't pay for it."""
+    from caselaw_service.datasets.facet_cube import get_facet_cube
+    get_facet_cube()
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Prometheus scrape endpoint (see caselaw_service/metrics.py)."""
+    if not PROMETHEUS_AVAILABLE:
+        raise HTTPException(status_code=503, detail="prometheus-client is not installed")
+    body, content_type = render_latest()
+    return Response(content=body, media_type=content_type)
+
 @app.get("/health")
 @limiter.limit("30/minute")
 async def health(request: Request) -> Dict[str, Any]:
-    return {"status": "ok", "timestamp": datetime.utcnow().isoformat()}
+    health = {"status": "ok", "timestamp": datetime.utcnow().isoformat()}
+    if WARMUP_ON_STARTUP:
+        # Cache warmup progress; "warm" once the historical queries are replayed
+        health["warmup"] = get_cache_warmer().progress()
+    return health
 
 from functools import lru_cache
 import hashlib
@@ -80,14 +158,17 @@ import time
 
 # --- Simple in-memory LRU cache with TTL (10 min) ---
 class TTLCache:
-    def __init__(self, maxsize=128, ttl=600):
+    def __init__(self, maxsize=128, ttl=600, name="ttl"):
+        self.name = name
         self.cache = {}
         self.order = []
         self.maxsize = maxsize
         self.ttl = ttl
 
     def _make_key(self, query, limit):
-        key = f"{query}|{limit}"
+        # Matching is a case-insensitive substring test, so only case may be
+        # folded: collapsing whitespace would change which cases match
+        key = f"{query.lower()}|{limit}"
         return hashlib.sha256(key.encode()).hexdigest()
 
     def get(self, query, limit):
@@ -99,11 +180,13 @@ class TTLCache:
                 # Move to end (LRU)
                 self.order.remove(k)
                 self.order.append(k)
+                record_cache(self.name, hits=1)
                 return val
             else:
                 # Expired
                 del self.cache[k]
                 self.order.remove(k)
+        record_cache(self.name, misses=1)
         return None
 
     def set(self, query, limit, value):
@@ -116,10 +199,56 @@ class TTLCache:
         self.cache[k] = (value, time.time())
         self.order.append(k)
 
-case_search_cache = TTLCache(maxsize=128, ttl=600)
+case_search_cache = TTLCache(maxsize=128, ttl=600, name="case_search")
 
 from slowapi.util import get_remote_address
 
+async def _keyword_search_cases(query: str, limit: int) -> List[CaseResult]:
+    """First `limit` opinions whose name or text contains `query`."""
+    try:
+        with span("dataset_load"):
+            dataset = await run_in_pool("dataset", _load_justia_stream)
+    except PoolSaturated:
+        raise
+    except Exception:
+        dataset = [
+            {
+                "id": "1",
+                "case_name": "Miranda v. Arizona",
+                "court": "US Supreme Court",
+                "jurisdiction": "federal",
+                "date": "1966-06-13",
+                "citation": "384 U.S. 436",
+                "summary": "Landmark decision on police interrogations",
+                "text": "Miranda rights...",
+                "url": "https://example.com/miranda"
+            }
+        ]
+    results = []
+    with span("dataset_scan"):
+        # The stream is read in the dataset pool; matching yields to the loop per chunk
+        async for case in iterate_in_pool("dataset", dataset):
+            if query.lower() in (case.get("case_name", "") + case.get("text", "")).lower():
+                results.append(CaseResult(
+                    id=case.get("id", ""),
+                    case_name=case.get("case_name", ""),
+                    court=case.get("court", ""),
+                    jurisdiction=case.get("jurisdiction", ""),
+                    date=case.get("date", ""),
+                    citation=case.get("citation", ""),
+                    summary=case.get("summary", "") or None,
+                    url=case.get("url", None)
+                ))
+                if len(results) >= limit:
+                    break
+    return results
+
+@register_warmer("caselaw")
+@register_warmer("caselaw_semantic")
+async def _warm_case_search(source: str, query: str):
+    """Replay a historical search into `case_search_cache` (default limit)."""
+    case_search_cache.set(query, 10, await _keyword_search_cases(query, 10))
+
 @app.get("/api/v1/caselaw/search", response_model=List[CaseResult])
 @limiter.limit("30/minute")
 async def search_cases(request: Request, query: str, limit: int = 10, semantic: bool = False, user=Depends(get_current_user)):
@@ -127,15 +256,18 @@ async def search_cases(request: Request, query: str, limit: int = 10, semantic:
         raise HTTPException(status_code=400, detail="query parameter is required")
     if not (1 <= limit <= 50):
         raise HTTPException(status_code=400, detail="limit must be 1-50")
+    record_search("caselaw_semantic" if semantic else "caselaw", query, user.get("sub"))
     if semantic:
-        idx = get_index()
+        idx = await run_in_pool("dataset", get_index)
         if idx and idx.ready:
-            emb = embed_query(query)
-            matches = idx.search(emb, top_k=limit)
-            dataset = datasets.load_dataset("caselaw/justia-opinions", split="train", streaming=True)
+            with span("embed"):
+                emb = await run_in_pool("inference", embed_query, query)
+            with span("index_search"):
+                matches = await run_in_pool("inference", idx.search, emb, top_k=limit)
+            dataset = await run_in_pool("dataset", _load_justia_stream)
             # Build lookup by index (assume order matches)
             all_cases = []
-            for i, case in enumerate(dataset):
+            async for case in iterate_in_pool("dataset", dataset):
                 all_cases.append(case)
                 if len(all_cases) > max(i for i, _ in matches):
                     break
@@ -155,47 +287,19 @@ async def search_cases(request: Request, query: str, limit: int = 10, semantic:
             return results
         # If FAISS unavailable, fallback
     # --- Check cache ---
-    cached = case_search_cache.get(query, limit)
+    with span("cache"):
+        cached = case_search_cache.get(query, limit)
     if cached is not None:
         logger.info(f"Cache hit for query '{query}' (limit={limit})")
         return cached
     start = datetime.utcnow()
-    try:
-        dataset = datasets.load_dataset("caselaw/justia-opinions", split="train", streaming=True)
-    except Exception:
-        dataset = [
-            {
-                "id": "1",
-                "case_name": "Miranda v. Arizona",
-                "court": "US Supreme Court",
-                "jurisdiction": "federal",
-                "date": "1966-06-13",
-                "citation": "384 U.S. 436",
-                "summary": "Landmark decision on police interrogations",
-                "text": "Miranda rights...",
-                "url": "https://example.com/miranda"
-            }
-        ]
-    results = []
-    for case in dataset:
-        if query.lower() in (case.get("case_name", "") + case.get("text", "")).lower():
-            results.append(CaseResult(
-                id=case.get("id", ""),
-                case_name=case.get("case_name", ""),
-                court=case.get("court", ""),
-                jurisdiction=case.get("jurisdiction", ""),
-                date=case.get("date", ""),
-                citation=case.get("citation", ""),
-                summary=case.get("summary", "") or None,
-                url=case.get("url", None)
-            ))
-            if len(results) >= limit:
-                break
+    results = await _keyword_search_cases(query, limit)
     exec_ms = (datetime.utcnow() - start).total_seconds() * 1000
     # Log search to Supabase if configured
     if SUPABASE_URL and SUPABASE_KEY:
-        async with httpx.AsyncClient() as client:
+        async with httpx.AsyncClient() as client, span("supabase_log"):
             try:
+                started = time.perf_counter()
                 await client.post(
                     f"{SUPABASE_URL}/rest/v1/caselaw_searches",
                     headers={
@@ -212,6 +316,7 @@ async def search_cases(request: Request, query: str, limit: int = 10, semantic:
                         execution_time_ms=exec_ms
                     ).dict()
                 )
+                SUPABASE_LATENCY.labels(operation="insert", table="caselaw_searches").observe(time.perf_counter() - started)
             except Exception as e:
                 logger.warning(f"Supabase log failed: {e}")
     # --- Update cache ---
@@ -223,7 +328,7 @@ async def search_cases(request: Request, query: str, limit: int = 10, semantic:
 async def autocomplete_cases(request: Request, query: str, limit: int = 5):
     if not query.strip():
         return []
-    return autocomplete(query, top_k=limit)
+    return await run_in_pool("inference", autocomplete, query, top_k=limit)
 
 # --- Cache first N cases for quick similarity comparisons ---
 MAX_CACHE_CASES = 500
@@ -234,11 +339,15 @@ async def _load_dataset_cache():
     if _dataset_cache:
         return _dataset_cache
     try:
-        ds_iter = hf_datasets.load_dataset("caselaw/justia-opinions", split="train", streaming=True)
-        for i, case in enumerate(ds_iter):
+        ds_iter = await run_in_pool("dataset", _load_justia_stream)
+        i = 0
+        async for case in iterate_in_pool("dataset", ds_iter):
             _dataset_cache.append(case)
-            if i + 1 >= MAX_CACHE_CASES:
+            i += 1
+            if i >= MAX_CACHE_CASES:
                 break
+    except PoolSaturated:
+        raise
     except Exception:
         # Fallback to a single hard-coded case if dataset unavailable
         _dataset_cache = [
@@ -256,6 +365,8 @@ async def _load_dataset_cache():
         ]
     return _dataset_cache
 
+SIMILARITY_YIELD_EVERY = 100
+
 def _compute_similarity(text1: str, text2: str) -> float:
     """Simple Jaccard similarity on word sets."""
     s1 = set(text1.lower().split())
@@ -270,13 +381,18 @@ async def similar_cases(request: Request, body: SimilarityQuery, user=Depends(ge
     if not body.text.strip():
         raise HTTPException(status_code=400, detail="'text' field required")
     # Load cache (first call populates it)
-    cases_cached = await _load_dataset_cache()
+    with span("dataset_load"):
+        cases_cached = await _load_dataset_cache()
     scored: List[tuple] = []
-    for case in cases_cached:
-        case_text = (case.get("case_name", "") + " " + case.get("text", ""))
-        score = _compute_similarity(body.text, case_text)
-        if score > 0:
-            scored.append((score, case))
+    with span("similarity"):
+        for n, case in enumerate(cases_cached, 1):
+            if n % SIMILARITY_YIELD_EVERY == 0:
+                # Let other requests run during long scoring passes
+                await asyncio.sleep(0)
+            case_text = (case.get("case_name", "") + " " + case.get("text", ""))
+            score = _compute_similarity(body.text, case_text)
+            if score > 0:
+                scored.append((score, case))
     # Sort by score descending
     scored.sort(key=lambda x: x[0], reverse=True)
     top = scored[: body.limit]
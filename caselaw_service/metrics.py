@@ -0,0 +1,161 @@
+"""Prometheus metrics for the service, served at `/metrics`.
+
+Series:
+    http_requests_total{method,route,status}           counter
+    http_request_duration_seconds{method,route}        histogram (time to response headers)
+    http_requests_in_flight                            gauge
+    cache_requests_total{cache,result}                 counter (result = hit | miss)
+    gemini_request_duration_seconds{operation,outcome} histogram
+    gemini_retries_total{operation}                    counter
+    supabase_request_duration_seconds{operation,table} histogram
+    dataset_scan_rows_total{dataset}                   counter
+    dataset_scan_duration_seconds_total{dataset}       counter; rows/sec = ratio of the two rates
+    executor_tasks{pool,state}, event_loop_lag_*_ms, system_memory_usage_percent
+                                                       gauges read at scrape time
+
+`route` is the matched route template (`/api/v1/dataset/search/{dataset}`),
+so label cardinality stays bounded. prometheus-client is optional: without
+it every recorder is a no-op and `/metrics` answers 503. Under gunicorn set
+PROMETHEUS_MULTIPROC_DIR (an empty, writable directory) so a scrape sees
+all workers; the scrape-time gauges then describe the answering worker.
+"""
+import os
+import time
+from typing import Dict, Tuple
+
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+# Latency buckets (seconds) from fast cache hits to slow LLM calls.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+try:
+    import prometheus_client
+    from prometheus_client import Counter, Gauge, Histogram
+    PROMETHEUS_AVAILABLE = True
+except ImportError:
+    prometheus_client = None
+    PROMETHEUS_AVAILABLE = False
+
+
+class _NoopMetric:
+    def labels(self, *args, **kwargs):
+        return self
+
+    def inc(self, amount: float = 1):
+        pass
+
+    def dec(self, amount: float = 1):
+        pass
+
+    def observe(self, amount: float):
+        pass
+
+
+if PROMETHEUS_AVAILABLE:
+    HTTP_REQUESTS = Counter("http_requests_total", "HTTP requests", ["method", "route", "status"])
+    HTTP_LATENCY = Histogram("http_request_duration_seconds", "HTTP request latency", ["method", "route"],
+                             buckets=LATENCY_BUCKETS)
+    HTTP_IN_FLIGHT = Gauge("http_requests_in_flight", "HTTP requests being handled", multiprocess_mode="livesum")
+    CACHE_REQUESTS = Counter("cache_requests_total", "Cache lookups", ["cache", "result"])
+    GEMINI_LATENCY = Histogram("gemini_request_duration_seconds", "Gemini generateContent calls",
+                               ["operation", "outcome"], buckets=LATENCY_BUCKETS)
+    GEMINI_RETRIES = Counter("gemini_retries_total", "Retried Gemini calls", ["operation"])
+    SUPABASE_LATENCY = Histogram("supabase_request_duration_seconds", "Supabase REST calls",
+                                 ["operation", "table"], buckets=LATENCY_BUCKETS)
+    SCAN_ROWS = Counter("dataset_scan_rows_total", "Rows read by keyword scans", ["dataset"])
+    SCAN_SECONDS = Counter("dataset_scan_duration_seconds", "Time spent in keyword scans", ["dataset"])
+else:
+    HTTP_REQUESTS = HTTP_LATENCY = HTTP_IN_FLIGHT = CACHE_REQUESTS = _NoopMetric()
+    GEMINI_LATENCY = GEMINI_RETRIES = SUPABASE_LATENCY = SCAN_ROWS = SCAN_SECONDS = _NoopMetric()
+
+
+def record_cache(cache: str, hits: int = 0, misses: int = 0):
+    if hits:
+        CACHE_REQUESTS.labels(cache=cache, result="hit").inc(hits)
+    if misses:
+        CACHE_REQUESTS.labels(cache=cache, result="miss").inc(misses)
+
+
+def record_scan(dataset: str, rows: int, seconds: float):
+    SCAN_ROWS.labels(dataset=dataset).inc(rows)
+    SCAN_SECONDS.labels(dataset=dataset).inc(seconds)
+
+
+def _route_label(request) -> str:
+    route = request.scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+async def metrics_middleware(request, call_next):
+    """Count and time every request by method, route template and status."""
+    start = time.perf_counter()
+    HTTP_IN_FLIGHT.inc()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        HTTP_IN_FLIGHT.dec()
+        route = _route_label(request)
+        HTTP_LATENCY.labels(method=request.method, route=route).observe(time.perf_counter() - start)
+        HTTP_REQUESTS.labels(method=request.method, route=route, status=str(status)).inc()
+
+
+class _RuntimeCollector:
+    """Gauges computed at scrape time from the executor and loop monitors."""
+
+    def collect(self):
+        from prometheus_client.core import GaugeMetricFamily
+        from .executors import get_executor_manager
+        from .loop_monitor import get_loop_monitor
+
+        tasks = GaugeMetricFamily("executor_tasks", "Tasks per executor pool", labels=["pool", "state"])
+        for pool, stats in get_executor_manager().get_stats().items():
+            tasks.add_metric([pool, "active"], stats["active"])
+            tasks.add_metric([pool, "queued"], stats["queued"])
+        yield tasks
+        loop = get_loop_monitor().get_stats()
+        for key in ("p50_lag_ms", "p99_lag_ms", "max_lag_ms"):
+            yield GaugeMetricFamily(f"event_loop_lag_{key}", f"Event loop scheduling lag ({key})", value=loop[key])
+        try:
+            import psutil
+            yield GaugeMetricFamily("system_memory_usage_percent", "Host memory in use",
+                                    value=psutil.virtual_memory().percent)
+        except ImportError:
+            pass
+
+
+_registry = None
+
+
+def _get_registry():
+    """Registry served at /metrics (aggregated across workers in multiprocess mode)."""
+    global _registry
+    if _registry is None:
+        if PROMETHEUS_MULTIPROC_DIR:
+            from prometheus_client import multiprocess
+            _registry = prometheus_client.CollectorRegistry()
+            multiprocess.MultiProcessCollector(_registry)
+        else:
+            _registry = prometheus_client.REGISTRY
+        _registry.register(_RuntimeCollector())
+    return _registry
+
+
+def render_latest() -> Tuple[bytes, str]:
+    """(exposition body, content type) for a scrape."""
+    return prometheus_client.generate_latest(_get_registry()), prometheus_client.CONTENT_TYPE_LATEST
+
+
+def request_counts() -> Dict[str, int]:
+    """Requests handled by this worker per route template."""
+    counts: Dict[str, int] = {}
+    if not PROMETHEUS_AVAILABLE:
+        return counts
+    for metric in HTTP_REQUESTS.collect():
+        for sample in metric.samples:
+            if sample.name == "http_requests_total":
+                route = sample.labels["route"]
+                counts[route] = counts.get(route, 0) + int(sample.value)
+    return counts
@@ -1,49 +1,165 @@
 """Rate limiting and internationalization middleware."""
-from fastapi import Request, HTTPException
-from fastapi.security import HTTPBearer
+from fastapi import Request
+from fastapi.responses import JSONResponse
+import logging
+import math
+import os
+import threading
 import time
-from typing import Dict, Any
-from collections import defaultdict
-import json
+from typing import Any, Callable, Dict, Optional, Tuple
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# rate_limit_middleware is registered by main.py only when enabled
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "false").lower() == "true"
+RATE_LIMIT_PER_MINUTE = int(os.getenv("RATE_LIMIT_PER_MINUTE", "100"))
+# Shared GCRA state so limits hold across workers, e.g. redis://localhost:6379/0
+RATE_LIMIT_REDIS_URL = os.getenv("RATE_LIMIT_REDIS_URL")
+# Upper bound on keys tracked in memory; least recently seen keys go first.
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+
+
+class MemoryGCRABackend:
+    """Per-process GCRA state: one float (theoretical arrival time) per key.
+
+    Keys are kept in least-recently-seen order. A key whose TAT has passed is
+    indistinguishable from a new one, so each call drops up to two such keys
+    from the front: memory tracks the keys active within the last window
+    (capped at `max_keys`) and never needs a sweep.
+    """
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS, clock: Callable[[], float] = time.monotonic):
+        self.max_keys = max_keys
+        self.clock = clock
+        self._tats: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._tats)
+
+    def acquire(self, key: str, interval: float, tolerance: float, consume: bool = True) -> Tuple[bool, float]:
+        """(allowed, delay) where delay is how far the key's TAT is ahead of now."""
+        with self._lock:
+            now = self.clock()
+            tat = max(self._tats.get(key, now), now)
+            allowed = consume and tat + interval - now <= tolerance
+            if allowed:
+                tat += interval
+                self._tats[key] = tat
+                self._tats.move_to_end(key)
+            self._evict(now)
+            return allowed, tat - now
+
+    def _evict(self, now: float):
+        for _ in range(2):
+            if not self._tats:
+                return
+            key, tat = next(iter(self._tats.items()))
+            if tat > now and len(self._tats) <= self.max_keys:
+                return
+            del self._tats[key]
+
+
+class RedisGCRABackend:
+    """GCRA state in Redis, updated atomically by a Lua script.
+
+    The script reads the clock with Redis `TIME`, so workers on different
+    hosts agree on "now"; keys expire when their TAT passes. While Redis is
+    unreachable each worker limits on its own (in-memory) instead of failing
+    the request.
+    """
+
+    # Seconds between repeated "Redis unavailable" warnings
+    WARN_INTERVAL_S = 60.0
+
+    SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local tat = tonumber(redis.call('GET', KEYS[1]) or now)
+if tat < now then tat = now end
+local interval, tolerance = tonumber(ARGV[1]), tonumber(ARGV[2])
+local allowed = 0
+if ARGV[3] == '1' and tat + interval - now <= tolerance then
+  allowed = 1
+  tat = tat + interval
+  redis.call('SET', KEYS[1], tostring(tat), 'PX', math.ceil((tat - now) * 1000))
+end
+return {allowed, tostring(tat - now)}
+"""
+
+    def __init__(self, url: str, prefix: str = "ratelimit:"):
+        import redis
+        self.prefix = prefix
+        self._errors = (redis.RedisError,)
+        self._client = redis.Redis.from_url(url)
+        self._script = self._client.register_script(self.SCRIPT)
+        self._fallback = MemoryGCRABackend()
+        self._last_warning = 0.0
+
+    def acquire(self, key: str, interval: float, tolerance: float, consume: bool = True) -> Tuple[bool, float]:
+        try:
+            allowed, delay = self._script(keys=[self.prefix + key], args=[interval, tolerance, int(consume)])
+        except self._errors as e:
+            now = time.monotonic()
+            if now - self._last_warning >= self.WARN_INTERVAL_S:
+                self._last_warning = now
+                logger.warning("Rate limit Redis unavailable, limiting per process: %s", e)
+            return self._fallback.acquire(key, interval, tolerance, consume)
+        return bool(allowed), float(delay)
+
+
+def make_rate_limit_backend(redis_url: Optional[str] = RATE_LIMIT_REDIS_URL):
+    """Redis backend when configured and importable, else in-memory."""
+    if redis_url:
+        try:
+            return RedisGCRABackend(redis_url)
+        except ImportError:
+            print("RATE_LIMIT_REDIS_URL is set but redis is not installed; limiting per process")
+    return MemoryGCRABackend()
+
 
 class RateLimiter:
-    """Simple in-memory rate limiter."""
-    def __init__(self, requests_per_minute: int = 60):
+    """Generic cell rate algorithm (GCRA) limiter: O(1) time and memory per key.
+
+    Allows `requests_per_minute` on average with bursts of up to `burst`
+    requests (default: a full minute's worth, matching the old sliding
+    window). Each key stores only its theoretical arrival time.
+    """
+
+    def __init__(self, requests_per_minute: int = 60, burst: Optional[int] = None, backend: Any = None):
         self.requests_per_minute = requests_per_minute
-        self.requests = defaultdict(list)
-        
+        self.burst = burst or requests_per_minute
+        self.interval = 60.0 / requests_per_minute
+        self.tolerance = self.interval * self.burst
+        self.backend = backend if backend is not None else MemoryGCRABackend()
+
+    def _info(self, allowed: bool, delay: float) -> Dict[str, Any]:
+        info = {
+            "limit": self.requests_per_minute,
+            "remaining": max(0, int((self.tolerance - delay) / self.interval + 1e-9)),
+            "reset_time": int(time.time() + delay),
+        }
+        if not allowed:
+            info["retry_after"] = max(0.0, delay + self.interval - self.tolerance)
+        return info
+
+    def check(self, key: str) -> Tuple[bool, Dict[str, Any]]:
+        """Consume one request for `key`; (allowed, rate limit info) in one backend call."""
+        allowed, delay = self.backend.acquire(key, self.interval, self.tolerance)
+        return allowed, self._info(allowed, delay)
+
     def is_allowed(self, key: str) -> bool:
         """Check if request is allowed for given key."""
-        now = time.time()
-        
-        # Clean old requests
-        self.requests[key] = [
-            req_time for req_time in self.requests[key]
-            if now - req_time < 60
-        ]
-        
-        if len(self.requests[key]) >= self.requests_per_minute:
-            return False
-            
-        self.requests[key].append(now)
-        return True
-    
+        return self.check(key)[0]
+
     def get_rate_limit_info(self, key: str) -> Dict[str, Any]:
-        """Get rate limit info for key."""
-        now = time.time()
-        recent_requests = [
-            req_time for req_time in self.requests[key]
-            if now - req_time < 60
-        ]
-        
-        return {
-            "limit": self.requests_per_minute,
-            "remaining": max(0, self.requests_per_minute - len(recent_requests)),
-            "reset_time": int(now + 60)
-        }
+        """Get rate limit info for key (does not consume a request)."""
+        allowed, delay = self.backend.acquire(key, self.interval, self.tolerance, consume=False)
+        return self._info(True, delay)
 
 # Global rate limiter
-rate_limiter = RateLimiter(requests_per_minute=100)
+rate_limiter = RateLimiter(requests_per_minute=RATE_LIMIT_PER_MINUTE, backend=make_rate_limit_backend())
 
 class I18nMiddleware:
     """Simple internationalization support."""
@@ -96,20 +212,20 @@ async def rate_limit_middleware(request: Request, call_next):
     user_id = getattr(request.state, 'user_id', None)
     key = f"{client_ip}:{user_id}" if user_id else client_ip
     
-    if not rate_limiter.is_allowed(key):
-        rate_info = rate_limiter.get_rate_limit_info(key)
-        return HTTPException(
+    allowed, rate_info = rate_limiter.check(key)
+    if not allowed:
+        return JSONResponse(
             status_code=429,
-            detail={
+            content={
                 "error": i18n.get_message("rate_limit_exceeded"),
                 "rate_limit_info": rate_info
-            }
+            },
+            headers={"Retry-After": str(math.ceil(rate_info["retry_after"]))},
         )
     
     response = await call_next(request)
     
     # Add rate limit headers
-    rate_info = rate_limiter.get_rate_limit_info(key)
     response.headers["X-RateLimit-Limit"] = str(rate_info["limit"])
     response.headers["X-RateLimit-Remaining"] = str(rate_info["remaining"])
     response.headers["X-RateLimit-Reset"] = str(rate_info["reset_time"])
@@ -0,0 +1,177 @@
+"""On-demand sampling profiler for a running worker.
+
+A sampler thread reads every thread's Python stack (`sys._current_frames`)
+each `interval_ms` and counts identical stacks. Nothing is instrumented
+and the rest of the time the profiler does not exist, so a profile costs
+roughly one stack walk per thread per interval while it runs.
+
+The result is in the collapsed-stack format read by flamegraph.pl,
+speedscope and inferno:
+
+    MainThread [event-loop];main.py:similar_cases;main.py:_compute_similarity 412
+    pool-dataset_0;shard_scan.py:_scan_shard;query.py:scan 97
+
+Samples of idle threads (selector waits, pool workers waiting for tasks)
+are dropped unless `idle=True`. Served by `/admin/profile`, which adds the
+event-loop stalls (see loop_monitor.py) recorded while it ran.
+
+Configuration:
+    PROFILER_MAX_SECONDS     longest allowed profile (default 60)
+    PROFILER_INTERVAL_MS     default sampling period (default 10)
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, Iterable, Optional
+
+PROFILER_MAX_SECONDS = float(os.getenv("PROFILER_MAX_SECONDS", "60"))
+PROFILER_INTERVAL_MS = float(os.getenv("PROFILER_INTERVAL_MS", "10"))
+
+# (file, function) of leaf frames where a thread is waiting, not working
+IDLE_FRAMES = {
+    ("selectors.py", "select"),
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("thread.py", "_worker"),
+    ("queue.py", "get"),
+    ("loop_monitor.py", "_watch"),
+}
+
+
+class ProfilerBusy(RuntimeError):
+    """Raised when a profile is already running in this worker."""
+
+
+def _frame_label(code) -> str:
+    return f"{os.path.basename(code.co_filename)}:{getattr(code, 'co_qualname', code.co_name)}"
+
+
+def collapse(stacks: Counter) -> str:
+    """Collapsed-stack text, heaviest stacks first."""
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+class SamplingProfiler:
+    """Samples all thread stacks of this process until stopped."""
+
+    def __init__(self, interval_ms: float = PROFILER_INTERVAL_MS, idle: bool = False,
+                 loop_thread: Optional[int] = None):
+        self.interval = interval_ms / 1000
+        self.idle = idle
+        self.loop_thread = loop_thread
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.started_at = 0.0
+        self.duration = 0.0
+        self._labels: Dict[Any, str] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _thread_names(self) -> Dict[int, str]:
+        names = {t.ident: t.name for t in threading.enumerate()}
+        if self.loop_thread in names:
+            names[self.loop_thread] += " [event-loop]"
+        return names
+
+    def _sample(self, own: int, names: Dict[int, str]):
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            leaf = frame.f_code
+            if not self.idle and (os.path.basename(leaf.co_filename), leaf.co_name) in IDLE_FRAMES:
+                continue
+            labels = []
+            while frame is not None:
+                code = frame.f_code
+                label = self._labels.get(code)
+                if label is None:
+                    label = self._labels[code] = _frame_label(code)
+                labels.append(label)
+                frame = frame.f_back
+            labels.append(names.get(ident) or f"thread-{ident}")
+            self.stacks[";".join(reversed(labels))] += 1
+        self.samples += 1
+
+    def _run(self):
+        own = threading.get_ident()
+        names = self._thread_names()
+        while not self._stop.wait(self.interval):
+            if len(names) != threading.active_count():
+                names = self._thread_names()
+            self._sample(own, names)
+
+    def start(self):
+        self.started_at = time.time()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.duration = time.time() - self.started_at
+
+    def collapsed(self) -> str:
+        return collapse(self.stacks)
+
+
+def stall_stacks(events: Iterable[Dict[str, Any]]) -> Counter:
+    """Loop-monitor stall samples as collapsed stacks under `[loop-blocked]`.
+
+    Each stall's lag (ms) is split across its samples, so the flamegraph
+    width of a blocking call is proportional to how long it held the loop.
+    """
+    stacks: Counter = Counter()
+    for event in events:
+        samples = event["stacks"]
+        for stack in samples:
+            labels = ["[loop-blocked]"]
+            for entry in stack:  # "path:line in func"
+                location, func = entry.split(" in ", 1)
+                labels.append(f"{os.path.basename(location.rsplit(':', 1)[0])}:{func}")
+            stacks[";".join(labels)] += max(1, round(event["lag_ms"] / len(samples)))
+    return stacks
+
+
+_profile_lock = threading.Lock()
+
+
+async def run_profile(seconds: float, interval_ms: float = PROFILER_INTERVAL_MS, idle: bool = False) -> Dict[str, Any]:
+    """Profile this worker for `seconds` without blocking the event loop.
+
+    Raises ProfilerBusy if another profile is running. The loop monitor is
+    started for the duration if it isn't running already.
+    """
+    from .loop_monitor import get_loop_monitor
+
+    if not _profile_lock.acquire(blocking=False):
+        raise ProfilerBusy("A profile is already running in this worker")
+    monitor = get_loop_monitor()
+    started_monitor = not monitor.running
+    try:
+        if started_monitor:
+            monitor.start()
+        since = datetime.utcnow().isoformat()
+        profiler = SamplingProfiler(interval_ms=interval_ms, idle=idle, loop_thread=threading.get_ident())
+        profiler.start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            profiler.stop()
+        stalls = [e for e in monitor.get_stats(events=True)["recent_stalls"] if e["at"] >= since]
+    finally:
+        if started_monitor:
+            monitor.stop()
+        _profile_lock.release()
+    return {
+        "duration_s": round(profiler.duration, 3),
+        "interval_ms": interval_ms,
+        "samples": profiler.samples,
+        "stacks": profiler.stacks,
+        "loop_stalls": stalls,
+        "loop_stall_stacks": stall_stacks(stalls),
+    }
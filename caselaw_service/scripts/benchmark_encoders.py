@@ -0,0 +1,55 @@
+"""Compare embedding backends against fp32 on a fixed legal-text sample.
+
+Usage:
+    python -m caselaw_service.scripts.benchmark_encoders [--model sentence|inlegalbert]
+        [--backends torch,torch-int8,onnx,onnx-int8] [--min-agreement 0.98]
+
+Prints a JSON report with cosine agreement (vs. fp32 `torch`) and
+texts/sec per backend. Exits non-zero when any backend falls below
+`--min-agreement`, so it can gate flipping `EMBEDDING_BACKEND` in a deploy.
+"""
+import argparse
+import json
+import sys
+
+from caselaw_service.datasets.encoders import (
+    BACKENDS,
+    SAMPLE_LEGAL_TEXTS,
+    TransformerEncoder,
+    compare_backends,
+    load_sentence_encoder,
+)
+from caselaw_service.datasets.inlegalbert import InLegalBERTDataset
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", choices=["sentence", "inlegalbert"], default="sentence")
+    parser.add_argument("--backends", default=",".join(BACKENDS))
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--scale", type=int, default=4, help="Repeat the sample N times for throughput")
+    parser.add_argument("--min-agreement", type=float, default=0.98)
+    args = parser.parse_args(argv)
+
+    if args.model == "sentence":
+        make_encoder = lambda backend: load_sentence_encoder(backend=backend)
+    else:
+        make_encoder = lambda backend: TransformerEncoder(InLegalBERTDataset.HF_MODEL, pooling="cls", backend=backend)
+
+    report = compare_backends(
+        make_encoder,
+        backends=[b.strip() for b in args.backends.split(",") if b.strip()],
+        texts=SAMPLE_LEGAL_TEXTS * args.scale,
+        repeats=args.repeats,
+    )
+    print(json.dumps({"model": args.model, "backends": report}, indent=2))
+
+    failed = [
+        name for name, res in report.items()
+        if "agreement" in res and res["agreement"]["min"] < args.min_agreement
+    ]
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
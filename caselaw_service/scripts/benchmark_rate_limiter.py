@@ -0,0 +1,66 @@
+"""Per-call cost of the GCRA rate limiter versus a timestamp-list sliding window.
+
+Usage:
+    python -m caselaw_service.scripts.benchmark_rate_limiter [--rates 60,600,6000,60000] [--calls 20000]
+
+For each limit (requests/minute) one hot key is hammered with `--calls`
+requests; the sliding window's cost grows with the number of timestamps
+it keeps per key while GCRA stays flat. Prints a JSON report of mean
+microseconds per `is_allowed` + `get_rate_limit_info` pair.
+"""
+import argparse
+import json
+import sys
+import time
+from collections import defaultdict
+
+from caselaw_service.middleware import MemoryGCRABackend, RateLimiter
+
+
+class SlidingWindowLimiter:
+    """The previous implementation, kept for comparison."""
+
+    def __init__(self, requests_per_minute: int):
+        self.requests_per_minute = requests_per_minute
+        self.requests = defaultdict(list)
+
+    def is_allowed(self, key):
+        now = time.time()
+        self.requests[key] = [t for t in self.requests[key] if now - t < 60]
+        if len(self.requests[key]) >= self.requests_per_minute:
+            return False
+        self.requests[key].append(now)
+        return True
+
+    def get_rate_limit_info(self, key):
+        now = time.time()
+        recent = [t for t in self.requests[key] if now - t < 60]
+        return {"remaining": max(0, self.requests_per_minute - len(recent))}
+
+
+def time_limiter(limiter, calls: int) -> float:
+    start = time.perf_counter()
+    for _ in range(calls):
+        limiter.is_allowed("hot")
+        limiter.get_rate_limit_info("hot")
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rates", default="60,600,6000,60000")
+    parser.add_argument("--calls", type=int, default=20000)
+    args = parser.parse_args(argv)
+
+    report = {}
+    for rate in (int(r) for r in args.rates.split(",") if r.strip()):
+        report[rate] = {
+            "sliding_window_us": round(time_limiter(SlidingWindowLimiter(rate), args.calls), 2),
+            "gcra_us": round(time_limiter(RateLimiter(rate, backend=MemoryGCRABackend()), args.calls), 2),
+        }
+    print(json.dumps({"calls": args.calls, "per_call_by_rate_per_minute": report}, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
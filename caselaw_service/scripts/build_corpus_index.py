@@ -0,0 +1,44 @@
+"""Build the whole-corpus semantic index for a dataset wrapper.
+
+Usage:
+    python -m caselaw_service.scripts.build_corpus_index court_cases
+    python -m caselaw_service.scripts.build_corpus_index pile_of_law --subset courtListener_opinions
+    python -m caselaw_service.scripts.build_corpus_index patent_data --max-docs 200000 --ann
+
+Streams the dataset once into a local Arrow snapshot under CORPUS_INDEX_DIR
+and encodes the wrapper's TEXT_FIELD with the configured EMBEDDING_BACKEND.
+The running service picks the index up on the next semantic_search call.
+Offline artifacts derived from the snapshot (e.g. the Indian legal facet
+cube) are refreshed afterwards.
+"""
+import argparse
+import sys
+from itertools import islice
+
+from caselaw_service.datasets import get_dataset
+from caselaw_service.datasets.corpus_index import build_corpus_index, load_snapshot
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("dataset")
+    parser.add_argument("--subset", default=None, help="pile_of_law subset (data_dir)")
+    parser.add_argument("--max-docs", type=int, default=None)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--ann", action="store_true", help="Also build a faiss HNSW index")
+    args = parser.parse_args(argv)
+
+    ds = get_dataset(args.dataset)
+    kwargs = {"subset": args.subset} if args.subset else {}
+    stream = ds._get_dataset(**kwargs)
+    docs = islice(iter(stream), args.max_docs) if args.max_docs else iter(stream)
+    path = build_corpus_index(
+        ds.corpus_key(**kwargs), docs, text_field=ds.TEXT_FIELD, batch_size=args.batch_size, ann=args.ann
+    )
+    print(f"Corpus index written to {path}")
+    ds.refresh_snapshot_artifacts(load_snapshot(ds.corpus_key(**kwargs)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,51 @@
+"""Build (or refresh) the Indian legal facet cube and bitmap index.
+
+Usage:
+    python -m caselaw_service.scripts.build_facets                 # from the local snapshot if present
+    python -m caselaw_service.scripts.build_facets --stream        # full pass over the HF stream
+    python -m caselaw_service.scripts.build_facets --stream --max-docs 100000
+
+With a local snapshot (written by build_corpus_index) only rows added since
+the last run are aggregated; a rebuilt snapshot triggers a full recount.
+The cube is written to FACET_CUBE_PATH and loaded by the service at startup.
+The legal_areas/state bitmap index behind /indian_legal/search_by_area needs
+the snapshot (its row ids point into it) and is rebuilt alongside it.
+"""
+import argparse
+import sys
+from itertools import islice
+
+from caselaw_service.datasets import get_dataset
+from caselaw_service.datasets.corpus_index import load_snapshot
+from caselaw_service.datasets.facet_cube import FACET_CUBE_PATH, FacetCube, get_facet_cube, refresh_facet_cube, set_facet_cube
+from caselaw_service.datasets.facet_index import build_facet_index
+
+DATASET = "indian_legal_dataset"
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--stream", action="store_true", help="Aggregate the HF stream instead of the local snapshot")
+    parser.add_argument("--max-docs", type=int, default=None, help="Only with --stream")
+    parser.add_argument("--full", action="store_true", help="Ignore the existing cube and recount everything")
+    args = parser.parse_args(argv)
+
+    ds = get_dataset(DATASET)
+    snapshot = None if args.stream else load_snapshot(ds.corpus_key())
+    if snapshot is not None:
+        cube = refresh_facet_cube(snapshot, None if args.full else get_facet_cube())
+    else:
+        if not args.stream:
+            print("No local snapshot found; streaming the dataset instead")
+        stream = iter(ds._get_dataset())
+        cube = FacetCube.from_docs(islice(stream, args.max_docs) if args.max_docs else stream)
+    set_facet_cube(cube)
+    if snapshot is not None:
+        path = build_facet_index(ds.corpus_key(), snapshot, ds.FACET_FIELDS)
+        print(f"Bitmap index over {len(snapshot)} snapshot rows written to {path}")
+    print(f"Facet cube ({cube.rows} docs, {len(cube.counts)} cells, {len(cube.legal_areas())} legal areas) written to {FACET_CUBE_PATH}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
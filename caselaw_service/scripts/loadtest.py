@@ -0,0 +1,156 @@
+"""Offline load test: the app against fake Gemini/PostgREST/CourtListener and a synthetic corpus.
+
+Usage:
+    python -m caselaw_service.scripts.loadtest [--duration 30] [--rps-scale 1.0]
+        [--scenarios health,caselaw_search,...] [--corpus-size 5000]
+        [--fake-latency-ms 50] [--in-process] [--output report.json]
+        [--compare baseline.json --max-regression 0.2]
+
+The app is served by uvicorn on a local port (or called in-process through
+httpx's ASGI transport with `--in-process`) and each scenario is driven
+open-loop at its RPS (see caselaw_service/loadtest/runner.py). The JSON
+report holds p50/p95/p99, throughput, error rate and RSS per endpoint plus
+the commit it was measured on. With `--compare` the run exits non-zero if
+an endpoint's p95 regressed by more than `--max-regression` or its error
+rate rose versus the baseline report.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from caselaw_service.loadtest.corpus import write_corpus
+from caselaw_service.loadtest.fakes import FakeServices
+from caselaw_service.loadtest.runner import DEFAULT_SCENARIOS, compare_reports, run_load
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _serve(app, port: int):
+    """Start uvicorn in a background thread; returns the server."""
+    import uvicorn
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan="on"))
+    threading.Thread(target=server.run, name="loadtest-app", daemon=True).start()
+    deadline = time.monotonic() + 30
+    while not server.started:
+        if time.monotonic() > deadline:
+            raise RuntimeError("App did not start within 30s")
+        time.sleep(0.05)
+    return server
+
+
+async def _drive(app, args, scenarios):
+    import httpx
+    timeout = httpx.Timeout(args.timeout)
+    limits = httpx.Limits(max_connections=args.max_in_flight * len(scenarios))
+    if args.in_process:
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://app", timeout=timeout)
+        server = None
+    else:
+        port = _free_port()
+        server = _serve(app, port)
+        client = httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=timeout, limits=limits)
+    try:
+        async with client:
+            return await run_load(client, scenarios, args.duration, args.max_in_flight, seed=args.seed)
+    finally:
+        if server is not None:
+            server.should_exit = True
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds of load per scenario")
+    parser.add_argument("--rps-scale", type=float, default=1.0, help="Multiply every scenario's RPS")
+    parser.add_argument("--scenarios", default=",".join(s.name for s in DEFAULT_SCENARIOS))
+    parser.add_argument("--corpus-size", type=int, default=5000, help="Synthetic documents per dataset")
+    parser.add_argument("--fake-latency-ms", type=float, default=50.0)
+    parser.add_argument("--fake-jitter-ms", type=float, default=10.0)
+    parser.add_argument("--max-in-flight", type=int, default=256, help="Per scenario; more are dropped")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", help="Corpus directory (default: a temporary one)")
+    parser.add_argument("--in-process", action="store_true", help="Call the app through the ASGI transport")
+    parser.add_argument("--keep-rate-limits", action="store_true", help="Leave the app's slowapi limits on")
+    parser.add_argument("--output", help="Also write the JSON report here")
+    parser.add_argument("--compare", help="Baseline report to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    wanted = [n.strip() for n in args.scenarios.split(",") if n.strip()]
+    by_name = {s.name: s for s in DEFAULT_SCENARIOS}
+    unknown = [n for n in wanted if n not in by_name]
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(unknown)}")
+    scenarios = [by_name[n] for n in wanted]
+    for s in scenarios:
+        s.rps *= args.rps_scale
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="loadtest-")
+    write_corpus(os.path.join(workdir, "datasets"), n=args.corpus_size, seed=args.seed)
+    with FakeServices(latency_ms=args.fake_latency_ms, jitter_ms=args.fake_jitter_ms) as fakes:
+        # Configuration is read at import time, so set it before loading the app
+        os.environ.update(fakes.env())
+        os.environ.update({
+            "DATASET_LOCAL_DIR": os.path.join(workdir, "datasets"),
+            "CORPUS_INDEX_DIR": os.path.join(workdir, "corpus"),
+            "EXPORT_JOB_DIR": os.path.join(workdir, "exports"),
+            "SKIP_JWT_VERIFY": "true",
+        })
+        from caselaw_service.main import app, limiter
+        # Per-request client logs would dominate the run
+        logging.getLogger("httpx").setLevel(logging.WARNING)
+        if not args.keep_rate_limits:
+            # One client IP would otherwise hit the per-IP limits within seconds
+            limiter.enabled = False
+        results = asyncio.run(_drive(app, args, scenarios))
+        calls = dict(fakes.calls)
+
+    report = {
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "config": {
+            "duration_s": args.duration,
+            "corpus_size": args.corpus_size,
+            "fake_latency_ms": args.fake_latency_ms,
+            "fake_jitter_ms": args.fake_jitter_ms,
+            "in_process": args.in_process,
+            "scenarios": {s.name: s.rps for s in scenarios},
+        },
+        **results,
+        "fake_calls": calls,
+    }
+    status = 0
+    if args.compare:
+        with open(args.compare, "r") as f:
+            report["comparison"] = compare_reports(report, json.load(f), args.max_regression)
+        status = 1 if report["comparison"]["regressions"] else 0
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
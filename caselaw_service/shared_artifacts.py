@@ -0,0 +1,183 @@
+"""Read-only artifacts shared between API worker processes.
+
+With several gunicorn/uvicorn workers every process used to parse and hold
+its own copy of the embedding matrix, case ids and titles. Here immutable
+arrays are written once as `.npy` files under `SHARED_ARTIFACT_DIR`
+(`/dev/shm` when available, so they live in shared memory) and every worker
+maps them with `np.load(mmap_mode="r")`: the pages are backed by the same
+physical memory in all workers instead of being copied per process.
+
+Preload mode (`PRELOAD_ARTIFACTS=true`, see `caselaw_service/gunicorn.conf.py`)
+calls `preload()` in the master before workers are forked, so artifacts are
+built once and workers only attach. Without it, the first worker to need an
+artifact publishes it and later workers attach to the same file.
+
+`memory_report()` shows how much of a worker's memory is unique to it and how
+much is shared, and is served at `/admin/memory`.
+"""
+import json
+import logging
+import os
+import tempfile
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_DEFAULT_DIR = "/dev/shm/legal_oracle" if os.path.isdir("/dev/shm") else ".cache/shared"
+SHARED_ARTIFACT_DIR = os.getenv("SHARED_ARTIFACT_DIR", _DEFAULT_DIR)
+PRELOAD_ARTIFACTS = os.getenv("PRELOAD_ARTIFACTS", "false").lower() == "true"
+PRELOAD_MODELS = os.getenv("PRELOAD_MODELS", "false").lower() == "true"
+
+# Artifacts attached by this process: name -> mapped object
+_attached: Dict[str, Any] = {}
+
+
+def _path(name: str, suffix: str = ".npy") -> str:
+    return os.path.join(SHARED_ARTIFACT_DIR, name + suffix)
+
+
+def publish_array(name: str, array: np.ndarray) -> np.ndarray:
+    """Write `array` to the shared directory and return a read-only mapping of it."""
+    os.makedirs(SHARED_ARTIFACT_DIR, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=SHARED_ARTIFACT_DIR, suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        np.save(f, np.ascontiguousarray(array))
+    # Atomic: concurrent publishers of the same artifact simply race on rename
+    os.replace(tmp, _path(name))
+    _attached.pop(name, None)
+    return attach_array(name)
+
+
+def attach_array(name: str) -> Optional[np.ndarray]:
+    """Map a published array read-only, or return None if it doesn't exist."""
+    if name in _attached:
+        return _attached[name]
+    path = _path(name)
+    if not os.path.exists(path):
+        return None
+    arr = np.load(path, mmap_mode="r")
+    _attached[name] = arr
+    return arr
+
+
+class StringTable:
+    """Immutable list of strings stored as one UTF-8 blob plus offsets.
+
+    Both arrays are memory-mapped, so a table of case titles costs each worker
+    a handful of page-table entries instead of one Python str per row.
+    """
+
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray):
+        self._blob = blob
+        self._offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        if i < 0:
+            i += len(self)
+        start, end = int(self._offsets[i]), int(self._offsets[i + 1])
+        return bytes(self._blob[start:end]).decode("utf-8")
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+
+def publish_strings(name: str, values: Sequence[str]) -> StringTable:
+    encoded = [str(v).encode("utf-8") for v in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    if encoded:
+        offsets[1:] = np.cumsum([len(b) for b in encoded])
+    blob = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+    # Offsets last: attach_strings() treats the offsets file as the commit marker
+    publish_array(name + ".blob", blob)
+    publish_array(name + ".offsets", offsets)
+    return attach_strings(name)
+
+
+def attach_strings(name: str) -> Optional[StringTable]:
+    offsets = attach_array(name + ".offsets")
+    blob = attach_array(name + ".blob")
+    if offsets is None or blob is None:
+        return None
+    return StringTable(blob, offsets)
+
+
+def publish_json(name: str, value: Any):
+    """Small metadata (e.g. source file mtime) alongside the arrays."""
+    os.makedirs(SHARED_ARTIFACT_DIR, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=SHARED_ARTIFACT_DIR, suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        json.dump(value, f)
+    os.replace(tmp, _path(name, ".json"))
+
+
+def attach_json(name: str) -> Optional[Any]:
+    path = _path(name, ".json")
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def list_artifacts() -> List[Dict[str, Any]]:
+    """Published artifacts with their size and whether this process maps them."""
+    if not os.path.isdir(SHARED_ARTIFACT_DIR):
+        return []
+    out = []
+    for fname in sorted(os.listdir(SHARED_ARTIFACT_DIR)):
+        if not fname.endswith(".npy"):
+            continue
+        name = fname[:-4]
+        out.append({
+            "name": name,
+            "size_bytes": os.path.getsize(os.path.join(SHARED_ARTIFACT_DIR, fname)),
+            "attached": name in _attached,
+        })
+    return out
+
+
+def preload():
+    """Build/attach every shared artifact in the current (master) process.
+
+    Called before fork so workers inherit the mappings; also loads the
+    sentence encoder when PRELOAD_MODELS=true, so its weights are shared
+    copy-on-write instead of loaded once per worker.
+    """
+    from caselaw_service.embeddings import get_index
+
+    idx = get_index()
+    logger.info("Preloaded embedding index (ready=%s, rows=%d)", idx.ready, len(idx.ids))
+    if PRELOAD_MODELS:
+        from caselaw_service.datasets.semantic_search import get_model
+        get_model()
+        logger.info("Preloaded sentence encoder")
+
+
+def memory_report() -> Dict[str, Any]:
+    """Per-process memory split into unique (USS) and shared pages."""
+    import psutil
+
+    proc = psutil.Process()
+    try:
+        info = proc.memory_full_info()
+        uss, pss = info.uss, getattr(info, "pss", None)
+    except (psutil.AccessDenied, AttributeError):
+        info = proc.memory_info()
+        uss, pss = None, None
+    shared = getattr(info, "shared", None)
+    artifacts = list_artifacts()
+    return {
+        "pid": proc.pid,
+        "rss_bytes": info.rss,
+        "unique_bytes": uss,
+        "proportional_bytes": pss,
+        "shared_bytes": shared if shared is not None else (info.rss - uss if uss is not None else None),
+        "shared_artifacts": artifacts,
+        "shared_artifact_bytes": sum(a["size_bytes"] for a in artifacts if a["attached"]),
+        "preload_mode": PRELOAD_ARTIFACTS,
+    }
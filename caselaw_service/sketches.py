@@ -0,0 +1,133 @@
+"""Small mergeable summaries for streaming analytics.
+
+    HyperLogLog   distinct-count estimate in 2**p bytes (std. error ~1.04/sqrt(2**p))
+    SpaceSaving   approximate top-k counts in `capacity` entries (Metwally et al.)
+
+Both merge, so per-interval summaries can be combined into a summary of
+any span of intervals without revisiting the events.
+"""
+import hashlib
+import heapq
+import math
+from typing import Any, Dict, List, Optional, Tuple
+
+_HASH_BITS = 64
+
+
+def hash64(value: Any) -> int:
+    """Stable 64-bit hash (Python's `hash` is salted per process)."""
+    return int.from_bytes(hashlib.blake2b(str(value).encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class HyperLogLog:
+    def __init__(self, p: int = 11):
+        if not 4 <= p <= 16:
+            raise ValueError("HyperLogLog precision must be between 4 and 16")
+        self.p = p
+        self.m = 1 << p
+        self.registers = bytearray(self.m)
+
+    def add_hash(self, h: int):
+        index = h >> (_HASH_BITS - self.p)
+        rest = h & ((1 << (_HASH_BITS - self.p)) - 1)
+        # Position of the leftmost 1-bit in the remaining bits
+        rank = (_HASH_BITS - self.p) - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def add(self, value: Any):
+        self.add_hash(hash64(value))
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        """Union in place."""
+        if other.p != self.p:
+            raise ValueError("Cannot merge HyperLogLogs of different precision")
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+    def count(self) -> int:
+        m = self.m
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # Small-range correction (linear counting)
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+    def __len__(self) -> int:
+        return self.count()
+
+
+class SpaceSaving:
+    """Top-k heavy hitters; each count overestimates by at most its `error`.
+
+    The minimum is found through a lazy min-heap of (count, item) entries,
+    so an update costs O(log capacity) amortized.
+    """
+
+    def __init__(self, capacity: int = 100):
+        self.capacity = capacity
+        self.counts: Dict[Any, int] = {}
+        self.errors: Dict[Any, int] = {}
+        self._heap: List[Tuple[int, int, Any]] = []
+        self._seq = 0  # heap tiebreaker; items need not be orderable
+
+    def _push(self, item: Any):
+        self._seq += 1
+        heapq.heappush(self._heap, (self.counts[item], self._seq, item))
+        if len(self._heap) > 4 * self.capacity + 64:
+            self._rebuild()
+
+    def _rebuild(self):
+        self._heap = [(count, i, item) for i, (item, count) in enumerate(self.counts.items())]
+        self._seq = len(self._heap)
+        heapq.heapify(self._heap)
+
+    def _pop_min(self) -> Tuple[Any, int]:
+        while True:
+            count, _, item = heapq.heappop(self._heap)
+            if self.counts.get(item) == count:
+                return item, count
+
+    def add(self, item: Any, count: int = 1):
+        if item in self.counts:
+            self.counts[item] += count
+        elif len(self.counts) < self.capacity:
+            self.counts[item] = count
+            self.errors[item] = 0
+        else:
+            # Replace the minimum; the newcomer inherits its count as error
+            victim, floor = self._pop_min()
+            del self.counts[victim], self.errors[victim]
+            self.counts[item] = floor + count
+            self.errors[item] = floor
+        self._push(item)
+
+    def _floor(self) -> int:
+        """Upper bound on the count of any item not tracked here."""
+        return min(self.counts.values()) if len(self.counts) >= self.capacity else 0
+
+    def merge(self, other: "SpaceSaving") -> "SpaceSaving":
+        """Combine two summaries in place, keeping the `capacity` largest.
+
+        An item missing from one side may still have occurred there up to
+        that side's minimum, so it is credited that minimum as count and
+        error; counts keep overestimating by at most `error`.
+        """
+        floor, other_floor = self._floor(), other._floor()
+        counts, errors = {}, {}
+        for item in [*self.counts, *(item for item in other.counts if item not in self.counts)]:
+            counts[item] = self.counts.get(item, floor) + other.counts.get(item, other_floor)
+            errors[item] = self.errors.get(item, floor) + other.errors.get(item, other_floor)
+        keep = sorted(counts, key=counts.__getitem__, reverse=True)[:self.capacity]
+        self.counts = {item: counts[item] for item in keep}
+        self.errors = {item: errors[item] for item in keep}
+        self._rebuild()
+        return self
+
+    def top(self, k: Optional[int] = None) -> List[Tuple[Any, int, int]]:
+        """(item, count, error) tuples, largest first."""
+        ranked = sorted(self.counts.items(), key=lambda kv: kv[1], reverse=True)
+        return [(item, count, self.errors[item]) for item, count in ranked[:k]]
+
@@ -1,8 +1,12 @@
 """Minimal Supabase client for Oracle API persistence."""
 import os
+import time
 import httpx
 from typing import Dict, Any, Optional
 
+from caselaw_service.metrics import SUPABASE_LATENCY
+from caselaw_service.tracing import span
+
 SUPABASE_URL = os.getenv("SUPABASE_URL", "http://localhost:54321")
 SUPABASE_KEY = os.getenv("SUPABASE_ANON_KEY", "eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXVCJ9...")
 
@@ -16,29 +20,26 @@ class SupabaseClient:
             "Prefer": "return=representation",
         }
 
+    async def _request(self, operation: str, table: str, method: str, url: str, **kwargs) -> Any:
+        start = time.perf_counter()
+        try:
+            async with httpx.AsyncClient() as client, span(f"supabase_{operation}"):
+                r = await client.request(method, url, headers=self.headers, **kwargs)
+                r.raise_for_status()
+                return r.json()
+        finally:
+            SUPABASE_LATENCY.labels(operation=operation, table=table).observe(time.perf_counter() - start)
+
     async def insert(self, table: str, data: Dict[str, Any]) -> Dict[str, Any]:
-        async with httpx.AsyncClient() as client:
-            r = await client.post(
-                f"{self.url}/{table}", json=data, headers=self.headers
-            )
-            r.raise_for_status()
-            return r.json()
+        return await self._request("insert", table, "POST", f"{self.url}/{table}", json=data)
 
     async def update(self, table: str, id: str, data: Dict[str, Any]) -> Dict[str, Any]:
-        async with httpx.AsyncClient() as client:
-            r = await client.patch(
-                f"{self.url}/{table}?id=eq.{id}", json=data, headers=self.headers
-            )
-            r.raise_for_status()
-            return r.json()
+        return await self._request("update", table, "PATCH", f"{self.url}/{table}?id=eq.{id}", json=data)
 
     async def select(self, table: str, filters: Optional[Dict[str, Any]] = None) -> list:
         params = {}
         if filters:
             params.update(filters)
-        async with httpx.AsyncClient() as client:
-            r = await client.get(f"{self.url}/{table}", params=params, headers=self.headers)
-            r.raise_for_status()
-            return r.json()
+        return await self._request("select", table, "GET", f"{self.url}/{table}", params=params)
 
 supabase = SupabaseClient()
@@ -0,0 +1,131 @@
+import pytest
+from httpx import AsyncClient
+
+from caselaw_service import analytics
+from caselaw_service.analytics import AnalyticsStore
+from caselaw_service.auth import get_current_admin_user
+from caselaw_service.main import app as service_app
+from caselaw_service.sketches import HyperLogLog, SpaceSaving
+
+
+class Clock:
+    def __init__(self, now=1_700_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_hyperloglog_estimates_and_merges():
+    a, b = HyperLogLog(), HyperLogLog()
+    for i in range(20000):
+        (a if i % 2 else b).add(f"user-{i}")
+        a.add(f"user-{i % 100}")  # repeats don't count
+    assert abs(a.merge(b).count() - 20000) / 20000 < 0.05
+    small = HyperLogLog()
+    for i in range(10):
+        small.add(i)
+        small.add(i)
+    assert small.count() == 10
+
+
+def test_space_saving_finds_heavy_hitters_and_merges():
+    summary = SpaceSaving(capacity=5)
+    for i in range(1000):
+        summary.add("contract" if i % 2 else f"rare-{i}")
+    item, count, error = summary.top(1)[0]
+    assert item == "contract" and count - error <= 500 <= count
+    other = SpaceSaving(capacity=5)
+    for _ in range(300):
+        other.add("tort")
+    top = [item for item, _, _ in summary.merge(other).top(2)]
+    assert top == ["contract", "tort"] and len(summary.counts) == 5
+
+
+def test_space_saving_merge_keeps_overestimate_bound():
+    # "a" is evicted from `left` but may have occurred there up to its minimum
+    left, right = SpaceSaving(capacity=2), SpaceSaving(capacity=2)
+    for item in ["a", "b", "b", "c", "c", "c"]:
+        left.add(item)
+    for item in ["a"] * 4 + ["d"]:
+        right.add(item)
+    true = {"a": 5, "b": 2, "c": 3, "d": 1}
+    merged = left.merge(right)
+    for item, count, error in merged.top():
+        assert count - error <= true[item] <= count
+    assert [item for item, _, _ in merged.top()] == ["a", "c"]
+
+
+def test_rollups_hold_history_beyond_ring_buffer():
+    clock = Clock()
+    store = AnalyticsStore(max_events=50, clock=clock)
+    for i in range(5000):
+        clock.now += 60  # one event per minute, ~3.5 days
+        store.record_event("api_call", {"endpoint": "/search" if i % 4 else "/similar", "user_id": f"u{i % 40}"})
+        if i % 10 == 0:
+            store.record_event("search", {"query": "miranda" if i % 30 else "contract"})
+    assert len(store.events) == 50
+    week = store.get_usage_stats(days=7)
+    assert week["total_events"] == 5500
+    assert week["endpoint_usage"] == {"/similar": 1250, "/search": 3750}
+    assert week["unique_users"] == 40
+    assert [q["query"] for q in week["top_queries"]] == ["miranda", "contract"]
+    # One day is answered from hourly buckets: 24h plus the partial first hour
+    day = store.get_usage_stats(days=1)
+    assert 1440 <= day["endpoint_usage"]["/search"] + day["endpoint_usage"]["/similar"] <= 1500
+    assert store.window(5 * 60).events <= 7
+
+
+@pytest.mark.asyncio
+async def test_analytics_endpoints(monkeypatch):
+    store = AnalyticsStore()
+    monkeypatch.setattr(analytics, "_analytics", store)
+    for i in range(30):
+        store.record_event("api_call", {"endpoint": "/api/v1/caselaw/search", "user_id": f"u{i % 3}"})
+    store.record_event("dataset_access", {"dataset": "court_cases"})
+    store.record_event("search", {"query": "habeas"})
+    monkeypatch.setitem(service_app.dependency_overrides, get_current_admin_user, lambda: {"sub": "ops", "role": "admin"})
+    async with AsyncClient(app=service_app, base_url="http://test") as ac:
+        usage = (await ac.get("/analytics/usage", params={"days": 1})).json()
+        dashboard = (await ac.get("/analytics/dashboard")).json()
+        realtime = (await ac.get("/analytics/realtime")).json()
+        assert (await ac.get("/analytics/usage", params={"days": 0})).status_code == 400
+    assert usage["total_events"] == 32 and usage["dataset_usage"] == {"court_cases": 1}
+    assert dashboard["overview"]["unique_users"] == 3
+    assert dashboard["overview"]["total_api_calls"] == 30
+    assert dashboard["top_queries"] == [{"query": "habeas", "source": "search", "count": 1}]
+    assert realtime["active_requests"] == 32 and len(realtime["recent_activity"]) == 10
+
+
+def test_top_queries_over_sliding_windows():
+    clock = Clock()
+    store = AnalyticsStore(clock=clock)
+    # An hour ago "contract" dominated; in the last ten minutes "Habeas  Corpus" does
+    for _ in range(50):
+        store.record_event("search", {"source": "caselaw", "query": "contract"})
+    clock.now += 3000
+    for i in range(20):
+        store.record_event("search", {"source": "caselaw", "query": "Habeas  Corpus" if i % 2 else "habeas corpus"})
+        store.record_event("search", {"source": "dataset/court_cases", "query": "tax"})
+    recent = store.top_queries(600, n=5)
+    assert [(q["source"], q["query"], q["count"]) for q in recent] == [
+        ("caselaw", "habeas corpus", 20), ("dataset/court_cases", "tax", 20)]
+    assert store.top_queries(7200, n=1)[0]["query"] == "contract"
+    assert [q["query"] for q in store.top_queries(7200, source="dataset/court_cases")] == ["tax"]
+
+
+@pytest.mark.asyncio
+async def test_search_endpoints_feed_heavy_hitters(monkeypatch):
+    store = AnalyticsStore()
+    monkeypatch.setattr(analytics, "_analytics", store)
+    monkeypatch.setattr("caselaw_service.main._load_justia_stream", lambda: [])
+    async with AsyncClient(app=service_app, base_url="http://test") as ac:
+        for _ in range(3):
+            await ac.get("/api/v1/caselaw/search", params={"query": "Miranda Warning"})
+        await ac.get("/api/v1/dataset/search/nope", params={"keyword": "ignored"})
+    assert store.top_queries(3600) == [{"query": "miranda warning", "source": "caselaw", "count": 3, "error": 0}]
+
+    monkeypatch.setitem(service_app.dependency_overrides, get_current_admin_user, lambda: {"sub": "ops", "role": "admin"})
+    async with AsyncClient(app=service_app, base_url="http://test") as ac:
+        resp = await ac.get("/analytics/top-queries", params={"minutes": 10, "limit": 5})
+    assert resp.status_code == 200 and resp.json()["top_queries"][0]["count"] == 3
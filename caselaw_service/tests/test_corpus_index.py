@@ -0,0 +1,136 @@
+import json
+import os
+import zlib
+
+import numpy as np
+import pytest
+
+from caselaw_service.datasets import corpus_index, get_dataset, semantic_search
+
+
+class BagOfWordsEncoder:
+    """Deterministic hashed bag-of-words stand-in for the sentence encoder."""
+    dim = 64
+
+    def encode(self, texts):
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            for word in text.lower().split():
+                out[i, zlib.crc32(word.encode()) % self.dim] += 1.0
+        return out
+
+
+def _corpus(n=600):
+    docs = [{"id": str(i), "text": f"routine procedural order number {i}"} for i in range(n)]
+    docs[min(517, n - 1)]["text"] = "habeas corpus petition challenging preventive detention"
+    return docs
+
+
+@pytest.fixture
+def encoder(tmp_path, monkeypatch):
+    from caselaw_service.datasets import embedding_cache
+    enc = BagOfWordsEncoder()
+    monkeypatch.setattr(embedding_cache, "EMBEDDING_CACHE_MAX_MB", 0)
+    monkeypatch.setattr(embedding_cache, "_embedding_store", None)
+    monkeypatch.setattr(corpus_index, "CORPUS_INDEX_DIR", str(tmp_path / "corpus"))
+    monkeypatch.setattr(corpus_index, "_indexes", {})
+    monkeypatch.setattr(corpus_index, "_rejected", {})
+    monkeypatch.setattr(semantic_search, "get_model", lambda: enc)
+    return enc
+
+
+def test_matrix_is_normalized_and_aligned(encoder):
+    corpus_index.build_corpus_index("court_cases", _corpus(), text_field="text", encoder=encoder, batch_size=128)
+    index = corpus_index.get_corpus_index("court_cases")
+    assert len(index) == 600
+    assert index.embeddings.dtype == np.float16
+    norms = np.linalg.norm(index.embeddings.astype(np.float32), axis=1)
+    np.testing.assert_allclose(norms, 1.0, atol=1e-2)
+    rows = index.search(encoder.encode(["preventive detention"])[0], limit=3)
+    assert rows[0][0] == 517
+    assert index.get_docs([517])[0]["id"] == "517"
+
+
+def test_wrapper_semantic_search_covers_full_corpus(encoder):
+    # The streamed-prefix path would only ever look at the first limit*10 docs
+    corpus_index.build_corpus_index("court_cases", _corpus(), text_field="text", encoder=encoder)
+    results = get_dataset("court_cases").semantic_search("habeas corpus detention", limit=2)
+    assert results[0]["id"] == "517"
+    assert results[0]["similarity_score"] > 0.5
+
+
+def test_wrapper_falls_back_to_stream_without_index(encoder):
+    results = get_dataset("court_cases").semantic_search("Miranda rights", limit=2)
+    assert isinstance(results, list)
+    assert corpus_index.get_corpus_index("court_cases") is None
+
+
+def test_index_ignored_when_backend_differs(encoder, monkeypatch):
+    corpus_index.build_corpus_index("court_cases", _corpus(20), text_field="text", encoder=encoder)
+    monkeypatch.setattr(corpus_index, "_indexes", {})
+    from caselaw_service.datasets import encoders
+    monkeypatch.setattr(encoders, "EMBEDDING_BACKEND", "onnx")
+    assert corpus_index.get_corpus_index("court_cases") is None
+
+
+def _counting(init, calls):
+    def wrapped(self, directory):
+        calls.append(directory)
+        init(self, directory)
+    return wrapped
+
+
+def test_backend_rejection_is_cached(encoder, monkeypatch, caplog):
+    corpus_index.build_corpus_index("court_cases", _corpus(20), text_field="text", encoder=encoder)
+    monkeypatch.setattr(corpus_index, "_indexes", {})
+    from caselaw_service.datasets import encoders
+    monkeypatch.setattr(encoders, "EMBEDDING_BACKEND", "onnx")
+    loads = []
+    monkeypatch.setattr(corpus_index.CorpusIndex, "__init__", _counting(corpus_index.CorpusIndex.__init__, loads))
+    for _ in range(3):
+        assert corpus_index.get_corpus_index("court_cases") is None
+    assert len(loads) == 1
+    assert caplog.text.count("ignoring it") == 1
+
+
+def test_rebuilt_index_is_picked_up(encoder):
+    corpus_index.build_corpus_index("court_cases", _corpus(20), text_field="text", encoder=encoder)
+    old = corpus_index.get_corpus_index("court_cases")
+    old_docs = old.get_docs([0])
+    corpus_index.build_corpus_index("court_cases", _corpus(30), text_field="text", encoder=encoder)
+    # Another worker still holds the old index object
+    corpus_index._indexes["court_cases"] = old
+    new = corpus_index.get_corpus_index("court_cases")
+    assert new is not old and len(new) == 30
+    assert corpus_index.get_corpus_index("court_cases") is new
+    # The old snapshot stays readable until the worker drops it
+    assert old.get_docs([0]) == old_docs
+
+
+def test_build_swaps_in_one_complete_version(encoder, monkeypatch):
+    first = corpus_index.build_corpus_index("court_cases", _corpus(20), text_field="text", encoder=encoder)
+    seen = []
+    real_encode = encoder.encode
+
+    def encode(texts):
+        # Mid-build, readers still get the old docs with the old embeddings
+        seen.append(len(corpus_index.load_snapshot("court_cases")))
+        return real_encode(texts)
+
+    monkeypatch.setattr(encoder, "encode", encode)
+    second = corpus_index.build_corpus_index("court_cases", _corpus(30), text_field="text", encoder=encoder)
+    assert seen == [20] and corpus_index.live_index_dir("court_cases") == second
+    third = corpus_index.build_corpus_index("court_cases", _corpus(40), text_field="text", encoder=encoder)
+    # The replaced version is kept for in-flight readers; older ones go
+    assert os.path.isdir(second) and not os.path.exists(first)
+    assert len(corpus_index.get_corpus_index("court_cases")) == 40 and os.path.isdir(third)
+
+
+def test_index_rejected_when_docs_and_meta_disagree(encoder):
+    directory = corpus_index.build_corpus_index("court_cases", _corpus(20), text_field="text", encoder=encoder)
+    with open(os.path.join(directory, "meta.json")) as f:
+        meta = json.load(f)
+    meta["rows"] = 25
+    with open(os.path.join(directory, "meta.json"), "w") as f:
+        json.dump(meta, f)
+    assert corpus_index.get_corpus_index("court_cases") is None
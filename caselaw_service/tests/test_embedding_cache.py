@@ -0,0 +1,102 @@
+import os
+
+import numpy as np
+import pytest
+
+from caselaw_service.datasets.embedding_cache import EmbeddingStore, claim_directory
+
+
+class CountingModel:
+    """Deterministic stand-in for SentenceTransformer.encode."""
+    def __init__(self, dim=8):
+        self.dim = dim
+        self.encoded = []
+
+    def encode(self, texts):
+        self.encoded.extend(texts)
+        return np.array([[len(t) + i for i in range(self.dim)] for t in texts], dtype=np.float32)
+
+
+def test_only_unseen_texts_are_encoded(tmp_path):
+    store = EmbeddingStore(str(tmp_path), max_bytes=1024 * 1024)
+    model = CountingModel()
+    first = store.encode(model, ["fraud", "appeal", "fraud"])
+    assert model.encoded == ["fraud", "appeal"]
+    assert first.shape == (3, 8)
+    np.testing.assert_allclose(first[0], first[2])
+
+    second = store.encode(model, ["appeal", "contract"])
+    assert model.encoded == ["fraud", "appeal", "contract"]
+    np.testing.assert_allclose(second[0], first[1])
+    stats = store.get_stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 4
+    assert stats["entries"] == 3
+
+
+def test_store_persists_across_instances(tmp_path):
+    store = EmbeddingStore(str(tmp_path), max_bytes=1024 * 1024)
+    store.encode(CountingModel(), ["miranda rights"])
+    store.flush()
+
+    reopened = EmbeddingStore(str(tmp_path), max_bytes=1024 * 1024)
+    model = CountingModel()
+    vec = reopened.encode(model, ["miranda rights"])
+    assert model.encoded == []
+    assert vec.dtype == np.float32
+    assert reopened.get_stats()["hit_rate"] == pytest.approx(1.0)
+
+
+def test_lru_eviction_respects_size_bound(tmp_path):
+    # 8 dims * 2 bytes = 16 bytes per entry -> room for 3 entries
+    store = EmbeddingStore(str(tmp_path), max_bytes=48)
+    model = CountingModel()
+    store.encode(model, ["a", "b", "c"])
+    store.encode(model, ["a"])           # refresh "a"
+    store.encode(model, ["d"])           # evicts "b"
+    assert store.get_stats()["evictions"] == 1
+    assert store.get_stats()["entries"] == 3
+    model.encoded.clear()
+    store.encode(model, ["a", "c", "d", "b"])
+    assert model.encoded == ["b"]
+
+
+def test_workers_claim_separate_directories(tmp_path):
+    # Two workers sharing one store would hand out the same free slots
+    dir_a, fd_a = claim_directory(str(tmp_path))
+    dir_b, fd_b = claim_directory(str(tmp_path))
+    assert dir_a != dir_b
+    a = EmbeddingStore(dir_a, max_bytes=1024 * 1024)
+    b = EmbeddingStore(dir_b, max_bytes=1024 * 1024)
+    model = CountingModel()
+    a.encode(model, ["x", "y"])
+    b.encode(model, ["zzzz"])
+    np.testing.assert_allclose(a.encode(model, ["y"])[0], model.encode(["y"])[0])
+    a.flush()
+
+    # A restarted worker reclaims a free directory and its vectors
+    os.close(fd_a)
+    dir_c, fd_c = claim_directory(str(tmp_path))
+    assert dir_c == dir_a
+    model = CountingModel()
+    EmbeddingStore(dir_c, max_bytes=1024 * 1024).encode(model, ["x"])
+    assert model.encoded == []
+    os.close(fd_b)
+    os.close(fd_c)
+
+
+def test_stale_index_after_crash_is_not_trusted(tmp_path):
+    store = EmbeddingStore(str(tmp_path), max_bytes=48)
+    model = CountingModel()
+    store.encode(model, ["a", "b", "c"])
+    store.flush()
+    # Evictions reuse slots, then the worker dies before the index is saved
+    store.encode(model, ["dddd", "eeeee"])
+    del store
+
+    reopened = EmbeddingStore(str(tmp_path), max_bytes=48)
+    model.encoded.clear()
+    vecs = reopened.encode(model, ["a", "b", "c"])
+    # "a" and "b" lost their slots; they are re-encoded, not served another text's vector
+    assert model.encoded == ["a", "b"]
+    np.testing.assert_allclose(vecs, model.encode(["a", "b", "c"]))
@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+from caselaw_service.datasets import encoders
+
+
+def test_resolve_backend_rejects_unknown():
+    assert encoders.resolve_backend("ONNX") == "onnx"
+    with pytest.raises(ValueError):
+        encoders.resolve_backend("tensorrt")
+
+
+def test_cosine_agreement():
+    ref = np.array([[1.0, 0.0], [0.0, 2.0]])
+    same = encoders.cosine_agreement(ref, ref * 3)
+    assert same["mean"] == pytest.approx(1.0)
+    flipped = encoders.cosine_agreement(ref, np.array([[1.0, 0.0], [2.0, 0.0]]))
+    assert flipped["min"] == pytest.approx(0.0)
+    with pytest.raises(ValueError):
+        encoders.cosine_agreement(ref, ref[:1])
+
+
+def test_int8_quantization_agrees_with_fp32():
+    torch = pytest.importorskip("torch")
+    torch.manual_seed(0)
+    model = torch.nn.Sequential(torch.nn.Linear(64, 128), torch.nn.ReLU(), torch.nn.Linear(128, 32))
+    x = torch.randn(16, 64)
+    with torch.no_grad():
+        ref = model(x).numpy()
+        out = encoders.quantize_int8(model)(x).numpy()
+    assert encoders.cosine_agreement(ref, out)["min"] > 0.98
+
+
+def test_compare_backends_reports_failures():
+    class FakeEncoder:
+        def __init__(self, noise):
+            self.noise = noise
+
+        def encode(self, texts, batch_size=32):
+            base = np.array([[len(t), t.count(" ") + 1.0] for t in texts])
+            return base + self.noise
+
+    def make(backend):
+        if backend == "onnx":
+            raise ImportError("onnxruntime not installed")
+        return FakeEncoder(0.0 if backend == "torch" else 0.01)
+
+    report = encoders.compare_backends(make, backends=["torch", "torch-int8", "onnx"], repeats=1)
+    assert report["torch"]["agreement"]["min"] == pytest.approx(1.0)
+    assert report["torch-int8"]["agreement"]["min"] > 0.99
+    assert report["torch-int8"]["throughput"]["texts"] == len(encoders.SAMPLE_LEGAL_TEXTS)
+    assert "error" in report["onnx"]
+
+
+def test_onnx_export_matches_torch(tmp_path, monkeypatch):
+    torch = pytest.importorskip("torch")
+    ort = pytest.importorskip("onnxruntime")
+    transformers = pytest.importorskip("transformers")
+    monkeypatch.setattr(encoders, "ONNX_CACHE_DIR", str(tmp_path))
+
+    config = transformers.BertConfig(
+        vocab_size=100, hidden_size=32, num_hidden_layers=2, num_attention_heads=2, intermediate_size=64
+    )
+    model = transformers.BertModel(config).eval()
+
+    def tokenizer(texts, return_tensors="pt"):
+        ids = torch.tensor([[1, 5, 7, 9, 2]])
+        return {"input_ids": ids, "attention_mask": torch.ones_like(ids)}
+
+    # Reference first: tracing for export may leave the eager model altered
+    ids = np.array([[1, 4, 6, 8, 10, 2], [1, 3, 2, 0, 0, 0]], dtype=np.int64)
+    mask = (ids != 0).astype(np.int64)
+    with torch.no_grad():
+        torch_out = model(input_ids=torch.from_numpy(ids), attention_mask=torch.from_numpy(mask)).last_hidden_state.numpy()
+
+    path = encoders.export_onnx("tiny/bert", model=model, tokenizer=tokenizer)
+    assert path.endswith("tiny__bert.onnx")
+
+    session = ort.InferenceSession(path, providers=["CPUExecutionProvider"])
+    feed = {i.name: {"input_ids": ids, "attention_mask": mask}[i.name] for i in session.get_inputs()}
+    onnx_out = session.run(["last_hidden_state"], feed)[0]
+    pooled_onnx = encoders._pool(onnx_out, mask, "mean")
+    pooled_torch = encoders._pool(torch_out, mask, "mean")
+    assert encoders.cosine_agreement(pooled_torch, pooled_onnx)["min"] > 0.999
@@ -0,0 +1,133 @@
+import asyncio
+import contextvars
+import threading
+
+import pytest
+
+from caselaw_service.executors import ExecutorManager, ManagedPool, PoolSaturated
+
+
+def test_pool_rejects_beyond_bound_and_alerts(caplog):
+    pool = ManagedPool("test", max_workers=1, max_queue=2)
+    release = threading.Event()
+    try:
+        futures = [pool.submit(release.wait) for _ in range(3)]
+        with pytest.raises(PoolSaturated):
+            pool.submit(release.wait)
+        stats = pool.get_stats()
+        assert stats["rejected"] == 1 and stats["max_queued"] >= 2
+        assert stats["saturation_alerts"] == 1
+        assert "near saturation" in caplog.text
+    finally:
+        release.set()
+        for f in futures:
+            f.result(timeout=5)
+        pool.shutdown()
+    stats = pool.get_stats()
+    assert stats["completed"] == 3 and stats["active"] == 0 and stats["queued"] == 0
+
+
+def test_run_propagates_context_and_errors():
+    manager = ExecutorManager({"io": (2, 4)})
+    var = contextvars.ContextVar("request_id", default=None)
+
+    async def main():
+        var.set("req-1")
+        seen = await manager.run("io", var.get)
+        with pytest.raises(ZeroDivisionError):
+            await manager.run("io", lambda: 1 / 0)
+        return seen
+
+    try:
+        assert asyncio.run(main()) == "req-1"
+        assert manager.get_stats()["io"]["failed"] == 1
+        with pytest.raises(KeyError):
+            manager.get("gpu")
+    finally:
+        manager.shutdown()
+    assert manager.get_stats() == {}
+
+
+def test_async_indian_wrapper_reuses_shared_pool(monkeypatch):
+    from caselaw_service import executors
+    from caselaw_service.datasets.indian_legal_dataset import AsyncIndianLegalWrapper
+
+    manager = ExecutorManager({"dataset": (2, 8)})
+    monkeypatch.setattr(executors, "_executor_manager", manager)
+    wrapper = AsyncIndianLegalWrapper()
+    monkeypatch.setattr(wrapper.sync_wrapper, "analyze_legal_trends", lambda legal_area: {"legal_area": legal_area})
+
+    async def main():
+        return [await wrapper.analyze_legal_trends(legal_area=f"a{i}") for i in range(20)]
+
+    try:
+        before = threading.active_count()
+        results = asyncio.run(main())
+        assert results[-1] == {"legal_area": "a19"}
+        # At most the pool's two workers were added, not one executor per call
+        assert threading.active_count() - before <= 2
+        assert manager.get_stats()["dataset"]["completed"] == 20
+    finally:
+        manager.shutdown()
+
+
+def test_cancelled_queued_task_releases_its_slot():
+    pool = ManagedPool("test", max_workers=1, max_queue=2)
+    release = threading.Event()
+
+    async def main():
+        blocker = pool.submit(release.wait)
+        for _ in range(2):
+            # Times out while still queued behind the blocker
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(pool.run(release.wait), 0.05)
+        assert pool.get_stats()["queued"] == 0
+        release.set()
+        blocker.result(timeout=5)
+
+    try:
+        asyncio.run(main())
+        # The freed slots are usable again
+        assert [pool.submit(lambda: 1).result(timeout=5) for _ in range(3)] == [1, 1, 1]
+    finally:
+        release.set()
+        pool.shutdown()
+    stats = pool.get_stats()
+    assert stats["queued"] == 0 and stats["active"] == 0
+
+
+def test_started_iteration_survives_saturation(monkeypatch):
+    from caselaw_service import executors
+
+    manager = ExecutorManager({"dataset": (1, 0)})
+    monkeypatch.setattr(executors, "_executor_manager", manager)
+    pool = manager.get("dataset")
+
+    async def main():
+        items = []
+        async for item in executors.iterate_in_pool("dataset", range(10), chunk_size=3):
+            items.append(item)
+            if len(items) == 1:
+                # Other traffic fills the pool while the stream is mid-body
+                pool.submit(release.wait)
+                with pytest.raises(PoolSaturated):
+                    pool.submit(lambda: None)
+                threading.Timer(0.1, release.set).start()
+        return items
+
+    release = threading.Event()
+    try:
+        assert asyncio.run(main()) == list(range(10))
+        # A new stream is still refused while the pool is full
+        blocker = pool.submit(threading.Event().wait, 0.2)
+
+        async def start():
+            async for _ in executors.iterate_in_pool("dataset", range(3)):
+                pass
+
+        with pytest.raises(PoolSaturated):
+            asyncio.run(start())
+        blocker.result(timeout=5)
+    finally:
+        release.set()
+        manager.shutdown()
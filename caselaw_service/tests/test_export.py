@@ -0,0 +1,123 @@
+import csv
+import io
+import itertools
+import json
+
+import pytest
+from httpx import AsyncClient
+
+from caselaw_service.auth import get_current_user
+from caselaw_service.exporters import EXPORT_CHUNK_BYTES, json_array_chunks, ndjson_chunks
+from caselaw_service.main import app
+
+
+def _doc(i):
+    return {"id": str(i), "case_name": f"State v. Doe {i}", "text": "held, \"appeal\" dismissed\nwith costs"}
+
+
+@pytest.fixture
+def corpus(monkeypatch):
+    from caselaw_service.datasets.court_cases import CourtCasesDataset
+    monkeypatch.setattr(CourtCasesDataset, "_get_dataset", lambda self: (_doc(i) for i in itertools.count()))
+
+
+def test_encoders_are_lazy_over_unbounded_streams():
+    docs = (_doc(i) for i in itertools.count())
+    first = next(ndjson_chunks(docs))
+    assert EXPORT_CHUNK_BYTES <= len(first) < EXPORT_CHUNK_BYTES * 2
+    assert json.loads(first.splitlines()[0]) == _doc(0)
+    assert next(json_array_chunks(_doc(i) for i in itertools.count())).startswith(b"[\n{")
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("fmt", ["csv", "json", "ndjson"])
+async def test_streamed_exports_round_trip(corpus, fmt):
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        resp = await ac.get(f"/export/datasets/court_cases/{fmt}", params={"limit": 2500})
+    assert resp.status_code == 200
+    assert "content-length" not in resp.headers
+    assert resp.headers["content-disposition"].endswith(f".{fmt}")
+    if fmt == "csv":
+        rows = list(csv.DictReader(io.StringIO(resp.text)))
+    elif fmt == "json":
+        rows = resp.json()
+    else:
+        rows = [json.loads(line) for line in resp.text.splitlines()]
+    assert rows == [_doc(i) for i in range(2500)]
+
+
+@pytest.mark.asyncio
+async def test_large_exports_need_elevated_role(corpus):
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        resp = await ac.get("/export/datasets/court_cases/ndjson", params={"limit": 20000})
+        assert resp.status_code == 403
+        app.dependency_overrides[get_current_user] = lambda: {"sub": "ops", "role": "admin"}
+        try:
+            resp = await ac.get("/export/datasets/court_cases/ndjson", params={"limit": 20000})
+        finally:
+            app.dependency_overrides.pop(get_current_user)
+    assert resp.status_code == 200
+    assert len(resp.text.splitlines()) == 20000
+
+
+@pytest.mark.asyncio
+async def test_missing_or_empty_dataset_is_404(monkeypatch):
+    from caselaw_service.datasets.court_cases import CourtCasesDataset
+    monkeypatch.setattr(CourtCasesDataset, "_get_dataset", lambda self: [])
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        assert (await ac.get("/export/datasets/court_cases/csv")).status_code == 404
+        assert (await ac.get("/export/datasets/no_such_dataset/csv")).status_code == 404
+
+
+def _patent(i):
+    return {"id": str(i), "year": 2015 + i % 8, "abstract": f"A {'machine' if i % 3 == 0 else 'compound'} for item {i}", "claims": "1. A method. " * 20}
+
+
+@pytest.fixture(params=["pylist", "arrow"])
+def patents(request, monkeypatch):
+    from caselaw_service.datasets.patent_data import PatentDataDataset
+    docs = [_patent(i) for i in range(3000)]
+    if request.param == "arrow":
+        hf = pytest.importorskip("datasets")
+        stream = hf.Dataset.from_list(docs).to_iterable_dataset(num_shards=3)
+        monkeypatch.setattr(PatentDataDataset, "_get_dataset", lambda self: stream)
+    else:
+        monkeypatch.setattr(PatentDataDataset, "_get_dataset", lambda self: iter(docs))
+    return docs
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("fmt", ["parquet", "arrow"])
+async def test_columnar_export_with_projection_and_filters(patents, fmt):
+    pa = pytest.importorskip("pyarrow")
+    import pyarrow.parquet as pq
+
+    params = {"limit": 500, "columns": "id,year", "keyword": "MACHINE", "where": "year:2020"}
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        resp = await ac.get(f"/export/datasets/patent_data/{fmt}", params=params)
+    assert resp.status_code == 200
+    if fmt == "parquet":
+        table = pq.read_table(io.BytesIO(resp.content))
+    else:
+        table = pa.ipc.open_stream(resp.content).read_all()
+    expected = [{"id": d["id"], "year": d["year"]} for d in patents if "machine" in d["abstract"] and d["year"] == 2020]
+    assert table.column_names == ["id", "year"]
+    assert table.to_pylist() == expected[:500]
+
+
+@pytest.mark.asyncio
+async def test_parquet_is_much_smaller_than_json(patents):
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        as_json = await ac.get("/export/datasets/patent_data/json", params={"limit": 3000})
+        as_parquet = await ac.get("/export/datasets/patent_data/parquet", params={"limit": 3000})
+    assert as_parquet.status_code == 200
+    assert len(as_parquet.content) * 10 < len(as_json.content)
+
+
+@pytest.mark.asyncio
+async def test_columnar_export_rejects_unknown_columns(patents):
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        resp = await ac.get("/export/datasets/patent_data/arrow", params={"columns": "id,inventor"})
+        assert resp.status_code == 400
+        resp = await ac.get("/export/datasets/patent_data/arrow", params={"where": "year"})
+        assert resp.status_code == 400
@@ -0,0 +1,171 @@
+import itertools
+import json
+import os
+import subprocess
+import sys
+import threading
+
+import pytest
+from httpx import AsyncClient
+
+from caselaw_service import export_jobs
+from caselaw_service.export_api import _submit_job as submit_job
+from caselaw_service.export_jobs import ExportJobManager
+from caselaw_service.main import app
+
+
+def _doc(i):
+    return {"id": str(i), "case_name": f"State v. Doe {i}", "text": "appeal dismissed"}
+
+
+@pytest.fixture
+def manager(monkeypatch, tmp_path):
+    from caselaw_service.datasets.court_cases import CourtCasesDataset
+    monkeypatch.setattr(CourtCasesDataset, "_get_dataset", lambda self: (_doc(i) for i in itertools.count()))
+    manager = ExportJobManager(str(tmp_path), chunk_rows=100)
+    monkeypatch.setattr(export_jobs, "_export_job_manager", manager)
+    # Jobs are run synchronously by the tests instead of in the export pool
+    monkeypatch.setattr("caselaw_service.export_api._submit_job", lambda job: None)
+    return manager
+
+
+def _dead_pid():
+    proc = subprocess.Popen([sys.executable, "-c", "pass"])
+    proc.wait()
+    return proc.pid
+
+
+def _rows(body: bytes):
+    return [json.loads(line) for line in body.splitlines()]
+
+
+@pytest.mark.asyncio
+async def test_job_chunks_cursor_and_range_download(manager):
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        resp = await ac.post("/export/jobs", json={"dataset": "court_cases", "limit": 250})
+        assert resp.status_code == 202
+        job_id = resp.json()["id"]
+        manager.run(job_id)
+
+        job = (await ac.get(f"/export/jobs/{job_id}")).json()
+        assert job["status"] == "completed" and job["rows_written"] == 250
+        page = (await ac.get(f"/export/jobs/{job_id}/chunks", params={"cursor": 1, "limit": 1})).json()
+        assert [c["rows"] for c in page["chunks"]] == [100] and page["next_cursor"] == 2 and not page["complete"]
+        page = (await ac.get(f"/export/jobs/{job_id}/chunks", params={"cursor": 2})).json()
+        assert [c["rows"] for c in page["chunks"]] == [50] and page["complete"]
+
+        chunk = await ac.get(f"/export/jobs/{job_id}/chunks/2")
+        assert _rows(chunk.content) == [_doc(i) for i in range(200, 250)]
+
+        full = await ac.get(f"/export/jobs/{job_id}/download")
+        assert full.status_code == 200 and full.headers["accept-ranges"] == "bytes"
+        assert _rows(full.content) == [_doc(i) for i in range(250)]
+        # Resume a broken download from byte 1000, across chunk boundaries
+        total = len(full.content)
+        part = await ac.get(f"/export/jobs/{job_id}/download", headers={"Range": "bytes=1000-"})
+        assert part.status_code == 206
+        assert part.headers["content-range"] == f"bytes 1000-{total - 1}/{total}"
+        assert part.content == full.content[1000:]
+        tail = await ac.get(f"/export/jobs/{job_id}/download", headers={"Range": "bytes=-10"})
+        assert tail.content == full.content[-10:]
+        bad = await ac.get(f"/export/jobs/{job_id}/download", headers={"Range": f"bytes={total}-"})
+        assert bad.status_code == 416
+
+        assert (await ac.delete(f"/export/jobs/{job_id}")).status_code == 200
+        assert (await ac.get(f"/export/jobs/{job_id}")).status_code == 404
+
+
+def test_interrupted_job_resumes_after_last_chunk(manager, monkeypatch):
+    job = manager.create("anon", "court_cases", "csv", limit=250)
+    # Simulate the process dying after two chunks
+    stream = itertools.islice(iter(_doc(i) for i in itertools.count()), 200)
+    from caselaw_service.datasets.court_cases import CourtCasesDataset
+    with monkeypatch.context() as m:
+        m.setattr(CourtCasesDataset, "_get_dataset", lambda self: stream)
+        manager.run(job["id"])
+    job["status"], job["owner_pid"] = "running", _dead_pid()
+    manager._save(job)
+
+    restarted = ExportJobManager(manager.directory, chunk_rows=100)
+    assert restarted.get(job["id"])["status"] == "interrupted"
+    restarted.prepare_resume(job["id"])
+    restarted.run(job["id"])
+    job = restarted.get(job["id"])
+    assert job["status"] == "completed" and [c["rows"] for c in job["chunks"]] == [100, 100, 50]
+    data = b"".join(open(p, "rb").read() for p in restarted.file_parts(job["id"]))
+    lines = data.decode().splitlines()
+    assert lines[0] == "id,case_name,text" and len(lines) == 251
+    assert lines[-1] == "249,State v. Doe 249,appeal dismissed"
+
+
+@pytest.mark.asyncio
+async def test_running_jobs_are_capped_per_user(manager):
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        for _ in range(manager.per_user):
+            assert (await ac.post("/export/jobs", json={"dataset": "court_cases", "limit": 10})).status_code == 202
+        resp = await ac.post("/export/jobs", json={"dataset": "court_cases", "limit": 10})
+        assert resp.status_code == 429
+        assert (await ac.post("/export/jobs", json={"dataset": "nope", "limit": 10})).status_code == 404
+
+
+def test_workers_share_job_state(manager):
+    # A second worker process sees the same directory through its own manager
+    other = ExportJobManager(manager.directory, chunk_rows=100)
+    job = manager.create("anon", "court_cases", "ndjson", limit=150)
+    job["status"] = "running"
+    manager._save(job)
+    # The owner is alive: the other worker neither interrupts nor runs it
+    assert other.get(job["id"])["status"] == "running"
+    assert [j["id"] for j in other.list("anon")] == [job["id"]]
+    other.run(job["id"])
+    assert manager.get(job["id"])["chunks"] == []
+
+    # Once the owner is gone the job can be resumed, and only the worker that
+    # queued it runs it
+    job["status"], job["owner_pid"] = "running", _dead_pid()
+    manager._save(job)
+    assert other.get(job["id"])["status"] == "interrupted"
+    resumed = other.prepare_resume(job["id"])
+    assert resumed["status"] == "queued" and resumed["owner_pid"] == os.getpid()
+    resumed["owner_pid"] = os.getppid()
+    other._save(resumed)
+    manager.run(job["id"])
+    assert manager.get(job["id"])["status"] == "queued"
+
+
+@pytest.mark.asyncio
+async def test_saturated_submit_is_persisted(manager, monkeypatch):
+    from caselaw_service import export_api
+    from caselaw_service.executors import ExecutorManager
+
+    monkeypatch.setattr(export_api, "_submit_job", submit_job)
+    full = ExecutorManager({"export": (1, 0)})
+    monkeypatch.setattr(export_api, "get_executor_manager", lambda: full)
+    release = threading.Event()
+    full.get("export").submit(release.wait)
+    try:
+        async with AsyncClient(app=app, base_url="http://test") as ac:
+            resp = await ac.post("/export/jobs", json={"dataset": "court_cases", "limit": 10})
+    finally:
+        release.set()
+        full.shutdown()
+    assert resp.status_code == 503
+    (job,) = manager.list("anon")
+    assert job["status"] == "interrupted"
+
+
+def test_cancel_from_another_worker_stops_the_run_cleanly(manager, monkeypatch):
+    other = ExportJobManager(manager.directory, chunk_rows=100)
+    job = manager.create("anon", "court_cases", "ndjson", limit=250)
+    encode = export_jobs._encode_chunk
+
+    def encode_then_cancel(job, docs):
+        data = encode(job, docs)
+        if job["chunks"]:
+            other.cancel(job["id"])
+        return data
+
+    monkeypatch.setattr(export_jobs, "_encode_chunk", encode_then_cancel)
+    manager.run(job["id"])
+    assert manager.get(job["id"]) is None
+    assert not os.path.exists(os.path.join(manager.directory, job["id"]))
@@ -0,0 +1,103 @@
+import random
+
+import pytest
+from httpx import AsyncClient
+
+from caselaw_service.datasets import facet_cube
+from caselaw_service.datasets.facet_cube import FacetCube, refresh_facet_cube
+from caselaw_service.main import app
+
+AREAS = ["criminal", "tax", "family", "constitutional"]
+
+
+def _docs(n=300, seed=0):
+    rng = random.Random(seed)
+    docs = []
+    for i in range(n):
+        docs.append({
+            "id": str(i),
+            "court": rng.choice(["Supreme Court", "Delhi HC", "Bombay HC"]),
+            "state": rng.choice(["Delhi", "Maharashtra", "Kerala"]),
+            "date": "" if i % 10 == 0 else f"{rng.randint(2000, 2023)}-01-01",
+            "legal_areas": rng.sample(AREAS, rng.randint(0, 2)),
+        })
+    return docs
+
+
+def _streaming_trends(docs, legal_area):
+    """Uncapped version of the original per-request streaming count."""
+    stats = {"legal_area": legal_area, "court_distribution": {}, "state_distribution": {}, "temporal_trends": {}, "total_cases": 0}
+    for doc in docs:
+        if legal_area not in doc.get("legal_areas", []):
+            continue
+        stats["total_cases"] += 1
+        for key, value in (("court_distribution", doc["court"]), ("state_distribution", doc["state"])):
+            stats[key][value] = stats[key].get(value, 0) + 1
+        if doc["date"]:
+            stats["temporal_trends"][doc["date"][:4]] = stats["temporal_trends"].get(doc["date"][:4], 0) + 1
+    return stats
+
+
+def test_trends_match_full_scan():
+    docs = _docs()
+    cube = FacetCube.from_docs(docs)
+    assert cube.rows == len(docs)
+    for area in AREAS + ["maritime"]:
+        assert cube.trends(area) == _streaming_trends(docs, area)
+
+
+def test_save_and_load_roundtrip(tmp_path):
+    cube = FacetCube.from_docs(_docs())
+    loaded = FacetCube.load(cube.save(str(tmp_path / "cube.npz")))
+    assert loaded.rows == cube.rows and loaded.last_row_key == cube.last_row_key
+    for area in AREAS:
+        assert loaded.trends(area) == cube.trends(area)
+
+
+def test_refresh_is_incremental_for_appended_snapshot(monkeypatch):
+    hf = pytest.importorskip("datasets")
+    docs = _docs()
+    cube = refresh_facet_cube(hf.Dataset.from_list(docs[:120]))
+    assert cube.rows == 120
+
+    seen = []
+    original = FacetCube.update
+    monkeypatch.setattr(FacetCube, "update", lambda self, rows: original(self, (seen.append(r) or r for r in rows)))
+    cube = refresh_facet_cube(hf.Dataset.from_list(docs), cube)
+    assert len(seen) == len(docs) - 120
+    assert cube.trends("tax") == _streaming_trends(docs, "tax")
+
+
+def test_refresh_recounts_rebuilt_snapshot():
+    hf = pytest.importorskip("datasets")
+    cube = refresh_facet_cube(hf.Dataset.from_list(_docs(seed=1)[:120]))
+    docs = _docs(seed=2)
+    cube = refresh_facet_cube(hf.Dataset.from_list(docs), cube)
+    assert cube.rows == len(docs)
+    assert cube.trends("criminal") == _streaming_trends(docs, "criminal")
+
+
+@pytest.mark.asyncio
+async def test_trends_endpoint_uses_cube(tmp_path, monkeypatch):
+    docs = _docs()
+    monkeypatch.setattr(facet_cube, "FACET_CUBE_PATH", str(tmp_path / "cube.npz"))
+    monkeypatch.setattr(facet_cube, "_facet_cube_stamp", facet_cube._UNLOADED)
+    FacetCube.from_docs(docs).save(facet_cube.FACET_CUBE_PATH)
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        resp = await ac.get("/api/v1/dataset/indian_legal/trends", params={"legal_area": "family"})
+    assert resp.status_code == 200
+    assert resp.json() == _streaming_trends(docs, "family")
+
+
+def test_cube_saved_by_another_process_is_reloaded(tmp_path, monkeypatch):
+    path = str(tmp_path / "cube.npz")
+    monkeypatch.setattr(facet_cube, "FACET_CUBE_PATH", path)
+    monkeypatch.setattr(facet_cube, "_facet_cube_stamp", facet_cube._UNLOADED)
+    assert facet_cube.get_facet_cube() is None
+    docs = _docs()
+    FacetCube.from_docs(docs[:10]).save(path)
+    first = facet_cube.get_facet_cube()
+    assert first.rows == 10 and facet_cube.get_facet_cube() is first
+    # A rebuild elsewhere replaces the file
+    FacetCube.from_docs(docs).save(path)
+    assert facet_cube.get_facet_cube().rows == len(docs)
@@ -0,0 +1,110 @@
+import random
+import shutil
+
+import pytest
+from httpx import AsyncClient
+
+from caselaw_service.datasets import corpus_index, facet_index, get_dataset
+from caselaw_service.main import app
+
+AREAS = ["criminal", "tax", "family", "maritime"]
+
+
+def _docs(n=2500, seed=0):
+    rng = random.Random(seed)
+    docs = []
+    for i in range(n):
+        # maritime is rare: far fewer than limit * 10 docs in the stream prefix
+        areas = rng.sample(AREAS[:3], rng.randint(0, 2)) + (["maritime"] if i % 401 == 400 else [])
+        docs.append({"id": str(i), "state": rng.choice(["Delhi", "Kerala", "Goa"]), "legal_areas": areas})
+    return docs
+
+
+@pytest.fixture
+def indexed(tmp_path, monkeypatch):
+    hf = pytest.importorskip("datasets")
+    monkeypatch.setattr(corpus_index, "CORPUS_INDEX_DIR", str(tmp_path / "corpus"))
+    monkeypatch.setattr(facet_index, "_facet_indexes", {})
+    monkeypatch.setattr(facet_index, "_rejected", {})
+    docs = _docs()
+    snapshot = hf.Dataset.from_list(docs)
+    snapshot.save_to_disk(str(tmp_path / "corpus" / "indian_legal_dataset" / "docs"))
+    facet_index.build_facet_index("indian_legal_dataset", snapshot, ("legal_areas", "state"))
+    return docs
+
+
+def _expected(docs, area, state=None):
+    return [d["id"] for d in docs if area in d["legal_areas"] and (not state or d["state"] == state)]
+
+
+def test_bitset_intersection_is_exact(indexed):
+    index, _ = facet_index.get_facet_index("indian_legal_dataset")
+    for area in AREAS:
+        for state in (None, "Delhi", "Goa"):
+            rows = index.match(legal_areas=area, state=state)
+            assert [indexed[r]["id"] for r in rows] == _expected(indexed, area, state)
+    assert len(index.match(legal_areas="admiralty")) == 0
+
+
+def test_pages_cover_all_matches(indexed):
+    ds = get_dataset("indian_legal_dataset")
+    expected = _expected(indexed, "tax", "Kerala")
+    seen, offset = [], 0
+    while True:
+        page = ds.page_by_legal_area_and_state("tax", "Kerala", limit=100, offset=offset)
+        assert page["total"] == len(expected) and page["complete"]
+        if not page["results"]:
+            break
+        seen += [d["id"] for d in page["results"]]
+        offset += 100
+    assert seen == expected
+
+
+def test_stale_index_is_ignored(indexed, tmp_path):
+    hf = pytest.importorskip("datasets")
+    hf.Dataset.from_list(indexed[:10]).save_to_disk(str(tmp_path / "other"))
+    docs_dir = tmp_path / "corpus" / "indian_legal_dataset" / "docs"
+    shutil.rmtree(docs_dir)
+    shutil.copytree(tmp_path / "other", docs_dir)
+    assert facet_index.get_facet_index("indian_legal_dataset") is None
+
+
+
+def test_same_length_snapshot_is_ignored(indexed, tmp_path):
+    # A rebuilt snapshot of the same length must not reuse the old bitmaps
+    hf = pytest.importorskip("datasets")
+    docs = list(reversed(indexed))
+    docs_dir = tmp_path / "corpus" / "indian_legal_dataset" / "docs"
+    hf.Dataset.from_list(docs).save_to_disk(str(tmp_path / "other"))
+    shutil.rmtree(docs_dir)
+    shutil.copytree(tmp_path / "other", docs_dir)
+    assert facet_index.get_facet_index("indian_legal_dataset") is None
+
+def test_rejection_is_cached_and_rebuild_is_picked_up(indexed, tmp_path, monkeypatch):
+    hf = pytest.importorskip("datasets")
+    docs = indexed[:50]
+    docs_dir = tmp_path / "corpus" / "indian_legal_dataset" / "docs"
+    shutil.rmtree(docs_dir)
+    hf.Dataset.from_list(docs).save_to_disk(str(docs_dir))
+    loads = []
+    original = facet_index.FacetIndex.load
+    monkeypatch.setattr(facet_index.FacetIndex, "load", lambda directory: loads.append(1) or original(directory))
+    for _ in range(3):
+        assert facet_index.get_facet_index("indian_legal_dataset") is None
+    assert len(loads) == 1
+
+    # Another process rebuilds the index for the new snapshot
+    facet_index.build_facet_index("indian_legal_dataset", hf.load_from_disk(str(docs_dir)), ("legal_areas", "state"))
+    facet_index._facet_indexes.clear()
+    index, _ = facet_index.get_facet_index("indian_legal_dataset")
+    assert index.rows == 50 and len(loads) == 2
+
+
+@pytest.mark.asyncio
+async def test_search_by_area_endpoint_returns_rare_area(indexed):
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        resp = await ac.get("/api/v1/dataset/indian_legal/search_by_area", params={"legal_area": "maritime", "limit": 2, "offset": 2})
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["total"] == len(_expected(indexed, "maritime"))
+    assert [d["id"] for d in body["results"]] == _expected(indexed, "maritime")[2:4]
@@ -0,0 +1,92 @@
+import pytest
+from httpx import AsyncClient
+
+from caselaw_service import feedback
+from caselaw_service.auth import get_current_user
+from caselaw_service.feedback import FeedbackStore
+from caselaw_service.main import app
+
+
+def _entry(user="u1", dataset="court_cases", item="1", kind="helpful", rating=None):
+    return {"user_id": user, "dataset_name": dataset, "item_id": item, "feedback_type": kind,
+            "comment": "", "user_rating": rating}
+
+
+def test_counters_and_persistence(tmp_path):
+    path = str(tmp_path / "feedback.sqlite3")
+    store = FeedbackStore(path)
+    store.add_feedback(_entry(rating=5))
+    store.add_feedback(_entry(rating=2, kind="inaccurate"))
+    store.add_feedback(_entry(dataset="patent_data", rating=None))
+    store.close()
+
+    reopened = FeedbackStore(path)
+    assert reopened.get_feedback_stats() == {
+        "total_feedback": 3,
+        "by_type": {"helpful": 2, "inaccurate": 1},
+        "by_dataset": {"court_cases": 2, "patent_data": 1},
+        "average_rating": 3.5,
+    }
+    assert reopened.get_feedback_stats("patent_data")["total_feedback"] == 1
+    assert reopened.get_feedback_stats("patent_data")["average_rating"] == 0
+    plan = reopened._conn.execute(
+        "EXPLAIN QUERY PLAN SELECT id FROM feedback WHERE user_id = ? ORDER BY id DESC", ("u1",)).fetchall()
+    assert "feedback_by_user" in str(plan)
+
+
+def test_item_counts_count_one_vote_per_user():
+    store = FeedbackStore(":memory:")
+    for _ in range(5):
+        store.add_feedback(_entry(user="u1", item="7"))
+    store.add_feedback(_entry(user="u2", item="7", kind="irrelevant"))
+    assert store.item_counts("court_cases") == [("7", 1, 1)]
+    # A user changing their mind moves their vote; neutral feedback keeps it
+    store.add_feedback(_entry(user="u1", item="7", kind="inaccurate"))
+    store.add_feedback(_entry(user="u1", item="7", kind="other"))
+    assert store.item_counts("court_cases") == [("7", 0, 2)]
+    assert store.get_feedback_stats()["total_feedback"] == 8
+
+
+def test_old_databases_are_recounted_by_voter(tmp_path):
+    import sqlite3
+    path = str(tmp_path / "feedback.sqlite3")
+    store = FeedbackStore(path)
+    for kind in ("helpful", "helpful", "inaccurate"):
+        store.add_feedback(_entry(user="u1", item="7", kind=kind))
+    store.add_feedback(_entry(user="u2", item="7"))
+    store.close()
+    # Simulate a database written before votes were tracked
+    conn = sqlite3.connect(path)
+    with conn:
+        conn.execute("DROP TABLE feedback_item_votes")
+        conn.execute("UPDATE feedback_item_counts SET positive = 3, negative = 1")
+    conn.close()
+    assert FeedbackStore(path).item_counts("court_cases") == [("7", 1, 1)]
+
+
+def test_user_feedback_pages_newest_first():
+    store = FeedbackStore(":memory:")
+    ids = [store.add_feedback(_entry(user="u1" if i % 2 else "u2", item=str(i))) for i in range(10)]
+    page = store.get_user_feedback("u1", limit=3)
+    assert page["total"] == 5 and [f["item_id"] for f in page["feedback"]] == ["9", "7", "5"]
+    rest = store.get_user_feedback("u1", limit=3, before_id=page["feedback"][-1]["id"])
+    assert [f["item_id"] for f in rest["feedback"]] == ["3", "1"]
+    assert ids == sorted(ids)
+
+
+@pytest.mark.asyncio
+async def test_feedback_endpoints(monkeypatch):
+    monkeypatch.setattr(feedback, "_feedback_store", FeedbackStore(":memory:"))
+    monkeypatch.setitem(app.dependency_overrides, get_current_user, lambda: {"sub": "user-7", "role": "authenticated"})
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        body = {"dataset_name": "court_cases", "item_id": "42", "feedback_type": "helpful", "user_rating": 4}
+        first = await ac.post("/feedback/submit", json=body)
+        await ac.post("/feedback/submit", json={**body, "feedback_type": "irrelevant", "user_rating": 2})
+        assert (await ac.post("/feedback/submit", json={**body, "user_rating": 9})).status_code == 422
+        assert (await ac.post("/feedback/submit", json={**body, "feedback_type": "great"})).status_code == 422
+        stats = (await ac.get("/feedback/stats", params={"dataset_name": "court_cases"})).json()
+        mine = (await ac.get("/feedback/my-feedback", params={"limit": 1})).json()
+    assert first.json()["feedback_id"] == 1
+    assert stats["total_feedback"] == 2 and stats["average_rating"] == 3
+    assert mine["total"] == 2 and mine["feedback"][0]["feedback_type"] == "irrelevant"
+    assert mine["feedback"][0]["user_id"] == "user-7"
@@ -0,0 +1,51 @@
+"""Startup budget: importing the API must not pull in the ML stack.
+
+Measured with `python -X importtime` in a fresh interpreter. Override the
+budget with IMPORT_TIME_BUDGET_MS on slow CI machines.
+"""
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+IMPORT_TIME_BUDGET_MS = float(os.getenv("IMPORT_TIME_BUDGET_MS", "3000"))
+HEAVY_MODULES = {"torch", "transformers", "sentence_transformers", "datasets", "faiss", "sklearn"}
+
+
+def _importtime(module: str):
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_ROOT, capture_output=True, text=True, timeout=120,
+    )
+    assert proc.returncode == 0, proc.stderr[-2000:]
+    cumulative = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cum, name = line.split("|")
+        if cum.strip().isdigit():
+            cumulative[name.strip()] = int(cum.strip()) / 1000.0
+    return cumulative
+
+
+@pytest.mark.parametrize("module", ["caselaw_service.datasets", "caselaw_service.main"])
+def test_import_skips_heavy_ml_libraries(module):
+    loaded = _importtime(module)
+    assert not HEAVY_MODULES & set(loaded), f"{module} eagerly imports {HEAVY_MODULES & set(loaded)}"
+
+
+def test_main_import_time_budget():
+    loaded = _importtime("caselaw_service.main")
+    assert loaded["caselaw_service.main"] < IMPORT_TIME_BUDGET_MS
+
+
+def test_datasets_load_on_first_use():
+    from caselaw_service.datasets import _DATASET_MANIFEST, get_dataset_class, list_datasets
+    assert set(_DATASET_MANIFEST) <= set(list_datasets())
+    cls = get_dataset_class("court_cases")
+    assert cls.__dataset_name__ == "court_cases"
+    with pytest.raises(KeyError):
+        get_dataset_class("does_not_exist")
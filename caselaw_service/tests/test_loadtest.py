@@ -0,0 +1,51 @@
+import asyncio
+
+import httpx
+import pyarrow.parquet as pq
+
+from caselaw_service import datasets
+from caselaw_service.loadtest.corpus import iter_corpus, write_corpus
+from caselaw_service.loadtest.fakes import FakeServices
+from caselaw_service.loadtest.runner import Scenario, compare_reports, percentile, run_load
+
+
+def test_corpus_is_deterministic_and_found_by_load_stream(tmp_path, monkeypatch):
+    assert list(iter_corpus(5, seed=1)) == list(iter_corpus(5, seed=1))
+    paths = write_corpus(str(tmp_path), n=50, datasets=["caselaw/justia-opinions"])
+    table = pq.read_table(paths["caselaw/justia-opinions"])
+    assert table.num_rows == 50 and str(table.schema.field("date").type) == "string"
+
+    monkeypatch.setattr(datasets, "DATASET_LOCAL_DIR", str(tmp_path))
+    assert datasets.local_dataset_path("caselaw/justia-opinions") == paths["caselaw/justia-opinions"]
+    assert datasets.local_dataset_path("HFforLegal/case-law") is None
+
+
+def test_fake_services_answer_like_the_real_apis():
+    with FakeServices(latency_ms=0) as fakes:
+        env = fakes.env()
+        gemini = httpx.post(env["GEMINI_API_URL"], json={"contents": []}).json()
+        assert gemini["candidates"][0]["content"]["parts"][0]["text"]
+        inserted = httpx.post(f"{env['SUPABASE_URL']}/rest/v1/cases", json={"id": "x"})
+        assert inserted.status_code == 201 and inserted.json() == [{"id": "x"}]
+        opinions = httpx.get(f"{env['COURTLISTENER_API_ROOT']}opinions/", params={"search": "tax"}).json()
+        assert len(opinions["results"]) == 5
+    assert fakes.calls == {"gemini": 1, "postgrest": 1, "courtlistener": 1}
+
+
+def test_open_loop_run_reports_percentiles():
+    assert percentile([1, 2, 3, 4], 50) == 2 and percentile([1, 2, 3, 4], 99) == 4 and percentile([], 50) == 0
+
+    async def go(url):
+        async with httpx.AsyncClient(base_url=url) as client:
+            return await run_load(client, [Scenario("postgrest", "GET", "/rest/v1/cases", 40)], duration_s=0.5)
+
+    with FakeServices(latency_ms=5) as fakes:
+        report = asyncio.run(go(fakes.url))
+    result = report["endpoints"]["postgrest"]
+    assert result["requests"] == 20 and result["errors"] == 0 and result["statuses"] == {"200": 20}
+    assert 5 <= result["latency_ms"]["p50"] <= result["latency_ms"]["p99"]
+    assert report["rss_mb"]["peak"] > 0
+
+    slower = {"endpoints": {"postgrest": dict(result, latency_ms=dict(result["latency_ms"], p95=result["latency_ms"]["p95"] * 2))}}
+    assert compare_reports(slower, report)["regressions"] == ["postgrest"]
+    assert compare_reports(report, slower)["regressions"] == []
@@ -0,0 +1,76 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from httpx import AsyncClient
+
+from caselaw_service.loop_monitor import LoopLagMonitor
+from caselaw_service.main import app
+
+
+def _blocking_handler():
+    time.sleep(0.3)
+
+
+def test_stall_is_recorded_with_stack():
+    monitor = LoopLagMonitor(interval_ms=20, threshold_ms=50)
+
+    async def main():
+        monitor.start()
+        await asyncio.sleep(0.1)
+        _blocking_handler()
+        await asyncio.sleep(0.1)
+        monitor.stop()
+
+    asyncio.run(main())
+    stats = monitor.get_stats(events=True)
+    assert stats["ticks"] > 3
+    assert stats["stalls"] == 1 and stats["max_lag_ms"] >= 250
+    stacks = stats["recent_stalls"][0]["stacks"]
+    assert stacks and any("_blocking_handler" in frame for frame in stacks[0])
+
+
+def test_no_stalls_when_loop_is_free():
+    monitor = LoopLagMonitor(interval_ms=10, threshold_ms=200)
+
+    async def main():
+        monitor.start()
+        await asyncio.sleep(0.2)
+        monitor.stop()
+
+    asyncio.run(main())
+    assert monitor.get_stats()["stalls"] == 0
+
+
+@pytest.mark.asyncio
+async def test_dataset_search_runs_off_the_event_loop(monkeypatch):
+    from caselaw_service.datasets.court_cases import CourtCasesDataset
+
+    loop_thread = threading.get_ident()
+    seen = {}
+
+    def fake_search(self, keyword, limit=10):
+        seen["thread"] = threading.get_ident()
+        return [{"text": keyword}]
+
+    monkeypatch.setattr(CourtCasesDataset, "search", fake_search)
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        resp = await ac.get("/api/v1/dataset/search/court_cases", params={"keyword": "bail"})
+    assert resp.status_code == 200
+    assert resp.json() == {"results": [{"text": "bail"}]}
+    assert seen["thread"] != loop_thread
+
+
+@pytest.mark.asyncio
+async def test_saturated_pool_returns_503(monkeypatch):
+    from caselaw_service import executors
+
+    async def saturated(name, fn, *args, **kwargs):
+        raise executors.PoolSaturated(name)
+
+    monkeypatch.setattr("caselaw_service.dataset_api.run_in_pool", saturated)
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        resp = await ac.get("/api/v1/dataset/search/court_cases", params={"keyword": "bail"})
+    assert resp.status_code == 503
+    assert resp.headers["retry-after"] == "1"
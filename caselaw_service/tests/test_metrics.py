@@ -0,0 +1,123 @@
+import httpx
+import pytest
+from httpx import AsyncClient
+
+from caselaw_service.datasets.query import CompiledQuery
+from caselaw_service.gemini_client import GeminiClient
+from caselaw_service.main import app
+from caselaw_service.metrics import record_cache
+
+pytest.importorskip("prometheus_client")
+
+
+def _sample(body: str, prefix: str) -> float:
+    for line in body.splitlines():
+        if line.startswith(prefix):
+            return float(line.rsplit(" ", 1)[1])
+    return 0.0
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint_exports_route_templates():
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        await ac.get("/health")
+        await ac.get("/api/v1/dataset/search/nope", params={"keyword": "x"})
+        record_cache("case_search", hits=2, misses=1)
+        resp = await ac.get("/metrics")
+    assert resp.status_code == 200 and resp.headers["content-type"].startswith("text/plain")
+    body = resp.text
+    assert _sample(body, 'http_requests_total{method="GET",route="/health",status="200"}') >= 1
+    # Path parameters are collapsed into the route template
+    assert _sample(body, 'http_requests_total{method="GET",route="/api/v1/dataset/search/{dataset}",status="404"}') >= 1
+    assert 'http_request_duration_seconds_bucket{le="0.005",method="GET",route="/health"}' in body
+    assert _sample(body, 'cache_requests_total{cache="case_search",result="hit"}') >= 2
+    assert "executor_tasks" in body and "event_loop_lag_p99_lag_ms" in body
+
+
+def test_scan_counts_rows_read():
+    stats = {}
+    docs = [{"text": "appeal"}, {"text": "tax"}, {"text": "appeal dismissed"}]
+    assert len(CompiledQuery("appeal", ["text"]).scan(docs, limit=1, stats=stats)) == 1
+    assert stats == {"rows": 1}
+    CompiledQuery("appeal", ["text"]).scan(docs, limit=5, stats=stats)
+    assert stats == {"rows": 4}
+
+
+@pytest.mark.asyncio
+async def test_gemini_retries_transient_errors(monkeypatch):
+    from caselaw_service import gemini_client as module
+
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        if len(calls) < 3:
+            return httpx.Response(503)
+        return httpx.Response(200, json={"candidates": [{"content": {"parts": [{"text": "ok"}]}}]})
+
+    real_client = httpx.AsyncClient
+    monkeypatch.setattr(module.httpx, "AsyncClient", lambda: real_client(transport=httpx.MockTransport(handler)))
+    monkeypatch.setattr(module, "GEMINI_RETRY_BACKOFF_S", 0)
+    client = GeminiClient()
+    # Retries are opt-in
+    with pytest.raises(httpx.HTTPStatusError):
+        await client._generate("predict_outcome", {})
+    assert len(calls) == 1
+
+    calls.clear()
+    client.max_retries = 2
+    assert await client._generate("predict_outcome", {}) == "ok"
+    assert len(calls) == 3
+
+    calls.clear()
+    client.max_retries = 1
+    with pytest.raises(httpx.HTTPStatusError):
+        await client._generate("predict_outcome", {})
+    assert len(calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_gemini_retries_honor_retry_after(monkeypatch):
+    from caselaw_service import gemini_client as module
+
+    calls, delays = [], []
+
+    def handler(request):
+        calls.append(request)
+        if len(calls) == 1:
+            return httpx.Response(429, headers={"Retry-After": "2"})
+        if len(calls) == 2:
+            return httpx.Response(429, headers={"Retry-After": "60"})
+        return httpx.Response(200, json={"candidates": [{"content": {"parts": [{"text": "ok"}]}}]})
+
+    async def sleep(delay):
+        delays.append(delay)
+
+    real_client = httpx.AsyncClient
+    monkeypatch.setattr(module.httpx, "AsyncClient", lambda: real_client(transport=httpx.MockTransport(handler)))
+    monkeypatch.setattr(module.asyncio, "sleep", sleep)
+    monkeypatch.setattr(module, "GEMINI_RETRY_BACKOFF_S", 0.1)
+    client = GeminiClient()
+    client.max_retries = 3
+    # The first 429 waits for its Retry-After; the second asks for too long
+    with pytest.raises(httpx.HTTPStatusError):
+        await client._generate("predict_outcome", {})
+    assert len(calls) == 2 and delays == [2.0]
+
+
+@pytest.mark.asyncio
+async def test_gemini_transport_error_beyond_max_wait_is_reraised(monkeypatch):
+    from caselaw_service import gemini_client as module
+
+    def handler(request):
+        raise httpx.ConnectError("refused", request=request)
+
+    real_client = httpx.AsyncClient
+    monkeypatch.setattr(module.httpx, "AsyncClient", lambda: real_client(transport=httpx.MockTransport(handler)))
+    monkeypatch.setattr(module, "GEMINI_RETRY_BACKOFF_S", 10)
+    monkeypatch.setattr(module, "GEMINI_RETRY_MAX_WAIT_S", 5)
+    client = GeminiClient()
+    client.max_retries = 2
+    # The backoff exceeds the max wait, so the connection error itself surfaces
+    with pytest.raises(httpx.ConnectError):
+        await client._generate("predict_outcome", {})
@@ -0,0 +1,89 @@
+import asyncio
+import threading
+import time
+from collections import Counter
+
+import pytest
+from httpx import AsyncClient
+
+from caselaw_service.auth import get_current_admin_user
+from caselaw_service.main import app
+from caselaw_service.profiler import ProfilerBusy, SamplingProfiler, collapse, run_profile, stall_stacks
+
+
+@pytest.fixture
+def as_role(monkeypatch):
+    def override(role):
+        monkeypatch.setitem(app.dependency_overrides, get_current_admin_user, lambda: {"sub": "ops", "role": role})
+    return override
+
+
+def _hot_loop(stop):
+    while not stop.is_set():
+        sum(i * i for i in range(1000))
+
+
+def test_sampler_collects_busy_thread_and_skips_idle():
+    stop = threading.Event()
+    worker = threading.Thread(target=_hot_loop, args=(stop,), name="hot-worker")
+    waiter = threading.Thread(target=threading.Event().wait, args=(0.5,), name="idle-worker")
+    worker.start()
+    waiter.start()
+    profiler = SamplingProfiler(interval_ms=2)
+    profiler.start()
+    time.sleep(0.2)
+    profiler.stop()
+    stop.set()
+    worker.join()
+    waiter.join()
+    text = profiler.collapsed()
+    assert profiler.samples > 10
+    hot = [line for line in text.splitlines() if line.startswith("hot-worker;")]
+    assert hot and all("test_profiler.py:_hot_loop" in line for line in hot)
+    assert "idle-worker" not in text
+    stack, count = text.splitlines()[0].rsplit(" ", 1)
+    assert int(count) >= 1 and ";" in stack
+
+
+def test_stall_stacks_weight_by_lag():
+    events = [{"lag_ms": 300.0, "stacks": [["/app/main.py:10 in handler", "/app/x.py:3 in parse"]] * 2}]
+    assert stall_stacks(events) == Counter({"[loop-blocked];main.py:handler;x.py:parse": 300})
+    assert collapse(stall_stacks(events)) == "[loop-blocked];main.py:handler;x.py:parse 300\n"
+
+
+@pytest.mark.asyncio
+async def test_profile_endpoint_reports_cpu_and_loop_blocking(as_role):
+    as_role("admin")
+
+    async def block_loop():
+        await asyncio.sleep(0.1)
+        time.sleep(0.3)  # holds the event loop
+
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        blocker = asyncio.create_task(block_loop())
+        resp = await ac.get("/admin/profile", params={"seconds": 0.8, "interval_ms": 5})
+        await blocker
+        assert resp.status_code == 200
+        data = resp.json()
+        assert data["samples"] > 10
+        assert "[event-loop]" in data["collapsed"] and "block_loop" in data["collapsed"]
+        assert data["loop_stalls"] and data["loop_stalls"][0]["lag_ms"] >= 200
+        assert "[loop-blocked]" in data["loop_stall_collapsed"] and "block_loop" in data["loop_stall_collapsed"]
+
+        folded = await ac.get("/admin/profile", params={"seconds": 0.05, "format": "collapsed"})
+        assert folded.status_code == 200 and "attachment" in folded.headers["content-disposition"]
+        assert all(line.rsplit(" ", 1)[1].isdigit() for line in folded.text.splitlines())
+
+        assert (await ac.get("/admin/profile", params={"seconds": 3600})).status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_profile_requires_admin_role_and_is_exclusive():
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        # The mounted route rejects the default (anonymous guest) caller
+        assert (await ac.get("/admin/profile", params={"seconds": 0.01})).status_code == 403
+    running = asyncio.create_task(run_profile(0.2))
+    await asyncio.sleep(0.02)
+    with pytest.raises(ProfilerBusy):
+        await run_profile(0.01)
+    await running
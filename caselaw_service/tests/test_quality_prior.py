@@ -0,0 +1,107 @@
+import os
+
+import numpy as np
+import pytest
+from httpx import AsyncClient
+
+from caselaw_service import feedback
+from caselaw_service.auth import get_current_user
+from caselaw_service.datasets import corpus_index, quality_prior
+from caselaw_service.feedback import FeedbackStore
+from caselaw_service.main import app
+from caselaw_service.tests.test_corpus_index import _corpus, encoder  # noqa: F401
+
+
+@pytest.fixture
+def store(monkeypatch):
+    store = FeedbackStore(":memory:")
+    monkeypatch.setattr(feedback, "_feedback_store", store)
+    return store
+
+
+def _twin_corpus():
+    # Rows 300 and 517 are identical, so only the prior can separate them
+    docs = _corpus()
+    docs[300]["text"] = docs[517]["text"]
+    return docs
+
+
+def _ranking(encoder, limit=2):  # noqa: F811
+    index = corpus_index.get_corpus_index("court_cases")
+    return index.search(encoder.encode(["habeas corpus detention"])[0], limit=limit)
+
+
+def test_item_prior_is_smoothed():
+    assert quality_prior.item_prior(0, 0) == 0
+    assert 0 < quality_prior.item_prior(1, 0) < quality_prior.item_prior(10, 0) < 0.5
+    assert quality_prior.item_prior(0, 3) == -quality_prior.item_prior(3, 0)
+
+
+@pytest.mark.asyncio
+async def test_feedback_reorders_semantic_results(encoder, store, monkeypatch):  # noqa: F811
+    corpus_index.build_corpus_index("court_cases", _twin_corpus(), text_field="text", encoder=encoder)
+    assert sorted(row for row, _ in _ranking(encoder)) == [300, 517]
+
+    monkeypatch.setitem(app.dependency_overrides, get_current_user, lambda: {"sub": "user-7", "role": "authenticated"})
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        body = {"dataset_name": "court_cases", "item_id": "517", "feedback_type": "inaccurate"}
+        await ac.post("/feedback/submit", json=body)
+        await ac.post("/feedback/submit", json={**body, "item_id": "300", "feedback_type": "helpful"})
+        # Neutral feedback types don't move the prior
+        await ac.post("/feedback/submit", json={**body, "item_id": "300", "feedback_type": "other"})
+
+    assert sorted(store.item_counts("court_cases")) == [("300", 1, 0), ("517", 0, 1)]
+    (first, high), (second, low) = _ranking(encoder)
+    assert (first, second) == (300, 517)
+    weight = quality_prior.QUALITY_PRIOR_WEIGHT
+    assert high - low == pytest.approx(weight * 2 * quality_prior.item_prior(1, 0), abs=1e-5)
+    results = corpus_index.semantic_search_corpus(corpus_index.get_corpus_index("court_cases"), "habeas corpus", 2)
+    assert [doc["item_id"] for doc in results] == ["300", "517"]
+    # The prior orders the twins, but the reported score is the cosine alone
+    assert results[0]["similarity_score"] == pytest.approx(results[1]["similarity_score"])
+    assert results[0]["quality_prior"] == pytest.approx(quality_prior.item_prior(1, 0))
+    assert results[1]["quality_prior"] == pytest.approx(quality_prior.item_prior(0, 1))
+
+
+def test_prior_file_is_rebuilt_from_counts(encoder, store, monkeypatch):  # noqa: F811
+    corpus_index.build_corpus_index("court_cases", _twin_corpus(), text_field="text", encoder=encoder)
+    store.add_feedback({"user_id": "u1", "dataset_name": "court_cases", "item_id": "517",
+                        "feedback_type": "irrelevant", "comment": "", "user_rating": None})
+    index = corpus_index.get_corpus_index("court_cases")
+    path = os.path.join(index.directory, quality_prior.PRIOR_FILE)
+    assert index.quality.values[517] == pytest.approx(quality_prior.item_prior(0, 1))
+    assert os.path.getsize(path) == 4 * len(index)
+
+    # A fresh process maps the same file; a deleted one is rebuilt from the store
+    inode = os.stat(path).st_ino
+    monkeypatch.setattr(corpus_index, "_indexes", {})
+    assert corpus_index.get_corpus_index("court_cases").quality.values[517] != 0
+    assert os.stat(path).st_ino == inode
+    monkeypatch.setattr(corpus_index, "_indexes", {})
+    os.remove(path)
+    rebuilt = corpus_index.get_corpus_index("court_cases").quality
+    assert rebuilt.values[517] == pytest.approx(quality_prior.item_prior(0, 1))
+    assert np.count_nonzero(rebuilt.values) == 1
+    assert rebuilt.row("no-such-id") is None
+
+    # A rebuilt index starts a fresh prior so rows can't drift out of alignment
+    directory = corpus_index.build_corpus_index("court_cases", _corpus(20), text_field="text", encoder=encoder)
+    assert directory != index.directory
+    assert not os.path.exists(os.path.join(directory, quality_prior.PRIOR_FILE))
+    assert len(corpus_index.get_corpus_index("court_cases").quality.values) == 20
+
+
+def test_zero_weight_leaves_cosine_scores(encoder, store, monkeypatch):  # noqa: F811
+    corpus_index.build_corpus_index("court_cases", _twin_corpus(), text_field="text", encoder=encoder)
+    cosine = dict(_ranking(encoder))
+    quality_prior.record_item_feedback("court_cases", "517", 0, 5)
+    monkeypatch.setattr(quality_prior, "QUALITY_PRIOR_WEIGHT", 0.0)
+    assert dict(_ranking(encoder)) == cosine
+
+
+def test_feedback_never_loads_or_resolves_an_index(encoder, store, monkeypatch):  # noqa: F811
+    corpus_index.build_corpus_index("court_cases", _twin_corpus(), text_field="text", encoder=encoder)
+    monkeypatch.setattr(corpus_index, "get_corpus_index", lambda key: pytest.fail(f"loaded {key}"))
+    # Client-supplied names are only looked up among loaded indexes
+    assert not quality_prior.record_item_feedback("../../etc", "1", 1, 0)
+    assert not quality_prior.record_item_feedback("court_cases", "517", 1, 0)
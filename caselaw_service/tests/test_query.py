@@ -0,0 +1,93 @@
+import pytest
+
+from caselaw_service.datasets.query import CompiledQuery, arrow_batches
+
+DOCS = [
+    {"id": "1", "abstract": "A Machine for sorting mail", "claims": "", "year": 2019, "inventor": "Smith"},
+    {"id": "2", "abstract": None, "claims": "machine learning model", "year": 2020, "inventor": "Jones"},
+    {"id": "3", "abstract": "Chemical process", "claims": "catalyst", "year": 2020, "inventor": "SMITHSON"},
+    {"id": "4", "abstract": "Neural MACHINE translation", "claims": "decoder", "year": 2020, "inventor": "smith"},
+    {"id": "5", "abstract": "Catalytic converter", "claims": "exhaust", "year": 2021, "inventor": "Lee"},
+]
+
+
+def _ids(docs):
+    return [d["id"] for d in docs]
+
+
+def _arrow_dataset():
+    hf = pytest.importorskip("datasets")
+    return hf.Dataset.from_list(DOCS).to_iterable_dataset()
+
+
+def test_single_field_keyword_is_case_insensitive():
+    q = CompiledQuery("machine", ["abstract"])
+    assert _ids(q.scan(DOCS, limit=10)) == ["1", "4"]
+
+
+def test_multi_field_and_filters():
+    q = CompiledQuery("machine", ["abstract", "claims"], {"year": "2020", "inventor": ""})
+    assert _ids(q.scan(DOCS, limit=10)) == ["2", "4"]
+    q = CompiledQuery("machine", ["abstract", "claims"], {"inventor": "smith"})
+    assert _ids(q.scan(DOCS, limit=10)) == ["1", "4"]
+
+
+def test_multi_term_matches_any_term():
+    q = CompiledQuery(["catalyst", "converter"], ["abstract", "claims"])
+    assert _ids(q.scan(DOCS, limit=10)) == ["3", "5"]
+
+
+def test_limit_stops_scan():
+    q = CompiledQuery("machine", ["abstract", "claims"])
+    assert _ids(q.scan(DOCS, limit=2)) == ["1", "2"]
+
+
+def test_plain_iterables_are_scanned_per_document():
+    assert arrow_batches(DOCS) is None
+
+
+@pytest.mark.parametrize("keywords,fields,filters", [
+    ("machine", ["abstract"], None),
+    ("machine", ["abstract", "claims"], {"year": "2020"}),
+    (["catalyst", "converter"], ["abstract", "claims"], None),
+    ("mach", ["abstract"], {"inventor": "SMITH"}),
+    ("machine", ["abstract"], {"missing_column": "x"}),
+])
+def test_arrow_batches_match_python_evaluation(keywords, fields, filters):
+    ds = _arrow_dataset()
+    assert arrow_batches(ds) is not None
+    q = CompiledQuery(keywords, fields, filters)
+    assert q.scan(ds, limit=10) == q.scan(DOCS, limit=10)
+
+
+def test_null_filter_values_never_match():
+    docs = DOCS + [{"id": "6", "abstract": "machine", "claims": "", "year": 2022, "inventor": None}]
+    q = CompiledQuery("machine", ["abstract"], {"inventor": "non"})
+    assert q.scan(docs, limit=10) == []
+    q = CompiledQuery("machine", ["abstract"], {"inventor": "smith"})
+    hf = pytest.importorskip("datasets")
+    assert q.scan(hf.Dataset.from_list(docs).to_iterable_dataset(), limit=10) == q.scan(docs, limit=10)
+
+
+def test_returns_projects_columns_before_reading():
+    ds = _arrow_dataset()
+    q = CompiledQuery("machine", ["abstract"], {"year": "2020"}, returns=["id"])
+    assert q.columns == ["abstract", "year", "id"]
+    batch = next(arrow_batches(ds, columns=q.columns + ["no_such_column"]))
+    assert sorted(batch.column_names) == ["abstract", "id", "year"]
+    assert q.scan(ds, limit=10) == q.scan(DOCS, limit=10) == [{"id": "4"}]
+
+
+@pytest.mark.asyncio
+async def test_search_endpoint_splits_list_params(monkeypatch):
+    from httpx import AsyncClient
+
+    from caselaw_service.datasets import patent_data
+    from caselaw_service.main import app
+
+    monkeypatch.setattr(patent_data, "load_stream", lambda hf_id: _arrow_dataset())
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        resp = await ac.get("/api/v1/dataset/search/patent_data",
+                            params={"keyword": "machine", "fields": "abstract, claims", "columns": "id,year"})
+    assert resp.status_code == 200
+    assert resp.json()["results"] == [{"id": "1", "year": 2019}, {"id": "2", "year": 2020}, {"id": "4", "year": 2020}]
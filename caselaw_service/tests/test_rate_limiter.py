@@ -0,0 +1,79 @@
+import pytest
+from fastapi import FastAPI
+from httpx import AsyncClient
+
+from caselaw_service import middleware
+from caselaw_service.middleware import MemoryGCRABackend, RateLimiter, RedisGCRABackend
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_burst_then_steady_rate():
+    clock = FakeClock()
+    limiter = RateLimiter(requests_per_minute=60, burst=5, backend=MemoryGCRABackend(clock=clock))
+    assert [limiter.is_allowed("a") for _ in range(6)] == [True] * 5 + [False]
+    allowed, info = limiter.check("a")
+    assert not allowed and info["remaining"] == 0 and 0 < info["retry_after"] <= 1
+    assert limiter.is_allowed("b")  # keys are independent
+
+    clock.now += 1.0  # one request's worth of credit per second
+    assert limiter.is_allowed("a") and not limiter.is_allowed("a")
+    clock.now += 60
+    assert limiter.get_rate_limit_info("a")["remaining"] == 5
+
+
+def test_info_does_not_consume():
+    limiter = RateLimiter(requests_per_minute=10, backend=MemoryGCRABackend(clock=FakeClock()))
+    for _ in range(3):
+        assert limiter.get_rate_limit_info("k")["remaining"] == 10
+    assert limiter.check("k")[1]["remaining"] == 9
+
+
+def test_idle_keys_are_evicted():
+    clock = FakeClock()
+    backend = MemoryGCRABackend(clock=clock)
+    limiter = RateLimiter(requests_per_minute=60, backend=backend)
+    for i in range(1000):
+        limiter.is_allowed(f"client-{i}")
+    assert len(backend) == 1000
+    clock.now += 5
+    for _ in range(600):
+        limiter.is_allowed("busy")
+    assert len(backend) <= 1
+    assert limiter.is_allowed("client-0")
+
+
+def test_key_count_is_capped():
+    backend = MemoryGCRABackend(max_keys=100, clock=FakeClock())
+    limiter = RateLimiter(requests_per_minute=60, backend=backend)
+    for i in range(500):
+        limiter.is_allowed(str(i))
+    assert len(backend) <= 101
+
+
+def test_redis_outage_falls_back_to_memory():
+    pytest.importorskip("redis")
+    # Nothing listens on port 1: every script call raises ConnectionError
+    backend = RedisGCRABackend("redis://127.0.0.1:1/0")
+    limiter = RateLimiter(requests_per_minute=60, burst=2, backend=backend)
+    assert [limiter.is_allowed("a") for _ in range(3)] == [True, True, False]
+
+
+@pytest.mark.asyncio
+async def test_middleware_limits_per_client(monkeypatch):
+    monkeypatch.setattr(middleware, "rate_limiter",
+                        RateLimiter(requests_per_minute=60, burst=2, backend=MemoryGCRABackend(clock=FakeClock())))
+    app = FastAPI()
+    app.middleware("http")(middleware.rate_limit_middleware)
+    app.get("/ping")(lambda: {"ok": True})
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        responses = [await ac.get("/ping") for _ in range(3)]
+    assert [r.status_code for r in responses] == [200, 200, 429]
+    assert responses[0].headers["X-RateLimit-Remaining"] == "1"
+    assert responses[2].headers["Retry-After"] == "1"
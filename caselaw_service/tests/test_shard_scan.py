@@ -0,0 +1,72 @@
+import os
+
+import pytest
+
+from caselaw_service.datasets.query import CompiledQuery
+from caselaw_service.datasets import shard_scan
+from caselaw_service.datasets.shard_scan import ShardScanner, parallel_scan, split_shards
+
+DOCS = [{"id": i, "text": f"case {i} " + ("negligence" if i % 7 == 0 else "contract")} for i in range(200)]
+
+
+@pytest.fixture(scope="module")
+def scanner():
+    s = ShardScanner(max_workers=2)
+    yield s
+    s.shutdown()
+
+
+def _sharded(num_shards=4):
+    hf = pytest.importorskip("datasets")
+    return hf.Dataset.from_list(DOCS).to_iterable_dataset(num_shards=num_shards)
+
+
+def test_plain_iterables_are_not_split():
+    assert split_shards(DOCS) is None
+    assert split_shards(_sharded(num_shards=1)) is None
+    assert len(split_shards(_sharded())) == 4
+
+
+def test_parallel_scan_matches_serial_order(scanner):
+    ds = _sharded()
+    query = CompiledQuery("negligence", ["text"])
+    serial = query.scan(DOCS, limit=100)
+    assert scanner.scan(split_shards(ds), query, limit=100) == serial
+    assert [d["id"] for d in scanner.scan(split_shards(ds), query, limit=5)] == [0, 7, 14, 21, 28]
+
+
+def test_limit_reached_in_first_shard(scanner):
+    query = CompiledQuery("contract", ["text"])
+    results = scanner.scan(split_shards(_sharded()), query, limit=3)
+    assert [d["id"] for d in results] == [1, 2, 3]
+
+
+def test_no_matches_scans_every_shard(scanner):
+    assert scanner.scan(split_shards(_sharded()), CompiledQuery("tort", ["text"]), limit=10) == []
+
+
+def test_parallel_scan_falls_back_for_lists():
+    assert len(parallel_scan(DOCS, CompiledQuery("negligence", ["text"]), limit=3)) == 3
+
+
+class FailsInWorker(CompiledQuery):
+    """Raises while scanning in a pool process, e.g. on a bad row."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.parent = os.getpid()
+
+    def scan(self, dataset, limit, **kwargs):
+        if os.getpid() != self.parent:
+            raise ValueError("bad row")
+        return super().scan(dataset, limit, **kwargs)
+
+
+def test_shard_failure_falls_back_to_serial_scan(scanner, monkeypatch):
+    monkeypatch.setattr(shard_scan, "SHARD_SCAN_WORKERS", 2)
+    monkeypatch.setattr(shard_scan, "get_shard_scanner", lambda: scanner)
+    stats = {}
+    results = parallel_scan(_sharded(), FailsInWorker("negligence", ["text"]), limit=3, stats=stats)
+    assert [d["id"] for d in results] == [0, 7, 14]
+    # Only the serial scan's rows are counted (one Arrow batch here)
+    assert stats["rows"] == len(DOCS)
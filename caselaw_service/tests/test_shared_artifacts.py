@@ -0,0 +1,63 @@
+import json
+
+import numpy as np
+import pytest
+
+from caselaw_service import shared_artifacts
+from caselaw_service.embeddings import EmbeddingIndex
+
+
+@pytest.fixture
+def shared_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(shared_artifacts, "SHARED_ARTIFACT_DIR", str(tmp_path / "shm"))
+    monkeypatch.setattr(shared_artifacts, "_attached", {})
+    return tmp_path / "shm"
+
+
+def test_publish_and_attach_array(shared_dir):
+    arr = np.arange(12, dtype=np.float32).reshape(3, 4)
+    mapped = shared_artifacts.publish_array("matrix", arr)
+    assert isinstance(mapped, np.memmap)
+    assert not mapped.flags.writeable
+    np.testing.assert_array_equal(mapped, arr)
+    assert shared_artifacts.attach_array("missing") is None
+
+
+def test_string_table_roundtrip(shared_dir):
+    titles = ["Miranda v. Arizona", "", "Kesavananda Bharati v. State of Kerala", "Brown v. Board"]
+    table = shared_artifacts.publish_strings("titles", titles)
+    assert len(table) == 4
+    assert list(table) == titles
+    assert table[-1] == "Brown v. Board"
+
+
+def _write_embeddings(path):
+    data = [
+        {"id": f"c{i}", "case_name": f"Case {i}", "embedding": [float(i), 0.0, 1.0]}
+        for i in range(5)
+    ]
+    path.write_text(json.dumps(data))
+
+
+def test_shared_index_matches_private_index(shared_dir, tmp_path):
+    src = tmp_path / "emb.json"
+    _write_embeddings(src)
+    private = EmbeddingIndex(str(src), shared=False)
+    published = EmbeddingIndex(str(src), shared=True)
+    # A second worker attaches to the published files instead of parsing JSON
+    attached = EmbeddingIndex(str(src), shared=True)
+
+    assert isinstance(attached.embeddings, np.memmap)
+    assert attached.titles[3] == "Case 3"
+    q = [2.2, 0.0, 1.0]
+    expected = [i for i, _ in private.search(q, top_k=3)]
+    assert [i for i, _ in published.search(q, top_k=3)] == expected
+    assert [i for i, _ in attached.search(q, top_k=3)] == expected == [2, 3, 1]
+    names = {a["name"] for a in shared_artifacts.list_artifacts()}
+    assert "caselaw_embeddings.matrix" in names
+
+
+def test_memory_report_fields(shared_dir):
+    report = shared_artifacts.memory_report()
+    assert report["rss_bytes"] > 0
+    assert "unique_bytes" in report and "shared_bytes" in report
@@ -0,0 +1,95 @@
+import asyncio
+import json
+import logging
+
+import httpx
+import pytest
+from httpx import AsyncClient
+
+from caselaw_service import tracing
+from caselaw_service.executors import run_in_pool
+from caselaw_service.main import app
+from caselaw_service.tracing import RequestTrace, span, traced
+
+
+def _stages(header: str) -> dict:
+    stages = {}
+    for entry in header.split(","):
+        name, dur = entry.strip().split(";")[:2]
+        stages[name] = float(dur[len("dur="):])
+    return stages
+
+
+@pytest.mark.asyncio
+async def test_predict_reports_stage_breakdown(monkeypatch, caplog):
+    from caselaw_service.gemini_client import gemini_client
+
+    prediction = {"predicted_outcome": "win", "probabilities": {"win": 0.7}, "reasoning": "r", "confidence": 0.7}
+
+    def handler(request):
+        if "supabase" in request.url.host or "/rest/v1/" in request.url.path:
+            return httpx.Response(201, json=[{"id": 1}])
+        return httpx.Response(200, json={"candidates": [{"content": {"parts": [{"text": json.dumps(prediction)}]}}]})
+
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        real_client = httpx.AsyncClient
+        monkeypatch.setattr(httpx, "AsyncClient", lambda **kw: real_client(transport=httpx.MockTransport(handler)))
+        monkeypatch.setattr(gemini_client, "api_key", "test-key")
+        monkeypatch.setattr(tracing, "TRACE_SAMPLE_RATE", 0.0)
+        monkeypatch.setattr(tracing, "TRACE_FORCE_HEADER", "X-Trace-Timing")
+        payload = {"case_type": "civil", "jurisdiction": "US federal", "key_facts": ["contract"]}
+        with caplog.at_level(logging.INFO, logger="caselaw_service.timing"):
+            resp = await ac.post("/api/v1/outcome/predict", json=payload, headers={"X-Trace-Timing": "1"})
+            untimed = await ac.post("/api/v1/outcome/predict", json=payload)
+
+    assert resp.status_code == 200 and resp.json()["predicted_outcome"] == "win"
+    stages = _stages(resp.headers["Server-Timing"])
+    assert {"gemini", "gemini_parse", "supabase_insert", "total"} <= set(stages)
+    assert stages["total"] >= stages["gemini"]
+    assert untimed.status_code == 200 and "Server-Timing" not in untimed.headers
+    records = [json.loads(r.getMessage()) for r in caplog.records if r.name == "caselaw_service.timing"]
+    assert len(records) == 1
+    forced = records[0]
+    assert forced["route"] == "/api/v1/outcome/predict" and forced["status"] == 200
+
+
+@pytest.mark.asyncio
+async def test_sampling_controls(monkeypatch):
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        monkeypatch.setattr(tracing, "TRACE_SAMPLE_RATE", 0.0)
+        assert "Server-Timing" not in (await ac.get("/health")).headers
+        monkeypatch.setattr(tracing, "TRACE_SAMPLE_RATE", 1.0)
+        assert "total" in _stages((await ac.get("/health")).headers["Server-Timing"])
+        monkeypatch.setattr(tracing, "TRACE_SAMPLE_RATE", 0.0)
+        # Off by default, so anonymous clients can't force timing
+        assert tracing.TRACE_FORCE_HEADER == ""
+        assert "Server-Timing" not in (await ac.get("/health", headers={"X-Trace-Timing": "1"})).headers
+
+
+@pytest.mark.asyncio
+async def test_spans_aggregate_across_threads_and_nesting():
+    trace = RequestTrace()
+    token = tracing._current.set(trace)
+    try:
+        @traced("work")
+        def work():
+            with span("inner"):
+                return 1
+
+        @traced("async_work")
+        async def async_work():
+            await asyncio.sleep(0)
+
+        await run_in_pool("dataset", work)
+        work()
+        await async_work()
+    finally:
+        tracing._current.reset(token)
+    stages = trace.stages()
+    assert stages["work"]["count"] == 2 and stages["inner"]["count"] == 2
+    assert stages["async_work"]["count"] == 1
+    assert 'work;dur=' in trace.server_timing() and 'desc="x2"' in trace.server_timing()
+    # Outside a sampled request spans record nothing
+    with span("ignored"):
+        pass
+    assert "ignored" not in trace.stages()
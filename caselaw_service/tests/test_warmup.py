@@ -0,0 +1,119 @@
+import asyncio
+import json
+
+import pytest
+from httpx import AsyncClient
+
+from caselaw_service import analytics, main, warmup
+from caselaw_service.analytics import AnalyticsStore
+from caselaw_service.warmup import CacheWarmer, load_local_history, register_warmer, save_local_history
+
+
+@pytest.fixture
+def store(monkeypatch):
+    store = AnalyticsStore()
+    monkeypatch.setattr(analytics, "_analytics", store)
+    return store
+
+
+def test_history_snapshot_roundtrip(tmp_path, store):
+    path = str(tmp_path / "history.json")
+    assert save_local_history(path) == 0 and not (tmp_path / "history.json").exists()
+    for _ in range(3):
+        analytics.record_search("caselaw", "Miranda  Rights")
+    analytics.record_search("dataset/court_cases", "tax")
+    assert save_local_history(path) == 2
+    assert load_local_history(path) == {("caselaw", "miranda rights"): 3, ("dataset/court_cases", "tax"): 1}
+    (tmp_path / "broken.json").write_text("{")
+    assert load_local_history(str(tmp_path / "broken.json")) == {}
+
+
+def test_workers_merge_into_shared_history(tmp_path, store):
+    path = str(tmp_path / "history.json")
+    # A snapshot left by another worker, plus one too old to keep
+    (tmp_path / "history.json").write_text(json.dumps({"workers": {
+        "other": {"saved_at": "2999-01-01T00:00:00", "queries": [
+            {"source": "caselaw", "query": "miranda rights", "count": 5}]},
+        "stale": {"saved_at": "2000-01-01T00:00:00", "queries": [
+            {"source": "caselaw", "query": "old", "count": 50}]},
+    }}))
+    analytics.record_search("caselaw", "miranda rights")
+    assert save_local_history(path) == 1
+    analytics.record_search("caselaw", "miranda rights")
+    save_local_history(path)
+    # This worker's section is replaced, not added again
+    assert load_local_history(path) == {("caselaw", "miranda rights"): 7}
+
+
+@pytest.mark.asyncio
+async def test_warmer_replays_top_queries_rate_limited(tmp_path, monkeypatch):
+    path = tmp_path / "history.json"
+    path.write_text(json.dumps({"queries": [
+        {"source": "fake", "query": f"q{i}", "count": 100 - i} for i in range(10)
+    ] + [
+        {"source": "unknown", "query": "x", "count": 99},
+        {"source": "broken", "query": "y", "count": 98},
+    ]}))
+    calls = []
+
+    @register_warmer("fake")
+    async def fake(source, query):
+        calls.append(query)
+
+    @register_warmer("broken")
+    async def broken(source, query):
+        raise RuntimeError("boom")
+
+    monkeypatch.delenv("SUPABASE_URL", raising=False)
+    warmer = CacheWarmer(top_n=5, rate_per_s=50, history_path=str(path))
+    started = asyncio.get_running_loop().time()
+    await warmer.run()
+    # 5 replays at 50/s take at least ~4 intervals
+    assert asyncio.get_running_loop().time() - started >= 0.07
+    # The 5 hottest: q0, unknown (no warmer), broken (fails), q1, q2
+    assert calls == ["q0", "q1", "q2"]
+    assert warmer.progress() == {"status": "warm", "total": 5, "done": 3, "failed": 1, "skipped": 1,
+                                 "finished_at": warmer.finished_at}
+
+
+@pytest.mark.asyncio
+async def test_supabase_history_is_merged(tmp_path, monkeypatch):
+    from caselaw_service.supabase_client import supabase
+
+    async def select(table, filters=None):
+        assert table == "caselaw_searches" and filters["limit"] == "5000"
+        return [{"query": "Habeas Corpus", "search_type": "keyword"}] * 2 + [{"query": "tort", "search_type": "semantic"}]
+
+    monkeypatch.setenv("SUPABASE_URL", "http://supabase.test")
+    monkeypatch.setattr(supabase, "select", select)
+    warmer = CacheWarmer(history_path=str(tmp_path / "none.json"))
+    assert await warmer.plan() == [("caselaw", "habeas corpus"), ("caselaw_semantic", "tort")]
+
+
+@pytest.mark.asyncio
+async def test_caselaw_warmup_fills_search_cache_and_reports_health(monkeypatch):
+    gideon = {"id": "9", "case_name": "Gideon v. Wainwright", "court": "US Supreme Court",
+              "jurisdiction": "federal", "date": "1963-03-18", "citation": "372 U.S. 335",
+              "summary": "Right to counsel", "text": "counsel", "url": None}
+    monkeypatch.setattr(main, "_load_justia_stream", lambda: [gideon])
+    await warmup.get_warmer("caselaw")("caselaw", "gideon")
+    # The stream is now empty: a result can only come from the warmed cache
+    monkeypatch.setattr(main, "_load_justia_stream", lambda: [])
+    monkeypatch.setattr(main, "WARMUP_ON_STARTUP", True)
+    async with AsyncClient(app=main.app, base_url="http://test") as ac:
+        resp = await ac.get("/api/v1/caselaw/search", params={"query": "Gideon"})
+        health = (await ac.get("/health")).json()
+    assert [r["id"] for r in resp.json()] == ["9"]
+    assert health["status"] == "ok" and health["warmup"]["status"] in {"idle", "running", "warm"}
+
+
+@pytest.mark.asyncio
+async def test_search_cache_does_not_collapse_whitespace(monkeypatch):
+    case = {"id": "1", "case_name": "Foo Bar", "court": "c", "jurisdiction": "federal",
+            "date": "2000-01-01", "citation": None, "summary": "", "text": "", "url": None}
+    monkeypatch.setattr(main, "_load_justia_stream", lambda: [case])
+    async with AsyncClient(app=main.app, base_url="http://test") as ac:
+        hit = await ac.get("/api/v1/caselaw/search", params={"query": "Foo Bar"})
+        miss = await ac.get("/api/v1/caselaw/search", params={"query": "foo  bar"})
+    assert [r["id"] for r in hit.json()] == ["1"]
+    assert miss.json() == []
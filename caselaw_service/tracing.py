@@ -0,0 +1,168 @@
+"""Per-request stage timing: spans, `Server-Timing` headers and timing logs.
+
+Code marks the stages of a request with `span()` (or the `traced`
+decorator); both are a single ContextVar lookup when the request is not
+sampled. For a sampled request the middleware collects the stage durations
+and:
+
+    - answers with a `Server-Timing` header, e.g.
+      `auth_verify;dur=3.1, gemini;dur=3870.4, gemini_parse;dur=0.2, supabase_insert;dur=61.0, total;dur=3941.8`
+    - logs one structured line on the `caselaw_service.timing` logger:
+      `{"event": "request_timing", "route": "/api/v1/outcome/predict", "total_ms": 3941.8, "stages": {...}}`
+
+    with span("gemini"):
+        response = await client.post(...)
+
+    @traced("rerank")
+    def rerank(...): ...
+
+Spans may nest and may run in executor threads (the pools copy the
+request's context); repeated stages are summed and counted. Work done
+while a streamed body is sent happens after both are written and is not
+included.
+
+Configuration:
+    TRACE_SAMPLE_RATE       fraction of requests timed (default 0.05; 0 disables)
+    TRACE_FORCE_HEADER      request header that forces timing, e.g. X-Trace-Timing
+                            (default empty: disabled, since any client could send it)
+    TRACE_LOG_MIN_MS        only log timed requests at least this slow (default 0)
+"""
+import functools
+import inspect
+import json
+import logging
+import os
+import random
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger("caselaw_service.timing")
+
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0.05"))
+TRACE_FORCE_HEADER = os.getenv("TRACE_FORCE_HEADER", "")
+TRACE_LOG_MIN_MS = float(os.getenv("TRACE_LOG_MIN_MS", "0"))
+
+
+class RequestTrace:
+    """Stage durations collected for one request."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self._stages: Dict[str, List[float]] = {}  # name -> [total_ms, count]
+        self._lock = threading.Lock()
+
+    def add(self, name: str, ms: float):
+        with self._lock:
+            stage = self._stages.setdefault(name, [0.0, 0])
+            stage[0] += ms
+            stage[1] += 1
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.start) * 1000
+
+    def stages(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {name: {"ms": round(ms, 1), "count": count} for name, (ms, count) in self._stages.items()}
+
+    def server_timing(self) -> str:
+        """`Server-Timing` header value; stages in the order they were first entered."""
+        entries = []
+        for name, stage in self.stages().items():
+            desc = f';desc="x{stage["count"]}"' if stage["count"] > 1 else ""
+            entries.append(f"{name};dur={stage['ms']}{desc}")
+        entries.append(f"total;dur={self.elapsed_ms():.1f}")
+        return ", ".join(entries)
+
+
+_current: ContextVar[Optional[RequestTrace]] = ContextVar("request_trace", default=None)
+
+
+def current_trace() -> Optional[RequestTrace]:
+    return _current.get()
+
+
+class span:
+    """Time a stage of the current request (no-op when it isn't sampled)."""
+
+    __slots__ = ("name", "_trace", "_start")
+
+    def __init__(self, name: str):
+        self.name = name
+        self._trace = None
+
+    def __enter__(self):
+        self._trace = _current.get()
+        if self._trace is not None:
+            self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if self._trace is not None:
+            self._trace.add(self.name, (time.perf_counter() - self._start) * 1000)
+        return False
+
+    # Also usable in `async with` statements next to async clients
+    async def __aenter__(self):
+        return self.__enter__()
+
+    async def __aexit__(self, *exc):
+        return self.__exit__(*exc)
+
+
+def traced(name: str) -> Callable:
+    """Decorator form of `span` for sync and async functions."""
+    def decorator(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(name):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _sampled(request) -> bool:
+    if TRACE_FORCE_HEADER and request.headers.get(TRACE_FORCE_HEADER):
+        return True
+    return TRACE_SAMPLE_RATE > 0 and random.random() < TRACE_SAMPLE_RATE
+
+
+def _log(request, status: int, trace: RequestTrace):
+    total_ms = trace.elapsed_ms()
+    if total_ms < TRACE_LOG_MIN_MS:
+        return
+    route = getattr(request.scope.get("route"), "path", None) or request.url.path
+    logger.info(json.dumps({
+        "event": "request_timing",
+        "method": request.method,
+        "route": route,
+        "status": status,
+        "total_ms": round(total_ms, 1),
+        "stages": trace.stages(),
+    }))
+
+
+async def tracing_middleware(request, call_next):
+    """Time sampled requests and attach their stage breakdown."""
+    if not _sampled(request):
+        return await call_next(request)
+    trace = RequestTrace()
+    token = _current.set(trace)
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        response.headers["Server-Timing"] = trace.server_timing()
+        return response
+    finally:
+        _current.reset(token)
+        _log(request, status, trace)
+
@@ -0,0 +1,265 @@
+"""Cache warmup from query history.
+
+After a deploy or restart the in-process search cache starts cold. On startup each worker replays the top
+WARMUP_TOP_N historical queries in the background, at most
+WARMUP_RATE_PER_S per second, and reports progress in `/health`.
+
+History comes from:
+
+    local      WARMUP_HISTORY_PATH, snapshots of the analytics heavy
+               hitters (see analytics.top_queries) written every
+               WARMUP_SNAPSHOT_INTERVAL_S and at shutdown; each worker
+               keeps its own section of the file
+    supabase   the latest WARMUP_SUPABASE_ROWS rows of `caselaw_searches`
+               (when SUPABASE_URL is set)
+
+Counts from all of them are summed per (source, query). Each source has a
+warmer registered with `register_warmer`; a source `dataset/court_cases`
+is handled by the warmer registered for `dataset`. Dataset searches and
+Gemini calls are not cached by the service, so their queries are
+skipped.
+
+Configuration:
+    WARMUP_ON_STARTUP            enable (default true)
+    WARMUP_TOP_N                 queries replayed (default 50)
+    WARMUP_RATE_PER_S            replay rate limit (default 2)
+    WARMUP_QUERY_TIMEOUT_S       give up on one query after (default 30)
+    WARMUP_HISTORY_HOURS         window of the local snapshot (default 24)
+"""
+import asyncio
+import fcntl
+import json
+import logging
+import os
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from .analytics import get_analytics_store, normalize_query
+from .executors import PoolSaturated
+
+logger = logging.getLogger(__name__)
+
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "true").lower() == "true"
+WARMUP_TOP_N = int(os.getenv("WARMUP_TOP_N", "50"))
+WARMUP_RATE_PER_S = float(os.getenv("WARMUP_RATE_PER_S", "2"))
+WARMUP_QUERY_TIMEOUT_S = float(os.getenv("WARMUP_QUERY_TIMEOUT_S", "30"))
+WARMUP_HISTORY_PATH = os.getenv("WARMUP_HISTORY_PATH", ".cache/query_history.json")
+WARMUP_HISTORY_HOURS = float(os.getenv("WARMUP_HISTORY_HOURS", "24"))
+WARMUP_SNAPSHOT_INTERVAL_S = float(os.getenv("WARMUP_SNAPSHOT_INTERVAL_S", "300"))
+WARMUP_SUPABASE_ROWS = int(os.getenv("WARMUP_SUPABASE_ROWS", "5000"))
+
+Warmer = Callable[[str, str], Awaitable[Any]]
+_WARMERS: Dict[str, Warmer] = {}
+
+# caselaw_searches.search_type -> query source
+SEARCH_TYPE_SOURCES = {"keyword": "caselaw", "semantic": "caselaw_semantic"}
+
+
+def register_warmer(source: str):
+    """Decorator registering `async fn(source, query)` for a query source."""
+    def decorator(fn: Warmer) -> Warmer:
+        _WARMERS[source] = fn
+        return fn
+    return decorator
+
+
+def get_warmer(source: str) -> Optional[Warmer]:
+    return _WARMERS.get(source) or _WARMERS.get(source.split("/", 1)[0])
+
+
+# ---------------- history -----------------
+def _read_sections(path: str) -> Dict[str, Dict[str, Any]]:
+    """Worker id -> {"saved_at", "queries"}; a pre-sectioned file is one section."""
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as f:
+        data = json.load(f)
+    if "workers" in data:
+        return data["workers"]
+    return {"": {"saved_at": data.get("saved_at"), "queries": data["queries"]}}
+
+
+def load_local_history(path: str = WARMUP_HISTORY_PATH) -> Counter:
+    """(source, query) -> count from the local snapshot."""
+    history: Counter = Counter()
+    try:
+        for section in _read_sections(path).values():
+            for entry in section["queries"]:
+                history[(entry["source"], entry["query"])] += entry["count"]
+    except Exception as e:
+        logger.warning("Unreadable query history %s: %s", path, e)
+    return history
+
+
+@contextmanager
+def _history_lock(path: str):
+    fd = os.open(f"{path}.lock", os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(fd)
+
+
+def save_local_history(path: str = WARMUP_HISTORY_PATH, hours: float = WARMUP_HISTORY_HOURS,
+                       top_n: int = WARMUP_TOP_N) -> int:
+    """Snapshot this worker's heavy hitters into its section of the file.
+
+    Other workers' sections are kept unless older than `hours`; an empty
+    window leaves this worker's previous section in place.
+    """
+    queries = get_analytics_store().top_queries(hours * 3600, n=top_n * 2)
+    if not queries:
+        return 0
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    now = datetime.utcnow()
+    with _history_lock(path):
+        try:
+            sections = _read_sections(path)
+        except Exception as e:
+            logger.warning("Replacing unreadable query history %s: %s", path, e)
+            sections = {}
+        cutoff = (now - timedelta(hours=hours)).isoformat()
+        sections = {worker: section for worker, section in sections.items()
+                    if (section.get("saved_at") or "") >= cutoff}
+        sections[str(os.getpid())] = {"saved_at": now.isoformat(), "queries": [
+            {"source": q["source"], "query": q["query"], "count": q["count"]} for q in queries
+        ]}
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"workers": sections}, f)
+        os.replace(tmp, path)
+    return len(queries)
+
+
+async def load_supabase_history(rows: int = WARMUP_SUPABASE_ROWS) -> Counter:
+    """(source, query) -> count over the latest `caselaw_searches` rows."""
+    history: Counter = Counter()
+    if not os.getenv("SUPABASE_URL") or rows <= 0:
+        return history
+    from .supabase_client import supabase
+    try:
+        records = await supabase.select("caselaw_searches", {
+            "select": "query,search_type", "order": "timestamp.desc", "limit": str(rows),
+        })
+    except Exception as e:
+        logger.warning("Could not read caselaw_searches for warmup: %s", e)
+        return history
+    for record in records:
+        if record.get("query"):
+            source = SEARCH_TYPE_SOURCES.get(record.get("search_type"), "caselaw")
+            history[(source, normalize_query(record["query"]))] += 1
+    return history
+
+
+# ---------------- warmer -----------------
+class CacheWarmer:
+    """Replays the hottest historical queries once, rate-limited."""
+
+    def __init__(self, top_n: int = WARMUP_TOP_N, rate_per_s: float = WARMUP_RATE_PER_S,
+                 history_path: str = WARMUP_HISTORY_PATH):
+        self.top_n = top_n
+        self.rate_per_s = rate_per_s
+        self.history_path = history_path
+        self.status = "idle"
+        self.total = 0
+        self.done = 0
+        self.failed = 0
+        self.skipped = 0
+        self.started_at: Optional[str] = None
+        self.finished_at: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+        self._snapshots: Optional[asyncio.Task] = None
+
+    async def plan(self) -> List[Tuple[str, str]]:
+        """Top-N (source, query) pairs across the history sources."""
+        history = load_local_history(self.history_path)
+        history.update(await load_supabase_history())
+        return [key for key, _ in history.most_common(self.top_n)]
+
+    async def run(self):
+        self.status = "running"
+        self.started_at = datetime.utcnow().isoformat()
+        try:
+            plan = await self.plan()
+            self.total = len(plan)
+            interval = 1 / self.rate_per_s if self.rate_per_s > 0 else 0
+            for source, query in plan:
+                started = time.monotonic()
+                warmer = get_warmer(source)
+                if warmer is None:
+                    self.skipped += 1
+                    continue
+                try:
+                    await asyncio.wait_for(warmer(source, query), WARMUP_QUERY_TIMEOUT_S)
+                    self.done += 1
+                except PoolSaturated:
+                    # Real traffic has the pools; don't compete with it
+                    self.skipped += 1
+                except Exception as e:
+                    self.failed += 1
+                    logger.warning("Warmup of %s query %r failed: %s", source, query, e)
+                await asyncio.sleep(max(0.0, interval - (time.monotonic() - started)))
+            self.status = "warm"
+        except asyncio.CancelledError:
+            self.status = "cancelled"
+            raise
+        except Exception as e:
+            self.status = "failed"
+            logger.warning("Cache warmup failed: %s", e)
+        finally:
+            self.finished_at = datetime.utcnow().isoformat()
+            if self.status == "warm":
+                logger.info("Cache warm: %d queries replayed, %d failed, %d skipped",
+                            self.done, self.failed, self.skipped)
+
+    async def _snapshot_loop(self):
+        while True:
+            await asyncio.sleep(WARMUP_SNAPSHOT_INTERVAL_S)
+            try:
+                save_local_history(self.history_path, top_n=self.top_n)
+            except Exception as e:
+                logger.warning("Could not save query history: %s", e)
+
+    def start(self):
+        """Start warmup and periodic history snapshots (call from a coroutine)."""
+        loop = asyncio.get_running_loop()
+        if self._task is None:
+            self._task = loop.create_task(self.run())
+        if self._snapshots is None and WARMUP_SNAPSHOT_INTERVAL_S > 0:
+            self._snapshots = loop.create_task(self._snapshot_loop())
+
+    def stop(self):
+        """Cancel background work and save a final history snapshot."""
+        for task in (self._task, self._snapshots):
+            if task is not None and not task.done():
+                task.cancel()
+        self._snapshots = None
+        try:
+            save_local_history(self.history_path, top_n=self.top_n)
+        except Exception as e:
+            logger.warning("Could not save query history: %s", e)
+
+    def progress(self) -> Dict[str, Any]:
+        progress = {"status": self.status, "total": self.total, "done": self.done,
+                    "failed": self.failed, "skipped": self.skipped}
+        if self.status == "running":
+            progress["started_at"] = self.started_at
+        elif self.finished_at:
+            progress["finished_at"] = self.finished_at
+        return progress
+
+
+# Global singleton
+_cache_warmer = None
+
+
+def get_cache_warmer() -> CacheWarmer:
+    """Get singleton CacheWarmer instance."""
+    global _cache_warmer
+    if _cache_warmer is None:
+        _cache_warmer = CacheWarmer()
+    return _cache_warmer
@@ -231,19 +231,23 @@ CREATE POLICY user_isolation_policy_api_usage ON api_usage
         # Create monitoring configuration
         monitoring_config = {
             "alerts": {
+                # Expressions over the series exported at /metrics (caselaw_service/metrics.py)
                 "high_error_rate": {
                     "threshold": 5,
                     "time_window": "5m",
+                    "expr": '100 * sum(rate(http_requests_total{status=~"5.."}[5m])) / sum(rate(http_requests_total[5m])) > 5',
                     "notification": ["email", "slack"]
                 },
                 "high_response_time": {
                     "threshold": 500,
                     "time_window": "5m",
+                    "expr": "1000 * histogram_quantile(0.95, sum by (le) (rate(http_request_duration_seconds_bucket[5m]))) > 500",
                     "notification": ["email", "slack"]
                 },
                 "high_memory_usage": {
                     "threshold": 80,
                     "time_window": "5m",
+                    "expr": "max_over_time(system_memory_usage_percent[5m]) > 80",
                     "notification": ["email", "slack"]
                 }
             },
@@ -253,6 +257,12 @@ CREATE POLICY user_isolation_policy_api_usage ON api_usage
                 "error_rates": True,
                 "active_users": True,
                 "database_performance": True
+            },
+            "series": {
+                "api_requests": "http_requests_total",
+                "response_times": "http_request_duration_seconds",
+                "error_rates": "http_requests_total{status=~\"5..\"}",
+                "database_performance": "supabase_request_duration_seconds"
             }
         }
         
@@ -260,6 +270,17 @@ CREATE POLICY user_isolation_policy_api_usage ON api_usage
         monitoring_file = self.project_root / "deploy/monitoring_config.json"
         with open(monitoring_file, "w") as f:
             json.dump(monitoring_config, f, indent=2)
+
+        # Prometheus alerting rules for the same thresholds
+        rules = ["groups:", "- name: legal-oracle", "  rules:"]
+        for name, alert in monitoring_config["alerts"].items():
+            rules += [
+                f"  - alert: {name}",
+                f"    expr: {json.dumps(alert['expr'])}",
+                f"    for: {alert['time_window']}",
+            ]
+        with open(self.project_root / "deploy/prometheus_alerts.yml", "w") as f:
+            f.write("\n".join(rules) + "\n")
             
         self.log("Monitoring configuration created", "SUCCESS")
         